@@ -9,13 +9,15 @@ import json
 import re
 import sys
 from pathlib import Path
-from openai import OpenAI
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from config import LLM_BASE_URL, LLM_MODEL, EMBED_BASE_URL, EMBED_MODEL, KB_PATH, METADATA_CSV
+sys.path.insert(0, str(Path(__file__).parent.parent))                # rag/ — for config
+sys.path.insert(0, str(Path(__file__).parent.parent / "02_search"))  # for snapshot
+from snapshot import write_snapshot
+from clients import llm_client, embed_client
+from config import LLM_MODEL, EMBED_MODEL, KB_PATH, METADATA_CSV
 
-llm = OpenAI(base_url=LLM_BASE_URL, api_key="dummy")
-embedder = OpenAI(base_url=EMBED_BASE_URL, api_key="dummy")
+llm = llm_client()
+embedder = embed_client()
 
 MANIFEST_PATH = KB_PATH / "meta" / "document_manifest.csv"
 TARGET_FILEPATH = "meta/document_manifest.csv"
@@ -115,6 +117,8 @@ def main():
         writer.writeheader()
         writer.writerows(rows)
 
+    print("Compiling index snapshot...")
+    write_snapshot()
     print("Done.")
 
 
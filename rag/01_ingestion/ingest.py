@@ -7,6 +7,7 @@ Steps:
   3. Normalize all tags across files into a canonical master list
   4. Embed each description (Qwen3 Embedding 0.6B)
   5. Save everything to ../metadata.csv
+  6. Compile the binary index snapshot (memory-mapped by the search API)
 """
 
 import json
@@ -16,18 +17,18 @@ import time
 import sys
 from pathlib import Path
 
-from openai import OpenAI
-
-sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))                # rag/ — for config
+sys.path.insert(0, str(Path(__file__).parent.parent / "02_search"))  # for snapshot
+from snapshot import write_snapshot
+from clients import llm_client, embed_client
 from config import (
-    LLM_BASE_URL, LLM_MODEL,
-    EMBED_BASE_URL, EMBED_MODEL,
+    LLM_MODEL, EMBED_MODEL,
     KB_PATH, METADATA_CSV, MASTER_TAGS_JSON, MANIFEST_PATH,
     SKIP_FILES, SUPPORTED_EXTENSIONS, MAX_CONTENT_CHARS,
 )
 
-llm = OpenAI(base_url=LLM_BASE_URL, api_key="dummy")
-embedder = OpenAI(base_url=EMBED_BASE_URL, api_key="dummy")
+llm = llm_client()
+embedder = embed_client()
 
 
 def parse_json(content: str) -> dict:
@@ -287,6 +288,12 @@ def main():
 
     print(f"Saved {len(records)} records → {METADATA_CSV}")
     print(f"Master tags          → {MASTER_TAGS_JSON}")
+
+    print("\n" + "=" * 60)
+    print("Step 6: Compiling index snapshot")
+    print("=" * 60)
+    snapshot_dir = write_snapshot()
+    print(f"Snapshot             → {snapshot_dir}")
     print("\nDone!")
 
 
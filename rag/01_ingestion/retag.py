@@ -1,6 +1,7 @@
 """
 Retag — regenerates tags for all files using a curated 2-tier taxonomy.
 Updates only the `tags` column in metadata.csv (descriptions/embeddings unchanged).
+Recompiles the index snapshot afterwards so it matches the new metadata.csv.
 
 Tier 1 — ~15 semantic categories (broad topics)
 Tier 2 — ~20 proper nouns (tools, services, systems)
@@ -14,12 +15,14 @@ import json
 import sys
 import time
 from pathlib import Path
-from openai import OpenAI
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from config import LLM_BASE_URL, LLM_MODEL, METADATA_CSV, MASTER_TAGS_JSON
+sys.path.insert(0, str(Path(__file__).parent.parent))                # rag/ — for config
+sys.path.insert(0, str(Path(__file__).parent.parent / "02_search"))  # for snapshot
+from snapshot import write_snapshot
+from clients import llm_client
+from config import LLM_MODEL, METADATA_CSV, MASTER_TAGS_JSON
 
-llm = OpenAI(base_url=LLM_BASE_URL, api_key="dummy")
+llm = llm_client()
 
 # ─── Curated taxonomy ─────────────────────────────────────────────────────────
 
@@ -127,6 +130,9 @@ def main():
     mapping = {t: t for t in ALL_TAGS}
     MASTER_TAGS_JSON.write_text(json.dumps(mapping, indent=2))
 
+    print("Compiling index snapshot...")
+    write_snapshot()
+
     print(f"\nDone. Tags: {ALL_TAGS}")
 
 
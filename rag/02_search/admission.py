@@ -0,0 +1,205 @@
+"""
+Admission control for the model servers — bounded concurrency with backpressure.
+
+Each backend has a Limiter: at most `limit` calls in flight, at most `queue_size`
+more waiting for a slot. A freed slot goes to the waiter with the best priority,
+then the longest-waiting one, so interactive UI traffic overtakes batch/eval work.
+
+  llm_slots    LLM_BASE_URL   (tags, reranking, generation)
+  embed_slots  EMBED_BASE_URL (query embeddings)
+
+Instead of piling more load on a saturated server, callers are turned away:
+  queue full            Overloaded(status=429) at once
+  no slot in time       Overloaded(status=503) after ADMISSION_TIMEOUT seconds
+Both carry a Retry-After hint; the API turns them into HTTP responses.
+
+  with llm_slots.slot(): ...          sync callers (scripts, worker threads)
+  async with llm_slots.aslot(): ...   the async request path
+
+The priority of the current request is a context variable: the API sets it once
+per request (set_priority) and every task / worker thread started with the
+request's context inherits it.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))  # rag/ — for config
+from config import LLM_CONCURRENCY, EMBED_CONCURRENCY, ADMISSION_QUEUE, ADMISSION_TIMEOUT
+from metrics import Histogram
+
+PRIORITIES = {"interactive": 0, "batch": 1}  # lower is served first
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("priority", default=0)
+
+
+def set_priority(name: str) -> None:
+    """Priority class of the current request ("interactive" | "batch"); unknown names → interactive."""
+    _priority.set(PRIORITIES.get(name, 0))
+
+
+class Overloaded(Exception):
+    """A backend has no capacity for this call; retry after `retry_after` seconds."""
+
+    def __init__(self, backend: str, reason: str, status: int, retry_after: int):
+        super().__init__(f"{backend} backend overloaded: {reason}")
+        self.backend = backend
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("granted", "wake")
+
+    def __init__(self, wake):
+        self.granted = False  # set under the limiter lock when a slot is handed over
+        self.wake = wake
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class Limiter:
+    """Concurrency limit + bounded priority queue for one backend. limit <= 0 = unlimited."""
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout if timeout > 0 else None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queue: list = []  # heap of (priority, arrival, _Waiter)
+        self._arrival = itertools.count()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait = Histogram()
+
+    # ── slot bookkeeping ──
+
+    def _enter(self, wake) -> _Waiter | None:
+        """Take a free slot (→ None) or join the queue (→ waiter); raises if the queue is full."""
+        with self._lock:
+            if (self.limit <= 0 or self._active < self.limit) and not self._queue:
+                self._active += 1
+                self.admitted += 1
+                return None
+            if len(self._queue) >= self.queue_size:
+                self.rejected += 1
+                raise Overloaded(self.name, "queue full", 429, self.retry_after())
+            waiter = _Waiter(wake)
+            heapq.heappush(self._queue, (_priority.get(), next(self._arrival), waiter))
+            self.queued += 1
+            return waiter
+
+    def _leave(self, waiter: _Waiter) -> bool:
+        """Stop waiting. False if a slot was handed over meanwhile — the caller holds it."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+            heapq.heapify(self._queue)
+            return True
+
+    def _release(self) -> None:
+        """Free a slot — straight to the best waiter if there is one."""
+        with self._lock:
+            if self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.granted = True
+                self.admitted += 1
+                waiter.wake()
+            else:
+                self._active -= 1
+
+    def _give_up(self) -> Overloaded:
+        with self._lock:
+            self.timed_out += 1
+        return Overloaded(self.name, f"no slot within {self.timeout:g}s", 503, self.retry_after())
+
+    # ── public ──
+
+    @contextmanager
+    def slot(self):
+        """Hold one slot for the duration of the block (blocks the calling thread while queued)."""
+        start = time.monotonic()
+        event = threading.Event()
+        waiter = self._enter(event.set)
+        if waiter is not None:
+            if not event.wait(self.timeout) and self._leave(waiter):
+                raise self._give_up()
+            self.queue_wait.observe(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """slot() for coroutines — waits on the event loop; cancellation leaves the queue."""
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        waiter = self._enter(lambda: loop.call_soon_threadsafe(_resolve, granted))
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(granted, self.timeout)
+            except asyncio.TimeoutError:
+                if self._leave(waiter):
+                    raise self._give_up()
+            except asyncio.CancelledError:
+                if not self._leave(waiter):
+                    self._release()  # handed a slot while being cancelled — pass it on
+                raise
+            self.queue_wait.observe(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def check(self) -> None:
+        """Raise Overloaded now if a new call would be rejected — for failing fast at the door."""
+        with self._lock:
+            full = self.limit > 0 and self._active >= self.limit and len(self._queue) >= self.queue_size
+            if full:
+                self.rejected += 1
+        if full:
+            raise Overloaded(self.name, "queue full", 429, self.retry_after())
+
+    def retry_after(self) -> int:
+        """Seconds a rejected caller should wait: the recent mean queue wait, at least 1."""
+        return max(1, math.ceil(self.queue_wait.mean()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            active, waiting = self._active, len(self._queue)
+        return {
+            "limit":      self.limit,
+            "active":     active,
+            "waiting":    waiting,
+            "admitted":   self.admitted,
+            "queued":     self.queued,
+            "rejected":   self.rejected,
+            "timed_out":  self.timed_out,
+            "queue_wait": self.queue_wait.stats(),
+        }
+
+
+llm_slots = Limiter("llm", LLM_CONCURRENCY, ADMISSION_QUEUE, ADMISSION_TIMEOUT)
+embed_slots = Limiter("embed", EMBED_CONCURRENCY, ADMISSION_QUEUE, ADMISSION_TIMEOUT)
+
+
+def admission_stats() -> dict:
+    return {limiter.name: limiter.stats() for limiter in (llm_slots, embed_slots)}
@@ -0,0 +1,258 @@
+"""
+Vector search backends for the cosine signal — selected via ANN_BACKEND in config.
+
+  exact — brute-force dot product against every normalised embedding. Always used
+          for corpora smaller than ANN_MIN_DOCS; retrieve() then scores all documents.
+  ivf   — IVF-flat: spherical k-means splits the embeddings into ANN_NLIST cells.
+          A query scans only the ANN_NPROBE cells whose centroids are closest and
+          returns the best candidates among their members.
+          ANN_NPROBE is the recall-vs-latency knob (nprobe == nlist → exact).
+
+Both backends can rank on compact codes instead of float32 (EMBEDDING_STORAGE, see
+quantize.py) and rescore the best RESCORE_DEPTH candidates exactly. similarity()
+gives the cosine used for fusion: exact, unless rescoring is disabled.
+
+IVF lists and codes are cached next to the index snapshot (ivf_*.npy, codes_*.npy)
+so workers map them instead of rebuilding on every start.
+
+Usage (recall/latency table for the current index):
+  python3 02_search/ann.py
+"""
+
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+_HERE = Path(__file__).parent
+sys.path.insert(0, str(_HERE.parent))  # rag/ — for config
+sys.path.insert(0, str(_HERE))         # 02_search/ — for quantize, snapshot
+from config import (
+    ANN_BACKEND, ANN_NLIST, ANN_NPROBE, ANN_MIN_DOCS,
+    EMBEDDING_STORAGE, RESCORE_DEPTH,
+)
+from quantize import VectorCodes
+from snapshot import cached_arrays
+
+KMEANS_ITERS = 10
+TRAIN_POINTS_PER_LIST = 64
+MAX_TRAIN_POINTS = 131072
+ASSIGN_CHUNK = 65536
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first (argpartition + small sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+# ─── Exact ────────────────────────────────────────────────────────────────────
+
+class ExactSearch:
+    """Brute-force search over all embeddings (or all codes, then exact rescoring)."""
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        codes: VectorCodes | None = None,
+        rescore_depth: int = RESCORE_DEPTH,
+    ):
+        self.embeddings = embeddings
+        self.codes = codes
+        self.rescore_depth = rescore_depth
+
+    @property
+    def exhaustive(self) -> bool:
+        """True when retrieve() can simply score every document on float32."""
+        return self.codes is None
+
+    def _rank(self, q: np.ndarray, ids: np.ndarray | None, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k of ids (None = all rows) — on codes + exact rescoring when quantized."""
+        if self.codes is None:
+            emb = self.embeddings if ids is None else self.embeddings[ids]
+            sims = emb @ q
+            top = top_k_indices(sims, k)
+            return (top if ids is None else ids[top]), sims[top]
+
+        approx = self.codes.scores(q, ids)
+        if self.rescore_depth <= 0:
+            top = top_k_indices(approx, k)
+            return (top if ids is None else ids[top]), approx[top]
+        shortlist = top_k_indices(approx, max(k, self.rescore_depth))
+        rows = np.sort(shortlist if ids is None else ids[shortlist])
+        sims = self.embeddings[rows] @ q
+        top = top_k_indices(sims, k)
+        return rows[top], sims[top]
+
+    def search(self, q: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        return self._rank(q, None, k)
+
+    def similarity(self, q: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """Cosine of q to the given rows — from codes only if rescoring is off."""
+        if self.codes is not None and self.rescore_depth <= 0:
+            return self.codes.scores(q, rows)
+        return self.embeddings @ q if rows is None else self.embeddings[rows] @ q
+
+
+# ─── IVF-flat ─────────────────────────────────────────────────────────────────
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (max inner product) per row, chunked to bound memory."""
+    out = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), ASSIGN_CHUNK):
+        chunk = np.asarray(x[start:start + ASSIGN_CHUNK], dtype=np.float32)
+        out[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return out
+
+
+def _spherical_kmeans(x: np.ndarray, nlist: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = x[rng.choice(len(x), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERS):
+        assign = _assign(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        cells, starts = np.unique(assign[order], return_index=True)
+        sums = np.add.reduceat(x[order], starts, axis=0)
+        centroids[cells] = sums
+        # re-seed empty cells with random points
+        empty = np.setdiff1d(np.arange(nlist), cells)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids /= norms
+    return centroids
+
+
+class IVFFlat(ExactSearch):
+    """Inverted-file index with flat scoring inside the probed cells."""
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        nlist: int,
+        nprobe: int,
+        codes: VectorCodes | None = None,
+        rescore_depth: int = RESCORE_DEPTH,
+    ):
+        super().__init__(embeddings, codes, rescore_depth)
+        self.nlist = nlist
+        self.nprobe = min(nprobe, nlist)
+        self.centroids = np.zeros((0, embeddings.shape[1]), dtype=np.float32)
+        self.list_ptr = np.zeros(1, dtype=np.int64)
+        self.list_ids = np.zeros(0, dtype=np.int32)
+
+    @property
+    def exhaustive(self) -> bool:
+        return False
+
+    def build(self, seed: int = 0) -> dict[str, np.ndarray]:
+        rng = np.random.default_rng(seed)
+        n = len(self.embeddings)
+        n_train = min(n, self.nlist * TRAIN_POINTS_PER_LIST, MAX_TRAIN_POINTS)
+        sample = np.sort(rng.choice(n, n_train, replace=False))
+        train = np.asarray(self.embeddings[sample], dtype=np.float32)
+        centroids = _spherical_kmeans(train, self.nlist, rng).astype(np.float32)
+
+        assign = _assign(self.embeddings, centroids)
+        counts = np.bincount(assign, minlength=self.nlist)
+        list_ptr = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(counts, out=list_ptr[1:])
+        return {
+            "centroids": centroids,
+            "list_ptr":  list_ptr,
+            "list_ids":  np.argsort(assign, kind="stable").astype(np.int32),
+        }
+
+    def set_arrays(self, arrays: dict[str, np.ndarray]) -> None:
+        self.centroids = arrays["centroids"]
+        self.list_ptr = arrays["list_ptr"]
+        self.list_ids = arrays["list_ids"]
+
+    def search(self, q: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        probe = top_k_indices(self.centroids @ q, self.nprobe)
+        ids = np.concatenate(
+            [self.list_ids[self.list_ptr[c]:self.list_ptr[c + 1]] for c in probe]
+        ).astype(np.int64)
+        if len(ids) == 0:
+            return ids, np.zeros(0, dtype=np.float32)
+        ids.sort()  # sequential row access on memory-mapped embeddings
+        return self._rank(q, ids, k)
+
+
+# ─── Factory ──────────────────────────────────────────────────────────────────
+
+def build_vector_index(
+    embeddings: np.ndarray,
+    backend: str = ANN_BACKEND,
+    cache_dir: Path | None = None,
+    storage: str = EMBEDDING_STORAGE,
+    snapshot: str | None = None,
+):
+    """
+    Vector index for the configured backend and storage; exact for small corpora.
+    Derived arrays are cached in cache_dir for the snapshot with id `snapshot`.
+    """
+    n, dim = embeddings.shape
+    codes = None
+    if storage != "float32":
+        t0 = time.perf_counter()
+        codes_arrays = cached_arrays(
+            cache_dir, f"codes_{storage}", {"n_docs": n},
+            lambda: VectorCodes.encode(storage, embeddings), snapshot,
+        )
+        codes = VectorCodes(storage, codes_arrays, dim)
+        print(
+            f"[ANN] {storage} codes: {codes.nbytes / 1e6:.1f} MB vs "
+            f"{n * dim * 4 / 1e6:.1f} MB float32 "
+            f"({n * dim * 4 / max(codes.nbytes, 1):.0f}× smaller, "
+            f"{(time.perf_counter() - t0) * 1000:.0f} ms)"
+        )
+
+    if backend == "exact" or n < max(ANN_MIN_DOCS, 1):
+        return ExactSearch(embeddings, codes)
+    if backend != "ivf":
+        raise ValueError(f"Unknown ANN_BACKEND: {backend!r} (expected 'exact' or 'ivf')")
+
+    nlist = min(ANN_NLIST or max(1, int(4 * math.sqrt(n))), n)
+    index = IVFFlat(embeddings, nlist=nlist, nprobe=ANN_NPROBE, codes=codes)
+    t0 = time.perf_counter()
+    index.set_arrays(cached_arrays(cache_dir, "ivf", {"nlist": nlist, "n_docs": n}, index.build, snapshot))
+    print(f"[ANN] IVF ready ({nlist} lists, nprobe={index.nprobe}) in {time.perf_counter() - t0:.1f}s")
+    return index
+
+
+if __name__ == "__main__":
+    from retrieval import load_index
+
+    emb = load_index().embeddings
+    n = len(emb)
+    rng = np.random.default_rng(1)
+    queries = np.asarray(emb[rng.choice(n, min(n, 200), replace=False)])
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    k = 10
+
+    exact = ExactSearch(emb)
+    truth = [set(exact.search(q, k)[0].tolist()) for q in queries]
+    nlist = ANN_NLIST or max(1, int(4 * math.sqrt(n)))
+    ivf = IVFFlat(emb, nlist=min(nlist, n), nprobe=1)
+    ivf.set_arrays(ivf.build())
+
+    print(f"{n} docs, nlist={ivf.nlist}")
+    print(f"{'nprobe':>8} {'recall@10':>10} {'ms/query':>10}")
+    for nprobe in sorted({1, 2, 4, 8, 16, 32, 64, ivf.nlist}):
+        if nprobe > ivf.nlist:
+            continue
+        ivf.nprobe = nprobe
+        t0 = time.perf_counter()
+        found = [set(ivf.search(q, k)[0].tolist()) for q in queries]
+        ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        recall = np.mean([len(f & t) / max(1, len(t)) for f, t in zip(found, truth)])
+        print(f"{nprobe:>8} {recall:>10.3f} {ms:>10.3f}")
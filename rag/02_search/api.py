@@ -1,33 +1,89 @@
 """
-FastAPI app — simple web UI + /query endpoint.
+FastAPI app — simple web UI + /query, /query/stream (SSE) and /query/batch endpoints,
+/stats (JSON) and /metrics (Prometheus).
 """
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
+import asyncio
+import hashlib
+import hmac
+import json
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
 import sys
 from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))  # rag/ — for config
 sys.path.insert(0, str(Path(__file__).parent))
 
-from retrieval import load_index, retrieve
-from reranker import iterative_rerank_and_generate
-from generator import generate
+from config import (
+    KB_PATH, MIN_RETRIEVAL_SCORE, TOP_K, MAX_TOP_K, RERANK_DEPTH, CONTEXT_DEPTH,
+    ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL,
+    QUERY_BATCH_MAX, GENERATION_CONCURRENCY, QUERY_COALESCING,
+    SLOW_QUERY_LOG, SLOW_QUERY_MS, SLOW_QUERY_LOG_BYTES, SLOW_QUERY_LOG_BACKUPS,
+    ADMIN_TOKEN,
+)
+from admission import Overloaded, admission_stats, embed_slots, llm_slots, set_priority
+from cache import AnswerCache, normalize_query
+from clients import pool_stats
+from metrics import (
+    LLM_TOKENS, REQUEST_SECONDS, STAGE_SECONDS,
+    render_values, render_histogram, stage_stats, start_trace,
+)
+from retrieval import (
+    load_index, reload_index, start_index_watcher, aretrieve, retrieve_batch,
+    cache_stats, embed_batch_stats, index_version,
+)
+from reranker import aiterative_rerank_and_generate, arerank
+from generator import agenerate, agenerate_stream, file_cache_stats
+from singleflight import SingleFlight
+from slowlog import SlowQueryLog
 
 app = FastAPI(title="Meridian Knowledge Base")
 
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL)
+in_flight = SingleFlight()
+slow_log = SlowQueryLog(SLOW_QUERY_LOG, SLOW_QUERY_MS, SLOW_QUERY_LOG_BYTES, SLOW_QUERY_LOG_BACKUPS)
+
+# Bounds how many answers batches generate at the same time (shared by all batches)
+_batch_generation = asyncio.Semaphore(GENERATION_CONCURRENCY)
+
 
 @app.on_event("startup")
 def startup():
     load_index()
+    start_index_watcher()
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    """No model capacity: 429 when the wait queue is full, 503 when the wait timed out."""
+    return JSONResponse(
+        status_code=exc.status,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 # ─── Models ───────────────────────────────────────────────────────────────────
 
 class QueryRequest(BaseModel):
     question: str
-    top_k: int = 10
+    top_k: int = Field(TOP_K, ge=1, le=MAX_TOP_K)
     use_reranker: bool = False
+    # documents the reranker orders / loaded into the prompt; None = server default, 0 = all retrieved
+    rerank_depth: int | None = Field(None, ge=0)
+    context_depth: int | None = Field(None, ge=0)
+
+
+class BatchQueryRequest(BaseModel):
+    questions: list[str] = Field(..., max_length=QUERY_BATCH_MAX)
+    top_k: int = Field(TOP_K, ge=1, le=MAX_TOP_K)
+    use_reranker: bool = False
+    rerank_depth: int | None = Field(None, ge=0)
+    context_depth: int | None = Field(None, ge=0)
 
 
 class RetrievedDoc(BaseModel):
@@ -45,39 +101,327 @@ class QueryResponse(BaseModel):
     sources: list[str]
     has_contradiction: bool
     retrieved: list[RetrievedDoc]
+    # every reranked filepath in the reranker's order (sources are its first context_depth); None without reranker
+    rerank_order: list[str] | None = None
     query_tags: list[str]
+    cached: bool = False
+    index_version: str = ""
+    # ms per pipeline stage (embed, tags, bm25, scoring, rerank, load_files, generate) + total
+    timings: dict[str, float] | None = None
+
+
+class BatchQueryResponse(BaseModel):
+    results: list[QueryResponse]
 
 
 # ─── Routes ───────────────────────────────────────────────────────────────────
 
-@app.post("/query", response_model=QueryResponse)
-def query(req: QueryRequest):
-    retrieved = retrieve(req.question)
-    if req.use_reranker:
-        result = iterative_rerank_and_generate(req.question, retrieved)
-    else:
-        max_score = max(doc["score"] for doc in retrieved) if retrieved else 0.0
-        result = generate(req.question, retrieved, max_retrieval_score=max_score)
+def _depths(req: QueryRequest | BatchQueryRequest) -> tuple[int, int]:
+    """(rerank_depth, context_depth) of a request, server defaults filled in."""
+    return (
+        RERANK_DEPTH if req.rerank_depth is None else req.rerank_depth,
+        CONTEXT_DEPTH if req.context_depth is None else req.context_depth,
+    )
+
+
+def _query_vec(retrieved: list[dict]):
+    """The question embedding retrieval computed (None without results or embedding)."""
+    return retrieved[0]["query_vec"] if retrieved else None
+
+
+def _answer_key(retrieved: list[dict], version: str, use_reranker: bool, depths: tuple[int, int]) -> tuple:
+    """Everything besides the question that the generated answer depends on."""
+    rerank_depth, context_depth = depths
+    paths = [d["filepath"] for d in retrieved]
+    if not (context_depth > 0 or (use_reranker and rerank_depth > 0)):
+        paths.sort()  # every document reaches the prompt — only the set matters
+    # with a depth, rank decides which documents the reranker / the prompt get
+    docset = hashlib.sha1("\n".join(paths).encode()).hexdigest()
+    max_score = max(doc["score"] for doc in retrieved) if retrieved else 0.0
+    return version, docset, use_reranker, depths, max_score < MIN_RETRIEVAL_SCORE
+
+
+async def _answer(
+    question: str,
+    retrieved: list[dict],
+    use_reranker: bool,
+    depths: tuple[int, int],
+) -> QueryResponse:
+    """Generate (or reuse) the answer for already-retrieved documents."""
+    # the index that served retrieval, even if a reload swapped it since
+    version = retrieved[0]["index_version"] if retrieved else index_version()
+
+    # Near-duplicate question over the same documents → reuse the generated answer
+    query_vec = _query_vec(retrieved)
+    key = _answer_key(retrieved, version, use_reranker, depths)
+    result = answer_cache.get(query_vec, key) if query_vec is not None else None
+    cached = result is not None
+
+    if not cached:
+        rerank_depth, context_depth = depths
+        if use_reranker:
+            result = await aiterative_rerank_and_generate(question, retrieved, rerank_depth, context_depth)
+        else:
+            max_score = max(doc["score"] for doc in retrieved) if retrieved else 0.0
+            result = await agenerate(question, retrieved, max_retrieval_score=max_score, context_depth=context_depth)
+        if query_vec is not None:
+            answer_cache.put(query_vec, key, result, [KB_PATH / d["filepath"] for d in retrieved])
+
     return QueryResponse(
         answer=result["answer"],
         sources=result["sources"],
         has_contradiction=result["has_contradiction"],
-        retrieved=[
-            RetrievedDoc(
-                filepath=doc["filepath"],
-                score=doc["score"],
-                vec_score=doc["vec_score"],
-                tag_score=doc["tag_score"],
-                description=doc["description"],
-                status=doc.get("status", ""),
-                last_modified=doc.get("last_modified", ""),
-            )
-            for doc in retrieved
-        ],
+        retrieved=_retrieved_docs(retrieved),
+        rerank_order=result.get("sorted_sources"),
         query_tags=retrieved[0]["query_tags"] if retrieved else [],
+        cached=cached,
+        index_version=version,
+    )
+
+
+def _flight_key(endpoint: str, req: QueryRequest) -> tuple:
+    """Requests with equal keys can share one pipeline run."""
+    return endpoint, normalize_query(req.question), req.top_k, req.use_reranker, _depths(req)
+
+
+async def _log_if_slow(
+    endpoint: str,
+    req: QueryRequest,
+    retrieved: list[dict],
+    rerank_order: list[str] | None,
+    cached: bool,
+    timings: dict[str, float],
+    tokens: dict[str, int],
+) -> None:
+    if slow_log.is_slow(timings):  # file write off the event loop
+        await asyncio.to_thread(
+            slow_log.record, endpoint, req.question,
+            {"top_k": req.top_k, "use_reranker": req.use_reranker,
+             "rerank_depth": req.rerank_depth, "context_depth": req.context_depth},
+            retrieved, rerank_order, cached, timings, tokens,
+        )
+
+
+def _admit(request: Request, default: str = "interactive") -> str:
+    """
+    Request priority for admission control (X-Priority: interactive | batch), after
+    failing fast with 429 if a model backend already has a full wait queue.
+    """
+    priority = request.headers.get("x-priority", default)
+    set_priority(priority)
+    embed_slots.check()
+    llm_slots.check()
+    return priority
+
+
+def _retrieved_docs(retrieved: list[dict]) -> list[RetrievedDoc]:
+    return [
+        RetrievedDoc(
+            filepath=doc["filepath"],
+            score=doc["score"],
+            vec_score=doc["vec_score"],
+            tag_score=doc["tag_score"],
+            description=doc["description"],
+            status=doc.get("status", ""),
+            last_modified=doc.get("last_modified", ""),
+        )
+        for doc in retrieved
+    ]
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+def _done(result: dict, cached: bool, timings: dict[str, float]) -> dict:
+    """Payload of a stream's done event — the QueryResponse answer fields."""
+    return {
+        "answer":            result["answer"],
+        "sources":           result["sources"],
+        "has_contradiction": result["has_contradiction"],
+        "rerank_order":      result.get("sorted_sources"),
+        "cached":            cached,
+        "timings":           timings,
+    }
+
+
+@app.post("/query", response_model=QueryResponse)
+async def query(req: QueryRequest, request: Request):
+    async def run():
+        trace = start_trace()
+        _admit(request)
+        retrieved = await aretrieve(req.question, top_k=req.top_k)
+        response = await _answer(req.question, retrieved, req.use_reranker, _depths(req))
+        response.timings = trace.finish("query")
+        rerank_order = None if response.cached else response.rerank_order
+        await _log_if_slow("query", req, retrieved, rerank_order, response.cached, response.timings, trace.tokens)
+        return response
+
+    if not QUERY_COALESCING:
+        return await run()
+    # identical question already being answered → wait for that answer instead
+    return await in_flight.do(_flight_key("query", req), run)
+
+
+@app.post("/query/stream")
+async def query_stream(req: QueryRequest, request: Request):
+    """
+    /query as Server-Sent Events, so the page fills in while the LLM is still writing:
+      retrieved  {retrieved, query_tags, index_version}   as soon as retrieval is done
+      token      {text}                                    answer text, as generated
+      done       {answer, sources, has_contradiction, rerank_order, cached, timings}
+      error      {detail}                                  instead of done, on failure
+    """
+    priority = "interactive"  # a stream joined while running needs no model capacity
+
+    def admit():
+        nonlocal priority
+        priority = _admit(request)  # a 429 has to happen before the stream starts
+
+    async def events():
+        set_priority(priority)  # runs in the stream's own task
+        trace = start_trace()
+        try:
+            retrieved = await aretrieve(req.question, top_k=req.top_k)
+            version = retrieved[0]["index_version"] if retrieved else index_version()
+            yield _sse("retrieved", {
+                "retrieved":     _retrieved_docs(retrieved),
+                "query_tags":    retrieved[0]["query_tags"] if retrieved else [],
+                "index_version": version,
+            })
+
+            query_vec = _query_vec(retrieved)
+            rerank_depth, context_depth = _depths(req)
+            key = _answer_key(retrieved, version, req.use_reranker, (rerank_depth, context_depth))
+            result = answer_cache.get(query_vec, key) if query_vec is not None else None
+            if result is not None:
+                timings = trace.finish("stream")
+                yield _sse("token", {"text": result["answer"]})
+                yield _sse("done", _done(result, True, timings))
+                await _log_if_slow("stream", req, retrieved, None, True, timings, trace.tokens)
+                return
+
+            reranked = req.use_reranker and bool(retrieved)
+            docs = await arerank(req.question, retrieved, rerank_depth) if reranked else retrieved
+            max_score = max(doc["score"] for doc in docs) if docs else 0.0
+            async for event in agenerate_stream(req.question, docs, max_retrieval_score=max_score,
+                                                context_depth=context_depth):
+                if event["type"] == "token":
+                    yield _sse("token", {"text": event["text"]})
+                else:
+                    result = {k: event[k] for k in ("answer", "sources", "has_contradiction")}
+            if reranked:
+                result["sorted_sources"] = [d["filepath"] for d in docs]  # as aiterative_rerank_and_generate
+
+            if query_vec is not None:
+                answer_cache.put(query_vec, key, result, [KB_PATH / d["filepath"] for d in retrieved])
+            timings = trace.finish("stream")
+            yield _sse("done", _done(result, False, timings))
+            await _log_if_slow("stream", req, retrieved, result.get("sorted_sources"), False, timings, trace.tokens)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    if QUERY_COALESCING:
+        # identical question already streaming → replay its events, then follow it live
+        stream = in_flight.stream(_flight_key("stream", req), events, admit)
+    else:
+        admit()
+        stream = events()
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch(req: BatchQueryRequest, request: Request):
+    """
+    Many questions in one request: batched retrieval, then at most
+    GENERATION_CONCURRENCY answers generated at a time. Results keep request order.
+    Batch priority unless the caller sends X-Priority: interactive.
+    """
+    # stages of all questions overlap, so only the histograms get them (no per-result timings)
+    trace = start_trace()
+    _admit(request, default="batch")
+    retrieved = await asyncio.to_thread(retrieve_batch, req.questions, top_k=req.top_k)
+
+    async def answer(question: str, docs: list[dict]) -> QueryResponse:
+        async with _batch_generation:
+            return await _answer(question, docs, req.use_reranker, _depths(req))
+
+    results = await asyncio.gather(*(answer(q, d) for q, d in zip(req.questions, retrieved)))
+    trace.finish("batch")
+    return BatchQueryResponse(results=list(results))
+
+
+def _check_admin(request: Request) -> None:
+    """403 unless ADMIN_TOKEN is set and sent as `Authorization: Bearer <token>`."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="admin endpoints are disabled (set ADMIN_TOKEN)")
+    sent = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(sent.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+
+
+@app.post("/admin/reload")
+async def admin_reload(request: Request):
+    """
+    Rebuild the index from metadata.csv / master_tags.json and swap it in — in the
+    worker that received the request only; other workers follow via INDEX_WATCH_INTERVAL.
+    """
+    _check_admin(request)
+    return await asyncio.to_thread(reload_index)
+
+
+@app.get("/stats")
+def stats():
+    return {
+        "index_version":  index_version(),
+        "query_cache":    cache_stats(),
+        "embed_batching": embed_batch_stats(),
+        "answer_cache":   answer_cache.stats(),
+        "file_cache":     file_cache_stats(),
+        "coalescing":     in_flight.stats(),
+        "admission":      admission_stats(),
+        "model_clients":  pool_stats(),
+        "latency":        stage_stats(),
+        "slow_query_log": slow_log.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage / request latency histograms, LLM tokens and cache counters in Prometheus text format."""
+    query_caches = cache_stats()
+    caches = {
+        "query_embedding": query_caches["embedding"],
+        "query_tags":      query_caches["tags"],
+        "answer":          answer_cache.stats(),
+        "file":            file_cache_stats(),
+    }
+    lines = [
+        *STAGE_SECONDS.render(),
+        *REQUEST_SECONDS.render(),
+        *LLM_TOKENS.render(),
+        *render_values("rag_cache_hits_total", "Cache lookups that hit.", "counter", "cache",
+                       {name: c["hits"] for name, c in caches.items()}),
+        *render_values("rag_cache_misses_total", "Cache lookups that missed.", "counter", "cache",
+                       {name: c["misses"] for name, c in caches.items()}),
+        *render_values("rag_cache_hit_ratio", "Hits / lookups since start.", "gauge", "cache",
+                       {name: c["hit_rate"] for name, c in caches.items()}),
+        *render_values("rag_cache_entries", "Entries currently cached.", "gauge", "cache",
+                       {name: c["size"] for name, c in caches.items()}),
+        *render_values("rag_cache_bytes", "Bytes of file content currently cached.", "gauge", "cache",
+                       {"file": caches["file"]["bytes"]}),
+        *render_values("rag_query_runs_total", "Queries that ran the pipeline (leader) or joined one in flight (coalesced).",
+                       "counter", "role", {"leader": in_flight.leaders, "coalesced": in_flight.coalesced}),
+        *render_histogram("rag_admission_queue_wait_seconds", "Time model calls waited for a slot.",
+                          "backend", {lim.name: lim.queue_wait for lim in (llm_slots, embed_slots)}),
+    ]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
 @app.get("/", response_class=HTMLResponse)
 def index():
     return HTMLResponse(content=HTML_UI)
@@ -153,35 +497,60 @@ async function ask() {
   const q = document.getElementById('question').value.trim();
   if (!q) return;
   const btn = document.getElementById('askBtn');
+  const result = document.getElementById('result');
   btn.disabled = true;
   document.getElementById('spinner').style.display = 'block';
-  document.getElementById('result').innerHTML = '';
+  result.innerHTML = '';
 
   try {
-    const res = await fetch('/query', {
+    const res = await fetch('/query/stream', {
       method: 'POST',
       headers: {'Content-Type': 'application/json'},
       body: JSON.stringify({question: q})
     });
-    const data = await res.json();
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
 
+    // Server-Sent Events: blocks separated by a blank line, "event:" + "data:" lines
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = '';
+    while (true) {
+      const {value, done} = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, {stream: true});
+      let sep;
+      while ((sep = buf.indexOf('\\n\\n')) >= 0) {
+        const block = buf.slice(0, sep);
+        buf = buf.slice(sep + 2);
+        let event = 'message', data = '';
+        block.split('\\n').forEach(line => {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        if (data) onEvent(event, JSON.parse(data));
+      }
+    }
+  } catch(e) {
+    result.innerHTML = `<div class="error">Error: ${e.message}</div>`;
+  } finally {
+    btn.disabled = false;
+    document.getElementById('spinner').style.display = 'none';
+  }
+}
+
+function onEvent(event, data) {
+  const result = document.getElementById('result');
+
+  if (event === 'retrieved') {
+    document.getElementById('spinner').style.display = 'none';
     let html = '';
 
     if (data.query_tags && data.query_tags.length) {
       html += `<div class="query-tags"><strong>Matched tags:</strong> ${data.query_tags.map(t => `<span class="tag">${t}</span>`).join(' ')}</div>`;
     }
 
-    html += '<div class="answer-card">';
-    if (data.has_contradiction) {
-      html += '<div class="contradiction-banner">⚠️ Contradictory information detected across sources — review carefully.</div>';
-    }
-    html += `<div class="answer-text">${escHtml(data.answer)}</div>`;
-    if (data.sources && data.sources.length) {
-      html += '<div class="sources"><h3>Sources used</h3>';
-      data.sources.forEach(s => { html += `<span class="source-tag">${escHtml(s)}</span>`; });
-      html += '</div>';
-    }
-    html += '</div>';
+    html += '<div class="answer-card"><div id="answerBanner"></div>';
+    html += '<div class="answer-text" id="answerText"></div><div id="answerSources"></div></div>';
 
     if (data.retrieved && data.retrieved.length) {
       html += '<div class="debug"><h2>Retrieved documents</h2>';
@@ -195,12 +564,22 @@ async function ask() {
       html += '</div>';
     }
 
-    document.getElementById('result').innerHTML = html;
-  } catch(e) {
-    document.getElementById('result').innerHTML = `<div class="error">Error: ${e.message}</div>`;
-  } finally {
-    btn.disabled = false;
-    document.getElementById('spinner').style.display = 'none';
+    result.innerHTML = html;
+  } else if (event === 'token') {
+    document.getElementById('answerText').textContent += data.text;
+  } else if (event === 'done') {
+    document.getElementById('answerText').textContent = data.answer;
+    if (data.has_contradiction) {
+      document.getElementById('answerBanner').innerHTML = '<div class="contradiction-banner">⚠️ Contradictory information detected across sources — review carefully.</div>';
+    }
+    if (data.sources && data.sources.length) {
+      let html = `<div class="sources"><h3>Sources used${data.cached ? ' (cached answer)' : ''}</h3>`;
+      data.sources.forEach(s => { html += `<span class="source-tag">${escHtml(s)}</span>`; });
+      html += '</div>';
+      document.getElementById('answerSources').innerHTML = html;
+    }
+  } else if (event === 'error') {
+    result.innerHTML += `<div class="error">Error: ${escHtml(data.detail)}</div>`;
   }
 }
 
@@ -0,0 +1,106 @@
+"""
+Micro-batching of concurrent model calls on the event loop.
+
+MicroBatcher collects items submitted by concurrent coroutines and hands them to
+one batched call: a batch is sent when it reaches `max_size` items or `max_wait`
+seconds after its first item arrived, whichever comes first. Every caller gets
+back its own result (or the batch's exception).
+
+Used for query embeddings: many single-input requests to the embedding server
+become one request with a list input.
+
+  batch_size  histogram of items per batched call
+  wait        histogram of time an item spent waiting for its batch to be sent
+"""
+
+import asyncio
+import time
+
+from metrics import Histogram
+
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+class MicroBatcher:
+    """
+    fn: async callable, list of items → list of results in the same order.
+    max_size <= 1 or max_wait <= 0 sends every item on its own (no batching).
+    """
+
+    def __init__(self, fn, max_size: int, max_wait: float):
+        self._fn = fn
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._loop = None
+        self._pending: list = []  # (item, future, submitted_at)
+        self._timer = None
+        self._tasks: set = set()  # running batches (kept referenced until done)
+        self.batches = 0
+        self.items = 0
+        self.batch_size = Histogram(SIZE_BUCKETS)
+        self.wait = Histogram(WAIT_BUCKETS)
+
+    async def submit(self, item):
+        """Result for one item, computed as part of the next batch."""
+        if self.max_size <= 1 or self.max_wait <= 0:
+            self._record(1)
+            return (await self._fn([item]))[0]
+
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:  # pending state belongs to one event loop
+            self._loop, self._pending, self._timer = loop, [], None
+        future = loop.create_future()
+        self._pending.append((item, future, time.monotonic()))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list) -> None:
+        sent_at = time.monotonic()
+        for _, _, submitted_at in batch:
+            self.wait.observe(sent_at - submitted_at)
+        self._record(len(batch))
+        try:
+            results = await self._fn([item for item, _, _ in batch])
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        except BaseException:  # cancelled (shutdown) — the callers must not wait forever
+            self._fail(batch, RuntimeError("batch cancelled before it completed"))
+            raise
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():  # a caller that gave up (timeout, disconnect) is skipped
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: list, error: Exception) -> None:
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _record(self, size: int) -> None:
+        self.batches += 1
+        self.items += size
+        self.batch_size.observe(size)
+
+    def stats(self) -> dict:
+        return {
+            "batches":    self.batches,
+            "items":      self.items,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_size": self.batch_size.stats(),
+            "wait":       self.wait.stats(),
+        }
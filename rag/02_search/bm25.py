@@ -0,0 +1,185 @@
+"""
+BM25 module — inverted-index BM25 over a fixed corpus of texts.
+
+The index is built once in fit():
+  - vocabulary: term → term id
+  - postings:   CSR layout — for term t, documents postings_docs[ptr[t]:ptr[t+1]]
+                with term frequencies postings_tf[ptr[t]:ptr[t+1]]
+  - doc_norm:   per-document length normalisation k1 * (1 - b + b * dl / avgdl)
+
+Query-time scoring only touches the postings of the query terms, so the cost is
+proportional to the number of matching (term, document) pairs, not corpus size.
+
+top_k() additionally uses per-term score upper bounds (MaxScore): once the k-th
+best partial score beats everything the remaining terms could add, documents
+not already seen can no longer enter the top-k, and the rest of the postings
+are only probed for the surviving candidates.
+"""
+
+import math
+import numpy as np
+from collections import Counter
+
+
+class BM25:
+    """BM25 scorer backed by an inverted index with postings lists."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._n_docs: int = 0
+        self._avgdl: float = 1.0
+        self._vocab: dict[str, int] = {}
+        self._idf = np.zeros(0, dtype=np.float64)
+        self._postings_ptr = np.zeros(1, dtype=np.int64)
+        self._postings_docs = np.zeros(0, dtype=np.int32)
+        self._postings_tf = np.zeros(0, dtype=np.int32)
+        self._doc_norm = np.zeros(0, dtype=np.float64)
+        # max contribution of each term to any single document (MaxScore bound)
+        self._term_ub = np.zeros(0, dtype=np.float64)
+
+    def _tokenize(self, text: str) -> list[str]:
+        return text.lower().split()
+
+    def fit(self, texts: list[str]) -> None:
+        corpus = [self._tokenize(t) for t in texts]
+        N = len(corpus)
+        self._n_docs = N
+        self._avgdl = sum(len(d) for d in corpus) / N if N else 1.0
+
+        # term → list of (doc_id, tf), in doc_id order
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for doc_id, doc in enumerate(corpus):
+            for term, tf in Counter(doc).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        self._vocab = {term: i for i, term in enumerate(postings)}
+        df = np.array([len(p) for p in postings.values()], dtype=np.int64)
+        self._idf = np.array(
+            [math.log((N - freq + 0.5) / (freq + 0.5) + 1) for freq in df.tolist()],
+            dtype=np.float64,
+        )
+
+        self._postings_ptr = np.zeros(len(df) + 1, dtype=np.int64)
+        np.cumsum(df, out=self._postings_ptr[1:])
+        flat = [pair for plist in postings.values() for pair in plist]
+        pairs = np.array(flat, dtype=np.int32).reshape(-1, 2)
+        self._postings_docs = np.ascontiguousarray(pairs[:, 0])
+        self._postings_tf = np.ascontiguousarray(pairs[:, 1])
+
+        dl = np.array([len(d) for d in corpus], dtype=np.float64)
+        self._doc_norm = self.k1 * (1 - self.b + self.b * dl / self._avgdl)
+
+        # every term has at least one posting, so reduceat segments are non-empty
+        f = self._postings_tf.astype(np.float64)
+        term_of_posting = np.repeat(np.arange(len(df)), df)
+        contrib = self._idf[term_of_posting] * f * (self.k1 + 1) / (f + self._doc_norm[self._postings_docs])
+        self._term_ub = (
+            np.maximum.reduceat(contrib, self._postings_ptr[:-1])
+            if len(df) else np.zeros(0, dtype=np.float64)
+        )
+
+    def _postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self._postings_ptr[term_id], self._postings_ptr[term_id + 1]
+        return self._postings_docs[start:end], self._postings_tf[start:end]
+
+    def _term_contributions(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        """(doc_ids, per-document BM25 contribution) for one term."""
+        docs, tf = self._postings(term_id)
+        f = tf.astype(np.float64)
+        num = self._idf[term_id] * f * (self.k1 + 1)
+        den = f + self._doc_norm[docs]
+        return docs, num / den
+
+    def scores(self, query: str) -> np.ndarray:
+        out = np.zeros(self._n_docs, dtype=np.float32)
+        for term in self._tokenize(query):
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                continue
+            docs, contrib = self._term_contributions(term_id)
+            # doc ids are unique within a postings list, so fancy-index += is safe
+            out[docs] += contrib.astype(np.float32)
+        return out
+
+    def top_k(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return (doc_ids, scores) of the k best-scoring documents, best first.
+        Only documents with a non-zero score are returned.
+
+        Term-at-a-time MaxScore: terms are processed in decreasing order of their
+        upper bound. After each term, `rest` bounds what any document can still
+        gain from the remaining terms. Once the current k-th best partial score
+        is >= rest, unseen documents cannot beat it, so the remaining postings
+        are only probed for existing candidates, and candidates that cannot
+        reach the threshold are dropped.
+        """
+        term_ids = [
+            self._vocab[t] for t in self._tokenize(query) if t in self._vocab
+        ]
+        if k <= 0 or not term_ids:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+        term_ids.sort(key=lambda t: -self._term_ub[t])
+        ubs = self._term_ub[term_ids]
+        # remaining[i] = sum of upper bounds of terms after position i
+        remaining = np.concatenate([np.cumsum(ubs[::-1])[::-1][1:], [0.0]])
+
+        cand_ids = np.zeros(0, dtype=np.int32)
+        cand_scores = np.zeros(0, dtype=np.float64)
+        admitting = True
+
+        for i, term_id in enumerate(term_ids):
+            docs, contrib = self._term_contributions(term_id)
+            if admitting:
+                ids = np.concatenate([cand_ids, docs])
+                vals = np.concatenate([cand_scores, contrib])
+                cand_ids, inverse = np.unique(ids, return_inverse=True)
+                cand_scores = np.bincount(inverse, weights=vals, minlength=len(cand_ids))
+            elif len(cand_ids):
+                # postings are sorted by doc id → probe candidates by binary search
+                pos = np.searchsorted(docs, cand_ids)
+                pos[pos == len(docs)] = 0
+                hit = docs[pos] == cand_ids
+                cand_scores[hit] += contrib[pos[hit]]
+
+            rest = remaining[i]
+            if len(cand_ids) >= k:
+                threshold = np.partition(cand_scores, len(cand_scores) - k)[len(cand_scores) - k]
+                # strict: an unseen document could still tie the k-th one and win on doc id
+                if admitting and rest < threshold:
+                    admitting = False
+                if not admitting:
+                    keep = cand_scores + rest >= threshold
+                    cand_ids, cand_scores = cand_ids[keep], cand_scores[keep]
+
+        if len(cand_ids) > k:
+            # keep every document tied with the k-th score; the sort below cuts by doc id
+            kth = np.partition(cand_scores, len(cand_scores) - k)[len(cand_scores) - k]
+            keep = cand_scores >= kth
+            cand_ids, cand_scores = cand_ids[keep], cand_scores[keep]
+        # best first; ties broken by doc id for deterministic output
+        order = np.lexsort((cand_ids, -cand_scores))[:k]
+        return cand_ids[order].astype(np.int32), cand_scores[order].astype(np.float32)
+
+    # ─── Persistence (index snapshot) ────────────────────────────────────────
+
+    ARRAY_NAMES = ("idf", "postings_ptr", "postings_docs", "postings_tf", "doc_norm", "term_ub")
+
+    def to_state(self) -> tuple[dict, dict[str, np.ndarray], list[str]]:
+        """(scalar params, named arrays, vocabulary in term-id order) for saving."""
+        params = {"k1": self.k1, "b": self.b, "n_docs": self._n_docs, "avgdl": self._avgdl}
+        arrays = {name: getattr(self, f"_{name}") for name in self.ARRAY_NAMES}
+        vocab = sorted(self._vocab, key=self._vocab.__getitem__)
+        return params, arrays, vocab
+
+    @classmethod
+    def from_state(cls, params: dict, arrays: dict[str, np.ndarray], vocab: list[str]) -> "BM25":
+        """Rebuild a fitted scorer; arrays may be read-only memory maps."""
+        bm25 = cls(k1=params["k1"], b=params["b"])
+        bm25._n_docs = params["n_docs"]
+        bm25._avgdl = params["avgdl"]
+        bm25._vocab = {term: i for i, term in enumerate(vocab)}
+        for name in cls.ARRAY_NAMES:
+            setattr(bm25, f"_{name}", arrays[name])
+        return bm25
@@ -0,0 +1,269 @@
+"""
+Query caches — bounded, thread-safe, LRU with an optional time-to-live.
+
+  LRUCache     per-query model results in retrieval (query embeddings, LLM tag
+               sets), keyed on normalised query text
+  AnswerCache  generated answers, matched by question-embedding similarity for
+               the same retrieved document set and index version
+  FileCache    rendered knowledge-base file contents for generation, bounded by
+               bytes and valid while the file's mtime/size are unchanged
+
+Eviction: when full, the least recently used entry goes; entries older than
+`ttl` seconds are dropped on access. Counters are exposed via stats().
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+_MISSING = object()
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: case-folded, whitespace collapsed."""
+    return " ".join(text.casefold().split())
+
+
+class LRUCache:
+    """LRU + TTL map. maxsize <= 0 disables caching; ttl <= 0 means no expiry."""
+
+    def __init__(self, maxsize: int, ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()  # key → (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            stored_at, value = entry
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key, default=None):
+        """Value without touching counters or recency (expired entries count as absent)."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or (self.ttl > 0 and time.monotonic() - entry[0] > self.ttl):
+                return default
+            return entry[1]
+
+    def put(self, key, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size":        len(self._data),
+                "maxsize":     self.maxsize,
+                "ttl":         self.ttl,
+                "hits":        self.hits,
+                "misses":      self.misses,
+                "evictions":   self.evictions,
+                "expirations": self.expirations,
+                "hit_rate":    round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# ─── Semantic answer cache ────────────────────────────────────────────────────
+
+def _file_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class AnswerCache:
+    """
+    Generated answers reused across near-duplicate questions.
+
+    An entry matches when its exact `key` (index version, retrieved document set,
+    generation options) is equal and the cosine similarity of the question
+    embeddings is at least `threshold`. Entries remember the mtime/size of the
+    files they were generated from and are dropped once any of them changes.
+    LRU eviction beyond maxsize; ttl <= 0 means no expiry.
+    """
+
+    def __init__(self, maxsize: int, threshold: float, ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        # entry id → (stored_at, key, normalised query vec, {path: stamp}, value)
+        self._data: OrderedDict = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(vec: np.ndarray) -> np.ndarray:
+        return np.asarray(vec, dtype=np.float32) / (np.linalg.norm(vec) + 1e-9)
+
+    def get(self, query_vec: np.ndarray, key):
+        if self.maxsize <= 0:
+            return None
+        q = self._unit(query_vec)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_sim = None, self.threshold
+            for entry_id, (stored_at, entry_key, vec, stamps, _) in list(self._data.items()):
+                if self.ttl > 0 and now - stored_at > self.ttl:
+                    del self._data[entry_id]
+                    self.invalidations += 1
+                    continue
+                if entry_key != key:
+                    continue
+                sim = float(vec @ q)
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+            if best_id is not None:
+                stamps = self._data[best_id][3]
+                if any(_file_stamp(p) != s for p, s in stamps.items()):
+                    del self._data[best_id]  # knowledge-base file edited since
+                    self.invalidations += 1
+                    best_id = None
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(best_id)
+            self.hits += 1
+            return self._data[best_id][4]
+
+    def put(self, query_vec: np.ndarray, key, value, files: list[Path]) -> None:
+        if self.maxsize <= 0:
+            return
+        stamps = {Path(p): _file_stamp(Path(p)) for p in files}
+        with self._lock:
+            self._data[self._next_id] = (time.monotonic(), key, self._unit(query_vec), stamps, value)
+            self._next_id += 1
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size":          len(self._data),
+                "maxsize":       self.maxsize,
+                "threshold":     self.threshold,
+                "hits":          self.hits,
+                "misses":        self.misses,
+                "evictions":     self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate":      round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# ─── File content cache ───────────────────────────────────────────────────────
+
+class FileCache:
+    """
+    Rendered file contents keyed on path, LRU-bounded by total size.
+
+    An entry is only returned while the file's (mtime_ns, size) still equal the
+    stamp it was stored with; a changed file counts as an invalidation + miss.
+    Callers stamp before reading, so a write racing the read is caught on the
+    next lookup. Entries larger than max_bytes are not kept; max_bytes <= 0
+    disables caching.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data: OrderedDict = OrderedDict()  # path → (stamp, content, nbytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(self, path: Path) -> tuple[tuple[int, int] | None, str | None]:
+        """(current stamp of path — None if unreadable, cached content if still valid)."""
+        stamp = _file_stamp(path)
+        with self._lock:
+            entry = self._data.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._data.move_to_end(path)
+                self.hits += 1
+                return stamp, entry[1]
+            if entry is not None:
+                del self._data[path]  # edited, replaced or deleted since
+                self.bytes -= entry[2]
+                self.invalidations += 1
+            self.misses += 1
+            return stamp, None
+
+    def put(self, path: Path, stamp: tuple[int, int] | None, content: str) -> None:
+        nbytes = sys.getsizeof(content)
+        if stamp is None or nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(path, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._data[path] = (stamp, content, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, _, freed) = self._data.popitem(last=False)
+                self.bytes -= freed
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size":          len(self._data),
+                "bytes":         self.bytes,
+                "max_bytes":     self.max_bytes,
+                "hits":          self.hits,
+                "misses":        self.misses,
+                "evictions":     self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate":      round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -7,30 +7,41 @@ Improvements over v1:
     well-supported; if confidence < CONFIDENCE_THRESHOLD → return IDK
   - Low retrieval score signal: if max retrieval score < MIN_RETRIEVAL_SCORE,
     adds a caution hint to the generation prompt
+  - File cache: rendered, truncated file contents are kept (FILE_CACHE_BYTES)
+    until the file's mtime/size change; misses are read in parallel
 """
 
+import asyncio
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from openai import OpenAI
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from config import LLM_BASE_URL, LLM_MODEL, KB_PATH, MIN_RETRIEVAL_SCORE
-
-llm = OpenAI(base_url=LLM_BASE_URL, api_key="dummy")
+sys.path.insert(0, str(Path(__file__).parent))
+from admission import llm_slots
+from cache import FileCache
+from clients import async_llm_client
+from metrics import record_usage, stage
+from config import (
+    LLM_MODEL, KB_PATH, MIN_RETRIEVAL_SCORE, CONTEXT_DEPTH,
+    FILE_CACHE_BYTES, FILE_LOAD_WORKERS,
+)
+
+allm = async_llm_client()
 
 MAX_FILE_CHARS = 8000   # per-file content limit to stay within context
 
 IDK_ANSWER = "I don't have enough information to answer this question based on the available knowledge base."
 
+# Popular files are rendered once and reused until they change on disk
+_file_cache = FileCache(FILE_CACHE_BYTES)
+_io_pool = ThreadPoolExecutor(max_workers=FILE_LOAD_WORKERS, thread_name_prefix="load_file")
 
-def _load_file(filepath: str) -> str:
-    """Load raw file content, with JSON formatting for Slack exports."""
-    path = KB_PATH / filepath
-    if not path.exists():
-        return f"[File not found: {filepath}]"
 
+def _render_file(path: Path) -> str:
+    """Raw file content, with JSON formatting for Slack exports."""
     if path.suffix == ".json":
         try:
             data = json.loads(path.read_text(encoding="utf-8"))
@@ -46,19 +57,63 @@ def _load_file(filepath: str) -> str:
         except Exception:
             pass
 
+    return path.read_text(encoding="utf-8")
+
+
+def _read_file(path: Path, stamp: tuple[int, int] | None) -> str:
+    """Render and truncate a file, then cache it under the stamp taken before reading."""
     try:
-        return path.read_text(encoding="utf-8")
+        content = _render_file(path)
     except Exception as e:
-        return f"[Could not read: {e}]"
+        return f"[Could not read: {e}]"  # not cached — retried on the next request
+    if len(content) > MAX_FILE_CHARS:
+        content = content[:MAX_FILE_CHARS] + "\n[... truncated ...]"
+    _file_cache.put(path, stamp, content)
+    return content
 
 
-def _build_context(retrieved: list[dict]) -> str:
-    parts = []
-    for i, doc in enumerate(retrieved, 1):
-        content = _load_file(doc["filepath"])
-        if len(content) > MAX_FILE_CHARS:
-            content = content[:MAX_FILE_CHARS] + "\n[... truncated ...]"
+def _load_files(filepaths: list[str]) -> list[str]:
+    """
+    Prompt-ready content of each file, in order: cached while the file's mtime/size
+    are unchanged, cache misses read in parallel on the I/O pool.
+    """
+    paths = [KB_PATH / f for f in filepaths]
+    found = [_file_cache.lookup(path) for path in paths]
+    contents = [
+        f"[File not found: {f}]" if stamp is None else content
+        for f, (stamp, content) in zip(filepaths, found)
+    ]
+    misses = [i for i, content in enumerate(contents) if content is None]
+    if len(misses) == 1:
+        i = misses[0]
+        contents[i] = _read_file(paths[i], found[i][0])
+    elif misses:
+        loaded = _io_pool.map(lambda i: _read_file(paths[i], found[i][0]), misses)
+        for i, content in zip(misses, loaded):
+            contents[i] = content
+    return contents
+
+
+def file_cache_stats() -> dict:
+    return _file_cache.stats()
+
+
+def context_docs(retrieved: list[dict], depth: int | None = None) -> list[dict]:
+    """The documents that go into the prompt: the first `depth` (default CONTEXT_DEPTH, 0 = all)."""
+    depth = CONTEXT_DEPTH if depth is None else depth
+    return retrieved[:depth] if depth > 0 else retrieved
+
+
+async def _abuild_context(retrieved: list[dict]) -> str:
+    """Prompt context for the retrieved docs; the file I/O runs off the event loop."""
+    with stage("load_files"):
+        contents = await asyncio.to_thread(_load_files, [doc["filepath"] for doc in retrieved])
+    return _format_context(retrieved, contents)
 
+
+def _format_context(retrieved: list[dict], contents: list[str]) -> str:
+    parts = []
+    for i, (doc, content) in enumerate(zip(retrieved, contents), 1):
         meta = []
         if doc.get("last_modified"):
             meta.append(f"last_modified={doc['last_modified']}")
@@ -109,18 +164,7 @@ def _detect_contradictions(retrieved: list[dict]) -> bool:
     return False
 
 
-def generate(query: str, retrieved: list[dict], max_retrieval_score: float = 1.0) -> dict:
-    """Generate answer from retrieved documents."""
-    if not retrieved:
-        return {
-            "answer": IDK_ANSWER,
-            "sources": [],
-            "has_contradiction": False,
-        }
-
-    context = _build_context(retrieved)
-    sources_list = [doc["filepath"] for doc in retrieved]
-
+def _messages(query: str, context: str, max_retrieval_score: float) -> list[dict]:
     # Low retrieval score → hint the LLM to be conservative
     low_confidence = max_retrieval_score < MIN_RETRIEVAL_SCORE
     retrieval_hint = LOW_CONFIDENCE_HINT if low_confidence else ""
@@ -132,20 +176,18 @@ Question: {query}
 
 Answer the question based strictly on the source documents above."""
 
-    response = llm.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_message},
-        ],
-        temperature=0.1,
-        max_tokens=1500,
-    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_message},
+    ]
 
-    raw = response.choices[0].message.content or ""
+
+def _strip_thinking(raw: str) -> str:
     # strip Qwen3 thinking blocks <think>...</think>
-    answer = re.sub(r"<think>.*?</think>\s*", "", raw, flags=re.DOTALL).strip()
+    return re.sub(r"<think>.*?</think>\s*", "", raw, flags=re.DOTALL).strip()
 
+
+def _result(answer: str, retrieved: list[dict]) -> dict:
     # Contradiction detection: keyword matching
     contradiction_keywords = [
         "contradict", "conflict", "disagree", "inconsistent",
@@ -161,6 +203,107 @@ Answer the question based strictly on the source documents above."""
 
     return {
         "answer": answer,
-        "sources": sources_list,
+        "sources": [doc["filepath"] for doc in retrieved],
         "has_contradiction": has_contradiction,
     }
+
+
+async def agenerate(
+    query: str,
+    retrieved: list[dict],
+    max_retrieval_score: float = 1.0,
+    context_depth: int | None = None,
+) -> dict:
+    """Generate answer from the first context_depth retrieved documents (see context_docs)."""
+    retrieved = context_docs(retrieved, context_depth)
+    if not retrieved:
+        return {
+            "answer": IDK_ANSWER,
+            "sources": [],
+            "has_contradiction": False,
+        }
+
+    messages = _messages(query, await _abuild_context(retrieved), max_retrieval_score)
+    with stage("generate"):
+        async with llm_slots.aslot():
+            response = await allm.chat.completions.create(
+                model=LLM_MODEL,
+                messages=messages,
+                temperature=0.1,
+                max_tokens=1500,
+            )
+    record_usage("generate", response.usage)
+
+    raw = response.choices[0].message.content or ""
+    return _result(_strip_thinking(raw), retrieved)
+
+
+# ─── Streaming ────────────────────────────────────────────────────────────────
+
+_THINK_OPEN = "<think>"
+
+
+def _visible_prefix(raw: str) -> str:
+    """Part of a partial completion that is safe to show: no thinking blocks, no half tags."""
+    text = re.sub(r"<think>.*?</think>\s*", "", raw, flags=re.DOTALL)
+    cut = text.find(_THINK_OPEN)
+    if cut >= 0:
+        text = text[:cut]  # inside an unfinished thinking block
+    for i in range(len(_THINK_OPEN) - 1, 0, -1):
+        if text.endswith(_THINK_OPEN[:i]):
+            text = text[:-i]  # may be the start of a <think> tag
+            break
+    return text.lstrip()
+
+
+class _StreamText:
+    """Accumulates streamed deltas; feed() returns the newly showable text."""
+
+    def __init__(self):
+        self.raw = ""
+        self.sent = ""
+
+    def feed(self, delta: str | None) -> str:
+        self.raw += delta or ""
+        visible = _visible_prefix(self.raw)
+        if len(visible) > len(self.sent) and visible.startswith(self.sent):
+            new, self.sent = visible[len(self.sent):], visible
+            return new
+        return ""
+
+
+async def agenerate_stream(
+    query: str,
+    retrieved: list[dict],
+    max_retrieval_score: float = 1.0,
+    context_depth: int | None = None,
+):
+    """
+    agenerate() as a stream of events (async generator):
+      {"type": "token", "text": ...}   answer text as the LLM produces it
+      {"type": "done", **agenerate() result}   final answer, sources, has_contradiction
+    """
+    retrieved = context_docs(retrieved, context_depth)
+    if not retrieved:
+        yield {"type": "token", "text": IDK_ANSWER}
+        yield {"type": "done", "answer": IDK_ANSWER, "sources": [], "has_contradiction": False}
+        return
+
+    messages = _messages(query, await _abuild_context(retrieved), max_retrieval_score)
+    tokens = _StreamText()
+    with stage("generate"):
+        async with llm_slots.aslot():  # held until the completion has been read to the end
+            stream = await allm.chat.completions.create(
+                model=LLM_MODEL,
+                messages=messages,
+                temperature=0.1,
+                max_tokens=1500,
+                stream=True,
+                stream_options={"include_usage": True},  # usage arrives in a last, choice-less chunk
+            )
+            async for chunk in stream:
+                record_usage("generate", chunk.usage)
+                if chunk.choices and (text := tokens.feed(chunk.choices[0].delta.content)):
+                    yield {"type": "token", "text": text}
+
+    yield {"type": "done", **_result(_strip_thinking(tokens.raw), retrieved)}
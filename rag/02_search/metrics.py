@@ -0,0 +1,266 @@
+"""
+In-process metrics — cheap enough to update on every request.
+
+  Histogram        fixed-bucket latency/size distribution: count, sum and cumulative
+                   bucket counts, with approximate quantiles for /stats
+  HistogramFamily  one Histogram per label value (pipeline stage, endpoint)
+  CounterFamily    monotonic counters keyed by label values (LLM tokens)
+  Trace / stage()  per-request stage durations, see below
+
+Everything renders to the Prometheus text format (0.0.4) for GET /metrics.
+"""
+
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds — from sub-millisecond cache hits to multi-second generations
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    """Counts of observations per bucket (upper bounds, inclusive) plus +Inf."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """[(upper bound, observations ≤ bound)], ending with (inf, count)."""
+        with self._lock:
+            counts = list(self._counts)
+        total, out = 0, []
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            total += n
+            out.append((bound, total))
+        return out
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (0 when empty)."""
+        cum = self.cumulative()
+        total = cum[-1][1]
+        if not total:
+            return 0.0
+        rank = q * total
+        for bound, n in cum:
+            if n >= rank:
+                return bound if bound != math.inf else self.buckets[-1]
+        return self.buckets[-1]
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "mean":  round(self.mean(), 6),
+            "p50":   self.quantile(0.50),
+            "p95":   self.quantile(0.95),
+            "p99":   self.quantile(0.99),
+        }
+
+
+class HistogramFamily:
+    """Histograms of one metric, one per label value (e.g. per pipeline stage)."""
+
+    def __init__(self, name: str, help: str, label: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._children: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value: str) -> Histogram:
+        hist = self._children.get(value)
+        if hist is None:
+            with self._lock:
+                hist = self._children.setdefault(value, Histogram(self.buckets))
+        return hist
+
+    def stats(self) -> dict:
+        return {value: hist.stats() for value, hist in sorted(self._children.items())}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value, hist in sorted(self._children.items()):
+            lines += _histogram_lines(self.name, {self.label: value}, hist)
+        return lines
+
+
+class CounterFamily:
+    """Monotonic counters of one metric keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values: tuple, amount: float = 1) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def items(self) -> list[tuple[tuple, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in self.items():
+            lines.append(f"{self.name}{_labels(dict(zip(self.label_names, values)))} {_number(total)}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _histogram_lines(name: str, labels: dict, hist: Histogram) -> list[str]:
+    cum = hist.cumulative()
+    lines = [
+        f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {n}"
+        for bound, n in cum
+    ]
+    lines.append(f"{name}_sum{_labels(labels)} {_number(hist.sum)}")
+    lines.append(f"{name}_count{_labels(labels)} {cum[-1][1]}")
+    return lines
+
+
+def render_histogram(name: str, help: str, label: str, hists: dict[str, Histogram]) -> list[str]:
+    """Prometheus lines for histograms kept elsewhere (e.g. admission queue waits)."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+    for value, hist in sorted(hists.items()):
+        lines += _histogram_lines(name, {label: value}, hist)
+    return lines
+
+
+def render_values(name: str, help: str, kind: str, label: str, values: dict[str, float]) -> list[str]:
+    """Prometheus lines for {label value: number} read at scrape time (kind: gauge | counter)."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for value, number in sorted(values.items()):
+        lines.append(f"{name}{_labels({label: value})} {_number(number)}")
+    return lines
+
+
+# ─── Per-request stage timings ────────────────────────────────────────────────
+#
+#   with stage("bm25"): ...     observe the block's duration in the stage histogram
+#                               and add it to the current request's Trace, if any
+#   record_usage("generate", response.usage)   token counters (+ the request's Trace)
+#
+# The Trace is a context variable like the admission priority: the API starts one
+# per request and every task / worker thread started from that context shares it.
+
+STAGE_SECONDS = HistogramFamily(
+    "rag_stage_duration_seconds", "Time spent in each query pipeline stage.", "stage",
+)
+REQUEST_SECONDS = HistogramFamily(
+    "rag_request_duration_seconds", "End-to-end query latency per endpoint.", "endpoint",
+)
+LLM_TOKENS = CounterFamily(
+    "rag_llm_tokens_total", "Tokens reported by LLM responses.", ("call", "kind"),
+)
+
+
+class Trace:
+    """Stage durations (ms, summed when a stage runs more than once) and LLM token counts of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.tokens: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    def add_tokens(self, kind: str, n: int) -> None:
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + n
+
+    def finish(self, endpoint: str) -> dict[str, float]:
+        """Record the request's total latency → {stage: ms, ..., "total": ms}."""
+        total = time.perf_counter() - self.started
+        REQUEST_SECONDS.labels(endpoint).observe(total)
+        with self._lock:
+            timings = {name: round(ms, 2) for name, ms in self.stages.items()}
+        timings["total"] = round(total * 1000, 2)
+        return timings
+
+
+_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace() -> Trace:
+    """New Trace for the current request (context)."""
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+
+@contextmanager
+def stage(name: str):
+    trace = _trace.get()  # at entry — a generator's body may resume in another context
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        if trace is not None:
+            trace.add(name, elapsed)
+
+
+def record_usage(call: str, usage) -> None:
+    """Count prompt/completion tokens of an LLM response (usage may be None)."""
+    if usage is None:
+        return
+    trace = _trace.get()
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = getattr(usage, kind, None) or 0
+        if n:
+            LLM_TOKENS.inc((call, kind.removesuffix("_tokens")), n)
+            if trace is not None:
+                trace.add_tokens(kind.removesuffix("_tokens"), n)
+
+
+def stage_stats() -> dict:
+    """Latency histograms per stage / endpoint and token totals, for /stats."""
+    tokens: dict[str, dict] = {}
+    for (call, kind), n in LLM_TOKENS.items():
+        tokens.setdefault(call, {})[kind] = int(n)
+    return {
+        "stages":   STAGE_SECONDS.stats(),
+        "requests": REQUEST_SECONDS.stats(),
+        "tokens":   tokens,
+    }
@@ -0,0 +1,82 @@
+"""
+Compact embedding codes for candidate scoring — selected via EMBEDDING_STORAGE.
+
+  float32 — no codes; candidates are scored on the normalised matrix itself
+  float16 — 2 bytes/dim   (2× smaller)
+  int8    — symmetric per-dimension scalar quantization, 1 byte/dim   (4× smaller)
+  binary  — sign bits packed 8 per byte, 1 bit/dim   (32× smaller);
+            cosine estimated from the Hamming distance: cos(π · hamming / dim)
+
+Candidates are ranked on the codes; the best RESCORE_DEPTH are then rescored
+exactly against the float32 matrix. With a memory-mapped snapshot only those
+rows are paged in, so the resident cost per document is the code size.
+"""
+
+import numpy as np
+
+KINDS = ("float32", "float16", "int8", "binary")
+SCORE_CHUNK = 65536
+
+# popcount of every byte value — works on any NumPy version
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class VectorCodes:
+    """Quantized copy of a normalised embedding matrix."""
+
+    def __init__(self, kind: str, arrays: dict[str, np.ndarray], dim: int):
+        if kind not in KINDS or kind == "float32":
+            raise ValueError(f"Unknown EMBEDDING_STORAGE for codes: {kind!r}")
+        self.kind = kind
+        self.dim = dim
+        self.codes = arrays["codes"]
+        self.scale = arrays.get("scale")
+
+    @staticmethod
+    def encode(kind: str, embeddings: np.ndarray) -> dict[str, np.ndarray]:
+        """{array name: array} for kind, encoded in chunks (works on memory maps)."""
+        n, dim = embeddings.shape
+        if kind == "float16":
+            return {"codes": np.asarray(embeddings, dtype=np.float16)}
+        if kind == "int8":
+            scale = np.zeros(dim, dtype=np.float32)
+            for start in range(0, n, SCORE_CHUNK):
+                chunk = np.abs(np.asarray(embeddings[start:start + SCORE_CHUNK]))
+                np.maximum(scale, chunk.max(axis=0), out=scale)
+            scale = np.where(scale > 0, scale / 127.0, 1.0).astype(np.float32)
+            codes = np.empty((n, dim), dtype=np.int8)
+            for start in range(0, n, SCORE_CHUNK):
+                chunk = np.asarray(embeddings[start:start + SCORE_CHUNK]) / scale
+                codes[start:start + len(chunk)] = np.clip(np.rint(chunk), -127, 127)
+            return {"codes": codes, "scale": scale}
+        if kind == "binary":
+            codes = np.empty((n, (dim + 7) // 8), dtype=np.uint8)
+            for start in range(0, n, SCORE_CHUNK):
+                chunk = np.asarray(embeddings[start:start + SCORE_CHUNK])
+                codes[start:start + len(chunk)] = np.packbits(chunk > 0, axis=1)
+            return {"codes": codes}
+        raise ValueError(f"Unknown EMBEDDING_STORAGE for codes: {kind!r}")
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0))
+
+    def _score_block(self, block: np.ndarray, q: np.ndarray) -> np.ndarray:
+        if self.kind == "float16":
+            return block.astype(np.float32) @ q
+        if self.kind == "int8":
+            return block.astype(np.float32) @ (q * self.scale)
+        # binary
+        q_bits = np.packbits(q > 0)
+        hamming = POPCOUNT[np.bitwise_xor(block, q_bits)].sum(axis=1, dtype=np.int32)
+        return np.cos(np.pi * hamming / self.dim).astype(np.float32)
+
+    def scores(self, q: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """Approximate cosine similarity of normalised q to all rows (or the given rows)."""
+        if rows is not None:
+            return self._score_block(self.codes[rows], q)
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_CHUNK):
+            block = self.codes[start:start + SCORE_CHUNK]
+            out[start:start + len(block)] = self._score_block(block, q)
+        return out
@@ -2,10 +2,13 @@
 Sort-only reranker with conflict-pair promotion.
 
 Flow:
-  1. Sort retrieved docs by relevance (LLM looks at descriptions)
+  1. Sort the first RERANK_DEPTH retrieved docs by relevance (LLM looks at
+     descriptions); the rest keep their retrieval order behind them
   2. If both docs in a conflict pair are retrieved → promote both to front
-     (ensures LLM sees contradicting docs first and always detects the conflict)
-  3. Pass ALL sorted docs to generator (no filtering — needed for contradiction detection)
+     (ensures LLM sees contradicting docs first and always detects the conflict,
+     and that both survive a CONTEXT_DEPTH cut)
+  3. Pass the sorted docs to generator — all of them unless CONTEXT_DEPTH limits
+     the prompt (no relevance filtering — needed for contradiction detection)
 
 Why not filter/stop early:
   - Contradiction detection requires BOTH conflicting docs in context.
@@ -14,27 +17,23 @@ Why not filter/stop early:
 
 import json
 from pathlib import Path
-from openai import OpenAI
 
 import sys
 _HERE = Path(__file__).parent
 sys.path.insert(0, str(_HERE.parent))  # rag/ — for config
-sys.path.insert(0, str(_HERE))         # 02_search/ — for generator, retrieval
-from config import LLM_BASE_URL, LLM_MODEL
-from generator import generate, SYSTEM_PROMPT
+sys.path.insert(0, str(_HERE))         # 02_search/ — for admission, generator, metrics, retrieval
+from admission import Overloaded, llm_slots
+from clients import async_llm_client
+from config import LLM_MODEL, RERANK_DEPTH
+from generator import agenerate, SYSTEM_PROMPT, IDK_ANSWER
+from metrics import record_usage, stage
 from retrieval import get_conflict_pairs
 
-llm = OpenAI(base_url=LLM_BASE_URL, api_key="dummy")
+allm = async_llm_client()
 
 
-def sort_by_relevance(query: str, retrieved: list[dict]) -> list[dict]:
-    """
-    Ask LLM to sort retrieved docs by relevance to query.
-    Returns same list in relevance order (no filtering — just reordering).
-    """
-    if len(retrieved) <= 1:
-        return retrieved
-
+def _sort_request(query: str, retrieved: list[dict]) -> dict:
+    """Chat completion arguments asking the LLM to order the documents."""
     candidates = "\n".join(
         f"{i}: [{doc['filepath']}] {doc['description'][:120]}"
         for i, doc in enumerate(retrieved)
@@ -50,27 +49,54 @@ Documents:
 
 Return JSON: {{"order": [most_relevant_idx, ..., least_relevant_idx]}}"""
 
-    try:
-        response = llm.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "/no_think"},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.0,
-            max_tokens=150,
-            response_format={"type": "json_object"},
-        )
-        result = json.loads(response.choices[0].message.content)
-        order = result.get("order", [])
-        valid = [i for i in order if isinstance(i, int) and 0 <= i < len(retrieved)]
-
-        # Add any missing indices at the end
-        missing = [i for i in range(len(retrieved)) if i not in valid]
-        full_order = valid + missing
-
-        return [retrieved[i] for i in full_order]
+    return dict(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": "/no_think"},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.0,
+        max_tokens=max(150, 5 * len(retrieved)),  # room for every index at larger depths
+        response_format={"type": "json_object"},
+    )
+
+
+def _apply_order(retrieved: list[dict], response) -> list[dict]:
+    record_usage("rerank", response.usage)
+    result = json.loads(response.choices[0].message.content)
+    order = result.get("order", [])
+    valid = [i for i in order if isinstance(i, int) and 0 <= i < len(retrieved)]
+
+    # Add any missing indices at the end
+    missing = [i for i in range(len(retrieved)) if i not in valid]
+    full_order = valid + missing
+
+    return [retrieved[i] for i in full_order]
 
+
+def _rerank_window(retrieved: list[dict], depth: int | None) -> tuple[list[dict], list[dict]]:
+    """(docs the LLM sorts, docs that keep their retrieval order) — depth default RERANK_DEPTH, 0 = all."""
+    depth = RERANK_DEPTH if depth is None else depth
+    if depth <= 0:
+        return retrieved, []
+    return retrieved[:depth], retrieved[depth:]
+
+
+async def asort_by_relevance(query: str, retrieved: list[dict], depth: int | None = None) -> list[dict]:
+    """
+    Ask LLM to sort the first `depth` retrieved docs by relevance to query.
+    Returns same list in relevance order (no filtering — just reordering).
+    """
+    head, tail = _rerank_window(retrieved, depth)
+    if len(head) <= 1:
+        return retrieved
+    try:
+        with stage("rerank"):
+            async with llm_slots.aslot():
+                response = await allm.chat.completions.create(**_sort_request(query, head))
+        return _apply_order(head, response) + tail
+    except Overloaded:
+        raise  # no model capacity — the API answers 429/503
     except Exception as e:
         print(f"[Reranker sort warning] {e}")
         return retrieved
@@ -102,24 +128,33 @@ def _promote_conflict_pairs(sorted_docs: list[dict]) -> list[dict]:
     return front + rest
 
 
-def iterative_rerank_and_generate(query: str, retrieved: list[dict]) -> dict:
+async def arerank(query: str, retrieved: list[dict], depth: int | None = None) -> list[dict]:
+    """Relevance sort + conflict-pair promotion — the context order used for generation."""
+    return _promote_conflict_pairs(await asort_by_relevance(query, retrieved, depth))
+
+
+async def aiterative_rerank_and_generate(
+    query: str,
+    retrieved: list[dict],
+    rerank_depth: int | None = None,
+    context_depth: int | None = None,
+) -> dict:
     """
-    Sort docs by relevance, promote conflict pairs to front, then pass ALL
-    sorted docs to generator.
+    Sort docs by relevance, promote conflict pairs to front, then pass the
+    sorted docs to generator (the first context_depth of them).
     """
     if not retrieved:
         return {
-            "answer": "I don't have enough information to answer this question based on the available knowledge base.",
+            "answer": IDK_ANSWER,
             "sources": [],
             "has_contradiction": False,
             "context_size": 0,
         }
 
-    sorted_docs = sort_by_relevance(query, retrieved)
-    sorted_docs = _promote_conflict_pairs(sorted_docs)
+    sorted_docs = await arerank(query, retrieved, rerank_depth)
 
     max_score = max(doc["score"] for doc in sorted_docs) if sorted_docs else 0.0
-    result = generate(query, sorted_docs, max_retrieval_score=max_score)
-    result["context_size"] = len(sorted_docs)
+    result = await agenerate(query, sorted_docs, max_retrieval_score=max_score, context_depth=context_depth)
+    result["context_size"] = len(result["sources"])
     result["sorted_sources"] = [d["filepath"] for d in sorted_docs]
     return result
@@ -7,71 +7,62 @@ Scoring per file:
               + BM25_WEIGHT   * bm25_normalized(query, description)
 """
 
+import asyncio
+import contextvars
+import hashlib
 import json
-import csv
 import math
+import threading
+import time
 import numpy as np
-from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from pathlib import Path
-from openai import OpenAI
 
 import sys
-sys.path.insert(0, str(Path(__file__).parent.parent))
+_HERE = Path(__file__).parent
+sys.path.insert(0, str(_HERE.parent))  # rag/ — for config
+sys.path.insert(0, str(_HERE))         # 02_search/ — for admission, ann, batching, bm25, cache, metrics, quantize, snapshot
+from admission import Overloaded, llm_slots, embed_slots
+from ann import build_vector_index, top_k_indices
+from batching import MicroBatcher
+from bm25 import BM25
+from cache import LRUCache, normalize_query
+from metrics import record_usage, stage
+from quantize import POPCOUNT
+from snapshot import (
+    read_snapshot, publish_snapshot, read_metadata_csv, normalize_rows, memory_usage,
+    cached_arrays, source_fingerprint, snapshot_id,
+)
+from clients import llm_client, embed_client, async_llm_client, async_embed_client
 from config import (
-    LLM_BASE_URL, LLM_MODEL,
-    EMBED_BASE_URL, EMBED_MODEL,
-    METADATA_CSV, MASTER_TAGS_JSON,
+    LLM_MODEL, EMBED_MODEL,
+    METADATA_CSV, MASTER_TAGS_JSON, INDEX_SNAPSHOT_DIR, INDEX_SHARED,
     TOP_K, VECTOR_WEIGHT, TAG_WEIGHT, BM25_WEIGHT, MIN_SCORE,
+    BM25_CANDIDATES, VECTOR_CANDIDATES,
+    EMBED_TIMEOUT, TAG_TIMEOUT, RETRIEVAL_WORKERS, BATCH_SIMS_MB,
+    QUERY_CACHE_SIZE, QUERY_CACHE_TTL, INDEX_WATCH_INTERVAL,
+    EMBED_BATCH_SIZE, EMBED_BATCH_MAX, EMBED_BATCH_WAIT_MS,
+    TAG_MODE, TAG_LOCAL_MAX, TAG_LOCAL_MIN, TAG_LOCAL_MARGIN,
 )
 
-llm = OpenAI(base_url=LLM_BASE_URL, api_key="dummy")
-embedder = OpenAI(base_url=EMBED_BASE_URL, api_key="dummy")
-
-
-# ─── BM25 ─────────────────────────────────────────────────────────────────────
-
-class BM25:
-    """Simple BM25 scorer over a fixed corpus of texts."""
-
-    def __init__(self, k1: float = 1.5, b: float = 0.75):
-        self.k1 = k1
-        self.b = b
-        self._corpus: list[list[str]] = []
-        self._idf: dict[str, float] = {}
-        self._avgdl: float = 1.0
-
-    def _tokenize(self, text: str) -> list[str]:
-        return text.lower().split()
-
-    def fit(self, texts: list[str]) -> None:
-        self._corpus = [self._tokenize(t) for t in texts]
-        N = len(self._corpus)
-        self._avgdl = sum(len(d) for d in self._corpus) / N if N else 1.0
-
-        df: dict[str, int] = {}
-        for doc in self._corpus:
-            for term in set(doc):
-                df[term] = df.get(term, 0) + 1
-
-        self._idf = {
-            term: math.log((N - freq + 0.5) / (freq + 0.5) + 1)
-            for term, freq in df.items()
-        }
-
-    def scores(self, query: str) -> np.ndarray:
-        tokens = self._tokenize(query)
-        out = np.zeros(len(self._corpus), dtype=np.float32)
-        for i, doc in enumerate(self._corpus):
-            dl = len(doc)
-            tf = Counter(doc)
-            for term in tokens:
-                if term not in self._idf:
-                    continue
-                f = tf.get(term, 0)
-                num = self._idf[term] * f * (self.k1 + 1)
-                den = f + self.k1 * (1 - self.b + self.b * dl / self._avgdl)
-                out[i] += num / den
-        return out
+llm = llm_client()
+embedder = embed_client()
+# async twins for the API's request path — one event loop holds many queries in flight
+allm = async_llm_client()
+aembedder = async_embed_client()
+
+# Model calls of a query run here so their round trips overlap
+_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieve")
+
+
+def _submit(fn, *args):
+    """_pool.submit() in the caller's context, so request-scoped state (priority) carries over."""
+    return _pool.submit(contextvars.copy_context().run, fn, *args)
+
+# Repeated questions skip the model calls. Embeddings only depend on the model;
+# tag sets also depend on the taxonomy and are dropped when it changes on reload.
+_embed_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+_tag_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
 
 
 # ─── Index (loaded once at startup) ──────────────────────────────────────────
@@ -81,47 +72,70 @@ class Index:
         self.records: list[dict] = []
         self.embeddings: np.ndarray | None = None
         self.master_tags: list[str] = []
+        # identifies the loaded metadata + taxonomy (changes whenever either does)
+        self.version: str = ""
+        self.taxonomy_version: str = ""
+        # (mtime_ns, size) of the source files when loading started — for the watcher
+        self.source_stamps: tuple = ()
+        # doc × master_tag membership, bit-packed: (N, ceil(T / 8)) uint8
+        self.tag_ids: dict[str, int] = {}
+        self.tag_bits: np.ndarray = np.zeros((0, 0), dtype=np.uint8)
+        # (T, dim) normalised mean embedding of each tag's documents — built on first use
+        self._tag_centroids: np.ndarray | None = None
+        self._cache_dir: Path | None = None
+        self._snapshot_id: str | None = None  # snapshot the arrays were mapped from
         self.bm25: BM25 = BM25()
+        self.vectors = None  # ann.ExactSearch | ann.IVFFlat
         # list of frozensets — each pair of conflicting file paths
         self.conflict_pairs: list[frozenset] = []
 
-    def load(self):
-        with open(MASTER_TAGS_JSON, encoding="utf-8") as f:
+    def load(
+        self,
+        metadata_csv: Path = METADATA_CSV,
+        master_tags_json: Path = MASTER_TAGS_JSON,
+        snapshot_dir: Path = INDEX_SNAPSHOT_DIR,
+    ):
+        t0 = time.perf_counter()
+        self.source_stamps = _source_stamps(metadata_csv, master_tags_json)
+        with open(master_tags_json, encoding="utf-8") as f:
             raw = json.load(f)
         self.master_tags = sorted(set(raw.values()))
-
-        rows = []
-        vectors = []
-        descriptions = []
-        with open(METADATA_CSV, encoding="utf-8") as f:
-            for row in csv.DictReader(f):
-                emb = json.loads(row["embedding"]) if row["embedding"] else []
-                if not emb:
-                    emb = [0.0] * 1024
-                rows.append({
-                    "filepath":      row["filepath"],
-                    "filename":      row["filename"],
-                    "description":   row["description"],
-                    "tags":          set(row["tags"].split("|")) if row["tags"] else set(),
-                    "last_modified": row["last_modified"],
-                    "status":        row["status"],
-                    "department":    row["department"],
-                    "author":        row["author"],
-                    "in_manifest":   row["in_manifest"],
-                    "supersedes":    row.get("supersedes", ""),
-                    "conflict_with": row.get("conflict_with", ""),
-                })
-                vectors.append(emb)
-                descriptions.append(row["description"])
-
-        self.records = rows
-        mat = np.array(vectors, dtype=np.float32)
-        norms = np.linalg.norm(mat, axis=1, keepdims=True)
-        norms[norms == 0] = 1.0
-        self.embeddings = mat / norms  # pre-normalize for fast cosine sim
-
-        # BM25 index over descriptions
-        self.bm25.fit(descriptions)
+        self.taxonomy_version = hashlib.sha1("\n".join(self.master_tags).encode()).hexdigest()[:12]
+
+        # Compiled snapshot (memory-mapped) if it matches metadata.csv, else parse the CSV.
+        # Shared mode builds the snapshot when needed so all workers map the same pages.
+        if INDEX_SHARED:
+            snap = publish_snapshot(snapshot_dir, metadata_csv)
+        else:
+            snap = read_snapshot(snapshot_dir, metadata_csv)
+        if snap is not None:
+            self.records = snap["records"]
+            self.embeddings = snap["embeddings"]
+            self.bm25 = snap["bm25"]
+            source = "snapshot"
+        else:
+            self.records, mat = read_metadata_csv(metadata_csv)
+            self.embeddings = normalize_rows(mat)  # pre-normalize for fast cosine sim
+            # BM25 index over descriptions
+            self.bm25 = BM25()
+            self.bm25.fit([rec["description"] for rec in self.records])
+            source = "metadata.csv"
+
+        fingerprint = snap["manifest"]["source"] if snap is not None else source_fingerprint(metadata_csv)
+        self.version = hashlib.sha1(
+            json.dumps({"source": fingerprint, "tags": self.taxonomy_version}, sort_keys=True).encode()
+        ).hexdigest()[:12]
+
+        self.tag_ids = {tag: i for i, tag in enumerate(self.master_tags)}
+        self.tag_bits = _tag_bitset(self.records, self.tag_ids)
+
+        # ANN structures are cached next to a snapshot; built in memory otherwise
+        self._cache_dir = snapshot_dir if snap is not None else None
+        self._snapshot_id = snapshot_id(snap["manifest"]) if snap is not None else None
+        self._tag_centroids = None
+        self.vectors = build_vector_index(self.embeddings, cache_dir=self._cache_dir, snapshot=self._snapshot_id)
+        if TAG_MODE == "local":
+            self.tag_centroids()
 
         # Build conflict pairs from supersedes + conflict_with metadata
         seen: set[frozenset] = set()
@@ -138,22 +152,163 @@ class Index:
         print(
             f"[Index] Loaded {len(self.records)} documents, "
             f"{len(self.master_tags)} canonical tags, "
-            f"{len(self.conflict_pairs)} conflict pairs"
+            f"{len(self.conflict_pairs)} conflict pairs "
+            f"(from {source}, {(time.perf_counter() - t0) * 1000:.0f} ms)"
+        )
+        mem = self.memory_usage()
+        print(
+            f"[Index] Embeddings + BM25: {mem['mapped_bytes'] / 1e6:.1f} MB memory-mapped "
+            f"(shared between workers), {mem['private_bytes'] / 1e6:.1f} MB private"
         )
 
+    def tag_centroids(self) -> np.ndarray:
+        """Normalised centroid of the documents carrying each master tag (zero row if none)."""
+        if self._tag_centroids is None:
+            def build():
+                member = np.unpackbits(self.tag_bits, axis=1, count=len(self.master_tags))
+                sums = member.T.astype(np.float32) @ self.embeddings
+                return {"centroids": normalize_rows(sums).astype(np.float32)}
+
+            # keyed on the taxonomy too — retag.py can change it without touching embeddings
+            meta = {"n_docs": len(self.records), "tags": self.master_tags}
+            self._tag_centroids = cached_arrays(
+                self._cache_dir, "tag_centroids", meta, build, self._snapshot_id,
+            )["centroids"]
+        return self._tag_centroids
+
+    def memory_usage(self) -> dict:
+        """Bytes held by the embedding matrix and BM25 arrays, mapped vs private."""
+        _, bm25_arrays, _ = self.bm25.to_state()
+        return memory_usage([self.embeddings, *bm25_arrays.values()])
+
+
+def _tag_bitset(records: list[dict], tag_ids: dict[str, int]) -> np.ndarray:
+    """Bit-packed doc × tag matrix; tags outside the taxonomy can never match a query."""
+    member = np.zeros((len(records), len(tag_ids)), dtype=bool)
+    for i, rec in enumerate(records):
+        cols = [tag_ids[t] for t in rec["tags"] if t in tag_ids]
+        member[i, cols] = True
+    return np.packbits(member, axis=1)
+
+
+def _source_stamps(*paths: Path) -> tuple:
+    stamps = []
+    for path in paths:
+        try:
+            st = Path(path).stat()
+            stamps.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+# ─── Current index + hot reload ──────────────────────────────────────────────
+# Queries read the global once and keep that Index for their whole lifetime.
+# A reload builds a complete new Index off to the side and rebinds the global —
+# a single reference assignment, so no query ever sees a half-loaded index.
 
 _index = Index()
+_reload_lock = threading.Lock()
+
+
+def load_index() -> Index:
+    """Build a fresh Index from the configured files and swap it in atomically."""
+    global _index
+    with _reload_lock:
+        new = Index()
+        new.load()
+        old, _index = _index, new
+    if new.taxonomy_version != old.taxonomy_version:
+        _tag_cache.clear()  # entries are keyed by taxonomy; just free the memory
+    return new
+
+
+def reload_index() -> dict:
+    """load_index() for the admin endpoint / watcher → {previous, version, changed, ms}."""
+    previous = _index.version
+    t0 = time.perf_counter()
+    new = load_index()
+    return {
+        "previous": previous,
+        "version":  new.version,
+        "changed":  new.version != previous,
+        "ms":       round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def start_index_watcher(interval: float = INDEX_WATCH_INTERVAL) -> threading.Thread | None:
+    """
+    Poll metadata.csv / master_tags.json every `interval` seconds and reload when
+    they change. A change is only acted on once the files have stayed the same for
+    one more interval, so a reload never reads a file that is still being written.
+    """
+    if interval <= 0:
+        return None
+
+    def watch():
+        failed: tuple | None = None
+        while True:
+            time.sleep(interval)
+            stamps = _source_stamps(METADATA_CSV, MASTER_TAGS_JSON)
+            if stamps in (_index.source_stamps, failed):
+                continue
+            time.sleep(interval)
+            if _source_stamps(METADATA_CSV, MASTER_TAGS_JSON) != stamps:
+                continue  # still being written
+            try:
+                info = reload_index()
+                print(f"[Index] Reloaded {info['previous']} → {info['version']} ({info['ms']:.0f} ms)")
+                failed = None
+            except Exception as e:
+                print(f"[Warning] Index reload failed, keeping {_index.version}: {e}")
+                failed = stamps
+
+    thread = threading.Thread(target=watch, name="index-watcher", daemon=True)
+    thread.start()
+    return thread
+
+
+def index_version() -> str:
+    return _index.version
 
 
-def load_index():
-    _index.load()
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters of the query caches."""
+    return {"embedding": _embed_cache.stats(), "tags": _tag_cache.stats()}
+
+
+def embed_batch_stats() -> dict:
+    """Batch-size and wait-time histograms of the query-embedding micro-batcher."""
+    return _embed_batcher.stats()
 
 
 # ─── Tag extraction ───────────────────────────────────────────────────────────
 
-def extract_tags_from_query(query: str) -> set[str]:
-    """Ask LLM to pick relevant tags from master_tags for the given query."""
-    tags_str = ", ".join(_index.master_tags)
+@stage("tags")
+def _predict_tags_local(ix: Index, query_vec: np.ndarray) -> set[str]:
+    """
+    Tags whose centroid is closest to the query embedding: the best
+    TAG_LOCAL_MIN always, then up to TAG_LOCAL_MAX within TAG_LOCAL_MARGIN
+    of the best similarity. Tags with no documents are never picked.
+    """
+    centroids = ix.tag_centroids()
+    if len(centroids) == 0:
+        return set()
+    q = query_vec / (np.linalg.norm(query_vec) + 1e-9)
+    sims = centroids @ q
+    sims[~centroids.any(axis=1)] = -np.inf
+    order = top_k_indices(sims, TAG_LOCAL_MAX)
+    best = sims[order[0]]
+    return {
+        ix.master_tags[i]
+        for rank, i in enumerate(order)
+        if np.isfinite(sims[i]) and (rank < TAG_LOCAL_MIN or sims[i] >= best - TAG_LOCAL_MARGIN)
+    }
+
+
+def _tag_request(ix: Index, query: str) -> dict:
+    """Chat completion arguments asking the LLM to pick tags from master_tags."""
+    tags_str = ", ".join(ix.master_tags)
     prompt = f"""Select tags for this query. You MUST only use tags from the EXACT list below — no other tags allowed.
 
 ALLOWED TAGS (use ONLY these exact strings):
@@ -164,22 +319,58 @@ User query: {query}
 Pick 2-6 tags that best match the query topic. Return ONLY tags from the list above.
 Return JSON: {{"tags": ["tag1", "tag2", ...]}}"""
 
+    return dict(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": "/no_think"},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.0,
+        max_tokens=200,
+        response_format={"type": "json_object"},
+    )
+
+
+def _parse_tags(ix: Index, key: tuple, response) -> set[str]:
+    record_usage("tags", response.usage)
+    result = json.loads(response.choices[0].message.content)
+    raw = result.get("tags", [])
+    # Strict validation — only keep tags that exist in master_tags
+    valid = set(t for t in raw if t in ix.master_tags)
+    _tag_cache.put(key, frozenset(valid))  # failures never get here, so aren't cached
+    return valid
+
+
+def _extract_tags_llm(ix: Index, query: str) -> set[str]:
+    """Ask LLM to pick relevant tags from master_tags for the given query (cached)."""
+    key = (ix.taxonomy_version, normalize_query(query))
+    cached = _tag_cache.get(key)
+    if cached is not None:
+        return set(cached)
     try:
-        response = llm.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "/no_think"},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.0,
-            max_tokens=200,
-            response_format={"type": "json_object"},
-        )
-        result = json.loads(response.choices[0].message.content)
-        raw = result.get("tags", [])
-        # Strict validation — only keep tags that exist in master_tags
-        valid = set(t for t in raw if t in _index.master_tags)
-        return valid
+        with stage("tags"), llm_slots.slot():
+            response = llm.chat.completions.create(**_tag_request(ix, query))
+        return _parse_tags(ix, key, response)
+    except Overloaded:
+        raise  # no model capacity — the API answers 429/503
+    except Exception as e:
+        print(f"[Warning] Tag extraction failed: {e}")
+        return set()
+
+
+async def _aextract_tags_llm(ix: Index, query: str) -> set[str]:
+    """_extract_tags_llm() on the async client."""
+    key = (ix.taxonomy_version, normalize_query(query))
+    cached = _tag_cache.get(key)
+    if cached is not None:
+        return set(cached)
+    try:
+        with stage("tags"):
+            async with llm_slots.aslot():
+                response = await allm.chat.completions.create(**_tag_request(ix, query))
+        return _parse_tags(ix, key, response)
+    except Overloaded:
+        raise
     except Exception as e:
         print(f"[Warning] Tag extraction failed: {e}")
         return set()
@@ -187,36 +378,137 @@ Return JSON: {{"tags": ["tag1", "tag2", ...]}}"""
 
 # ─── Scoring ──────────────────────────────────────────────────────────────────
 
-def _cosine_scores(query_vec: np.ndarray) -> np.ndarray:
-    """Dot product of normalized query against normalized doc embeddings → cosine sims."""
+def _cosine_scores(
+    ix: Index,
+    query_vec: np.ndarray,
+    rows: np.ndarray | None = None,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Dot product of normalized query against normalized doc embeddings → cosine sims,
+    for all documents (rows=None) or only the given candidate rows.
+    """
     q = query_vec / (np.linalg.norm(query_vec) + 1e-9)
-    scores = _index.embeddings @ q          # shape: (N,)
-    return (scores + 1.0) / 2.0            # rescale [-1,1] → [0,1]
+    scores = ix.vectors.similarity(q, rows)  # shape: (N,) or (len(rows),)
+    out = np.add(scores, 1.0, out=out)           # rescale [-1,1] → [0,1]
+    return np.divide(out, 2.0, out=out)
 
 
-def _tag_scores(query_tags: set[str]) -> np.ndarray:
-    """Overlap coefficient: |intersection| / |query_tags| for each document."""
+def _tag_scores(
+    ix: Index,
+    query_tags: set[str],
+    rows: np.ndarray | None = None,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Overlap coefficient: |intersection| / |query_tags| for each document —
+    popcount of (doc tag bits AND query tag bits).
+    """
+    bits = ix.tag_bits if rows is None else ix.tag_bits[rows]
+    if out is None:
+        out = np.empty(len(bits), dtype=np.float32)
     if not query_tags:
-        return np.zeros(len(_index.records), dtype=np.float32)
-    scores = np.array([
-        len(query_tags & rec["tags"]) / len(query_tags)
-        for rec in _index.records
-    ], dtype=np.float32)
-    return scores
+        out.fill(0.0)
+        return out
+    mask = np.zeros(len(ix.tag_ids), dtype=bool)
+    mask[[ix.tag_ids[t] for t in query_tags if t in ix.tag_ids]] = True
+    np.sum(POPCOUNT[bits & np.packbits(mask)], axis=1, dtype=np.float32, out=out)
+    return np.divide(out, len(query_tags), out=out)
+
+
+def _vector_candidates(ix: Index, query_vec: np.ndarray) -> np.ndarray | None:
+    """
+    Candidate rows from the ANN backend, or None when the backend is exhaustive
+    (small corpora / ANN_BACKEND=exact) and every document gets scored.
+    """
+    if ix.vectors.exhaustive:
+        return None
+    q = query_vec / (np.linalg.norm(query_vec) + 1e-9)
+    ids, _ = ix.vectors.search(q, VECTOR_CANDIDATES)
+    return ids
 
 
-def _bm25_scores(query: str) -> np.ndarray:
-    """BM25 scores over descriptions, normalized to [0, 1]."""
-    raw = _index.bm25.scores(query)
-    max_val = raw.max()
-    if max_val == 0:
-        return raw
-    return raw / max_val
+def _bm25_candidates(ix: Index, query: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sparse BM25 signal: (doc_ids, scores normalized to [0, 1]).
+    Documents not returned have a BM25 score of 0 for fusion purposes.
+
+    With BM25_CANDIDATES > 0 only the top-k documents are scored exactly (MaxScore
+    pruning); the best document is always among them, so the normalization by the
+    corpus max is unchanged.
+    """
+    with stage("bm25"):
+        if BM25_CANDIDATES > 0:
+            ids, raw = ix.bm25.top_k(query, BM25_CANDIDATES)
+        else:
+            dense = ix.bm25.scores(query)
+            ids = np.flatnonzero(dense)
+            raw = dense[ids]
+    if len(raw) == 0:
+        return ids, raw
+    return ids, raw / raw.max()
 
 
 def embed_query(query: str) -> np.ndarray:
-    response = embedder.embeddings.create(model=EMBED_MODEL, input=query)
-    return np.array(response.data[0].embedding, dtype=np.float32)
+    """Query embedding, served from the LRU cache for repeated questions (read-only array)."""
+    key = normalize_query(query)
+    vec = _embed_cache.get(key)
+    if vec is None:
+        with stage("embed"), embed_slots.slot():
+            response = embedder.embeddings.create(model=EMBED_MODEL, input=query)
+        vec = np.array(response.data[0].embedding, dtype=np.float32)
+        vec.flags.writeable = False  # shared between callers
+        _embed_cache.put(key, vec)
+    return vec
+
+
+async def _aembed_texts(texts: list[str]) -> list[np.ndarray]:
+    """One embeddings call for a micro-batch of questions (duplicates sent once)."""
+    unique = list(dict.fromkeys(texts))
+    async with embed_slots.aslot():
+        response = await aembedder.embeddings.create(model=EMBED_MODEL, input=unique)
+    vecs = {}
+    for text, item in zip(unique, response.data):
+        vec = np.array(item.embedding, dtype=np.float32)
+        vec.flags.writeable = False
+        vecs[text] = vec
+    return [vecs[text] for text in texts]
+
+
+# Cache misses of concurrent queries are embedded together
+_embed_batcher = MicroBatcher(_aembed_texts, EMBED_BATCH_MAX, EMBED_BATCH_WAIT_MS / 1000)
+
+
+async def aembed_query(query: str) -> np.ndarray:
+    """embed_query() on the async client, micro-batched with other queries in flight."""
+    key = normalize_query(query)
+    vec = _embed_cache.get(key)
+    if vec is None:
+        with stage("embed"):  # includes the wait for the micro-batch to be sent
+            vec = await _embed_batcher.submit(query)
+        _embed_cache.put(key, vec)
+    return vec
+
+
+def embed_queries(queries: list[str]) -> list[np.ndarray]:
+    """
+    Embeddings for many queries: cached ones are reused, the rest are sent in
+    one embeddings call per EMBED_BATCH_SIZE distinct questions.
+    """
+    keys = [normalize_query(q) for q in queries]
+    found = {k: _embed_cache.get(k) for k in dict.fromkeys(keys)}
+    todo = [k for k, vec in found.items() if vec is None]
+    text = dict(zip(keys, queries))  # one original spelling per key
+    for start in range(0, len(todo), EMBED_BATCH_SIZE):
+        chunk = todo[start:start + EMBED_BATCH_SIZE]
+        with stage("embed"), embed_slots.slot():
+            response = embedder.embeddings.create(model=EMBED_MODEL, input=[text[k] for k in chunk])
+        for k, item in zip(chunk, response.data):
+            vec = np.array(item.embedding, dtype=np.float32)
+            vec.flags.writeable = False
+            _embed_cache.put(k, vec)
+            found[k] = vec
+    return [found[k] for k in keys]
 
 
 def _generate_paraphrases(query: str, n: int = 3) -> list[str]:
@@ -235,20 +527,23 @@ Question: {query}
 Return JSON: {{"paraphrases": ["...", "...", "..."]}}"""
 
     try:
-        response = llm.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "/no_think"},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,
-            max_tokens=300,
-            response_format={"type": "json_object"},
-        )
+        with llm_slots.slot():
+            response = llm.chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": "/no_think"},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.7,
+                max_tokens=300,
+                response_format={"type": "json_object"},
+            )
         result = json.loads(response.choices[0].message.content)
         paraphrases = result.get("paraphrases", [])
         # Keep only non-empty strings, up to n
         return [p for p in paraphrases if isinstance(p, str) and p.strip()][:n]
+    except Overloaded:
+        raise
     except Exception as e:
         print(f"[Warning] Paraphrase generation failed: {e}")
         return []
@@ -261,7 +556,8 @@ def _embed_augmented(query: str, paraphrases: list[str]) -> np.ndarray:
     If no paraphrases, returns the original embedding.
     """
     texts = [query] + paraphrases
-    response = embedder.embeddings.create(model=EMBED_MODEL, input=texts)
+    with embed_slots.slot():
+        response = embedder.embeddings.create(model=EMBED_MODEL, input=texts)
     vecs = [np.array(d.embedding, dtype=np.float32) for d in response.data]
 
     if len(vecs) == 1:
@@ -275,29 +571,128 @@ def _embed_augmented(query: str, paraphrases: list[str]) -> np.ndarray:
     return avg
 
 
-def retrieve(query: str) -> list[dict]:
-    """Return top-K documents with scores."""
-    query_vec = embed_query(query)
-    query_tags = extract_tags_from_query(query)
+def _await(future, deadline: float, stage: str, fallback):
+    """Result of a pipeline stage, or fallback if it fails or misses the deadline."""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        print(f"[Warning] {stage} timed out — using a zero {stage} signal")
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"[Warning] {stage} failed: {e} — using a zero {stage} signal")
+    return fallback
 
-    vec_scores  = _cosine_scores(query_vec)
-    tag_scores  = _tag_scores(query_tags)
-    bm25_scores = _bm25_scores(query)
 
-    final_scores = (
-        VECTOR_WEIGHT * vec_scores
-        + TAG_WEIGHT  * tag_scores
-        + BM25_WEIGHT * bm25_scores
-    )
+def _gather_signals(ix: Index, query: str, tag_mode: str | None = None):
+    """
+    (query_vec | None, query_tags, bm25_ids, bm25_vals) for one query.
+
+    The embedding request and the LLM tag call are submitted together and BM25
+    runs on the calling thread meanwhile, so latency is the slowest stage rather
+    than the sum. A stage that fails or exceeds its timeout yields a zero signal
+    (query_vec None / no tags); the request itself keeps running in the pool.
+    """
+    start = time.monotonic()
+    local_tags = (tag_mode or TAG_MODE) == "local"
+    vec_future = _submit(embed_query, query)
+    tag_future = None if local_tags else _submit(_extract_tags_llm, ix, query)
 
-    top_indices = np.argsort(final_scores)[::-1][:TOP_K]
+    bm25_ids, bm25_vals = _bm25_candidates(ix, query)
+
+    query_vec = _await(vec_future, start + EMBED_TIMEOUT, "embedding", None)
+    if local_tags:
+        # derived from the embedding — nothing to wait for beyond it
+        query_tags = _predict_tags_local(ix, query_vec) if query_vec is not None else set()
+    else:
+        query_tags = _await(tag_future, start + TAG_TIMEOUT, "tag", set())
+    return query_vec, query_tags, bm25_ids, bm25_vals
+
+
+async def _aawait(task: asyncio.Task, deadline: float, stage: str, fallback):
+    """_await() for asyncio tasks — a stage that misses its deadline is cancelled."""
+    try:
+        return await asyncio.wait_for(task, timeout=max(0.0, deadline - time.monotonic()))
+    except asyncio.TimeoutError:
+        print(f"[Warning] {stage} timed out — using a zero {stage} signal")
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"[Warning] {stage} failed: {e} — using a zero {stage} signal")
+    return fallback
+
+
+async def _agather_signals(ix: Index, query: str, tag_mode: str | None = None):
+    """_gather_signals() on the event loop; BM25 runs in a worker thread meanwhile."""
+    start = time.monotonic()
+    local_tags = (tag_mode or TAG_MODE) == "local"
+    vec_task = asyncio.create_task(aembed_query(query))
+    tag_task = None if local_tags else asyncio.create_task(_aextract_tags_llm(ix, query))
+
+    bm25_ids, bm25_vals = await asyncio.to_thread(_bm25_candidates, ix, query)
+
+    query_vec = await _aawait(vec_task, start + EMBED_TIMEOUT, "embedding", None)
+    if local_tags:
+        query_tags = _predict_tags_local(ix, query_vec) if query_vec is not None else set()
+    else:
+        query_tags = await _aawait(tag_task, start + TAG_TIMEOUT, "tag", set())
+    return query_vec, query_tags, bm25_ids, bm25_vals
+
+
+@stage("scoring")
+def _fuse(
+    ix: Index,
+    query_vec: np.ndarray | None,
+    query_tags: set[str],
+    bm25_ids: np.ndarray,
+    bm25_vals: np.ndarray,
+    sims: np.ndarray | None = None,
+    top_k: int | None = None,
+) -> list[dict]:
+    """
+    Weighted sum of the three signals → the top_k (default TOP_K) result dicts, best
+    first (vector signal 0 without query_vec). `sims` is the query's precomputed
+    cosine to every document, if the caller already has it (batch path, exhaustive
+    backend only).
+    """
+    # Rows to score: everything (exact backend), or ANN ∪ BM25 candidates — sorted,
+    # since BM25 positions are found by binary search (bm25_ids come best first)
+    if query_vec is None:
+        rows = None if ix.vectors.exhaustive else np.unique(np.asarray(bm25_ids, dtype=np.int64))
+    else:
+        rows = _vector_candidates(ix, query_vec)
+        if rows is not None:
+            rows = np.union1d(rows, bm25_ids)
+    bm25_pos = bm25_ids if rows is None else np.searchsorted(rows, bm25_ids)
+
+    # One buffer per query holds every signal and the fused score
+    n = len(ix.records) if rows is None else len(rows)
+    vec_scores, tag_scores, bm25_scores, final_scores = np.empty((4, n), dtype=np.float32)
+    if query_vec is None:
+        vec_scores.fill(0.0)
+    elif sims is not None and rows is None:
+        np.add(sims, 1.0, out=vec_scores)
+        np.divide(vec_scores, 2.0, out=vec_scores)
+    else:
+        _cosine_scores(ix, query_vec, rows, out=vec_scores)
+    _tag_scores(ix, query_tags, rows, out=tag_scores)
+    bm25_scores.fill(0.0)
+    bm25_scores[bm25_pos] = bm25_vals
+
+    np.multiply(vec_scores, VECTOR_WEIGHT, out=final_scores)
+    final_scores += TAG_WEIGHT * tag_scores
+    final_scores[bm25_pos] += BM25_WEIGHT * bm25_vals
+
+    # argpartition + sort of the k best — no full sort of every score
+    top_indices = top_k_indices(final_scores, TOP_K if top_k is None else top_k)
 
     results = []
     for idx in top_indices:
         score = float(final_scores[idx])
         if score < MIN_SCORE:
             break
-        rec = _index.records[idx]
+        doc_id = int(idx) if rows is None else int(rows[idx])
+        rec = ix.records[doc_id]
         results.append({
             **rec,
             "tags": list(rec["tags"]),
@@ -306,11 +701,76 @@ def retrieve(query: str) -> list[dict]:
             "tag_score":   round(float(tag_scores[idx]), 4),
             "bm25_score":  round(float(bm25_scores[idx]), 4),
             "query_tags":  list(query_tags),
+            "index_version": ix.version,
+            "query_vec":   query_vec,  # the query's embedding (None if it failed), for the answer cache
         })
 
     return results
 
 
+def retrieve(query: str, tag_mode: str | None = None, top_k: int | None = None) -> list[dict]:
+    """Return the top_k (default TOP_K) documents with scores."""
+    ix = _index  # one index for the whole query, even if a reload swaps it meanwhile
+    return _fuse(ix, *_gather_signals(ix, query, tag_mode), top_k=top_k)
+
+
+async def aretrieve(query: str, tag_mode: str | None = None, top_k: int | None = None) -> list[dict]:
+    """retrieve() for async callers: model calls awaited, NumPy scoring off the event loop."""
+    ix = _index
+    signals = await _agather_signals(ix, query, tag_mode)
+    return await asyncio.to_thread(_fuse, ix, *signals, top_k=top_k)
+
+
+def retrieve_batch(
+    queries: list[str],
+    tag_mode: str | None = None,
+    top_k: int | None = None,
+) -> list[list[dict]]:
+    """
+    retrieve() for many queries at once → one result list per query.
+
+    All questions are embedded in one embeddings call, and with the exhaustive
+    backend the vector signal is a (B × dim) @ (dim × N) product, computed for as
+    many questions at a time as fit in BATCH_SIMS_MB and fused before the next
+    block, so memory does not grow with B × N. LLM tag calls run concurrently on the shared pool; BM25 (sparse) and
+    tag overlap (bitset) are scored per query meanwhile. Timeouts as in retrieve(),
+    with the tag deadline stretched by the number of pool rounds the batch needs.
+    """
+    ix = _index
+    if not queries:
+        return []
+    start = time.monotonic()
+    local_tags = (tag_mode or TAG_MODE) == "local"
+    vec_future = _submit(embed_queries, queries)
+    tag_futures = [] if local_tags else [_submit(_extract_tags_llm, ix, q) for q in queries]
+
+    bm25 = [_bm25_candidates(ix, q) for q in queries]
+
+    vecs = _await(vec_future, start + EMBED_TIMEOUT, "embedding", None) or [None] * len(queries)
+    if local_tags:
+        tags = [_predict_tags_local(ix, v) if v is not None else set() for v in vecs]
+    else:
+        rounds = math.ceil(len(queries) / RETRIEVAL_WORKERS)
+        tags = [_await(f, start + TAG_TIMEOUT * rounds, "tag", set()) for f in tag_futures]
+
+    if not (ix.vectors.exhaustive and any(v is not None for v in vecs)):
+        return [_fuse(ix, vecs[b], tags[b], *bm25[b], top_k=top_k) for b in range(len(queries))]
+
+    dim = ix.embeddings.shape[1]
+    Q = np.stack([v if v is not None else np.zeros(dim, dtype=np.float32) for v in vecs])
+    Q /= np.linalg.norm(Q, axis=1, keepdims=True) + 1e-9
+    rows = max(1, (BATCH_SIMS_MB << 20) // (4 * len(ix.embeddings)))  # float32 (rows, N) block
+    results = []
+    for lo in range(0, len(queries), rows):
+        with stage("scoring"):
+            sims = Q[lo:lo + rows] @ ix.embeddings.T
+        results += [
+            _fuse(ix, vecs[b], tags[b], *bm25[b], sims=sims[b - lo], top_k=top_k)
+            for b in range(lo, min(lo + rows, len(queries)))
+        ]
+    return results
+
+
 def get_conflict_pairs() -> list[frozenset]:
     """Return conflict pairs derived from supersedes metadata."""
     return _index.conflict_pairs
@@ -0,0 +1,106 @@
+"""
+Single-flight request coalescing for the async API.
+
+While a computation for a key is in flight, later callers with the same key
+attach to it instead of starting their own:
+
+  do(key, fn)          awaitable result — every caller gets the leader's result
+                       (or its exception)
+  stream(key, make)    async iterator — followers replay the events produced so
+                       far, then receive the rest live as the leader produces them;
+                       joins or starts the stream when called, not when first iterated
+
+The shared work runs in its own task, so a caller disconnecting (its request
+task being cancelled) never cancels the computation the others are waiting on.
+A key is released as soon as its computation finishes; later identical requests
+start fresh (and typically hit the answer cache).
+"""
+
+import asyncio
+
+
+class _Broadcast:
+    """Events of one shared stream, replayable from the start."""
+
+    def __init__(self):
+        self.events: list = []
+        self.done = False
+        self.changed = asyncio.Condition()
+        self.task: asyncio.Task | None = None  # the pump — the loop only keeps weak references
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict = {}    # key → asyncio.Task
+        self._streams: dict = {}  # key → _Broadcast
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """Result of fn() — run once per key at a time, shared by concurrent callers."""
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._release(self._calls, key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stream(self, key, make_stream, admit=None):
+        """
+        Events of make_stream() (an async iterator) — produced once, fanned out.
+        admit(), if given, runs only when this call starts a new stream and may
+        raise to refuse it; callers attaching to a running stream skip it.
+        """
+        feed = self._streams.get(key)
+        if feed is None:
+            if admit is not None:
+                admit()
+            self.leaders += 1
+            feed = _Broadcast()
+            self._streams[key] = feed
+            feed.task = asyncio.create_task(self._pump(key, feed, make_stream()))
+        else:
+            self.coalesced += 1
+        return self._follow(feed)
+
+    @staticmethod
+    async def _follow(feed: _Broadcast):
+        sent = 0
+        while True:
+            async with feed.changed:
+                await feed.changed.wait_for(lambda: len(feed.events) > sent or feed.done)
+                new, done = feed.events[sent:], feed.done
+            for event in new:
+                yield event
+            sent += len(new)
+            if done and sent == len(feed.events):
+                return
+
+    async def _pump(self, key, feed: _Broadcast, events) -> None:
+        try:
+            async for event in events:
+                async with feed.changed:
+                    feed.events.append(event)
+                    feed.changed.notify_all()
+        finally:
+            async with feed.changed:
+                feed.done = True
+                feed.changed.notify_all()
+            self._release(self._streams, key, feed)
+
+    @staticmethod
+    def _release(table: dict, key, entry) -> None:
+        if table.get(key) is entry:
+            del table[key]
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders":   self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,124 @@
+"""
+Slow-query log — one JSON line per API request that took SLOW_QUERY_MS or longer.
+
+Each entry holds what is needed to replay the request and see where the time went:
+
+  ts, endpoint           when and where it was served (query | stream)
+  question, options      the request as sent ({top_k, use_reranker, rerank_depth, context_depth})
+  index_version          index that served retrieval
+  retrieved              [{filepath, score, vec_score, tag_score, bm25_score}], retrieval order
+  rerank_order           filepaths in the order the reranker put them (null if it did not run)
+  cached                 answer came from the answer cache
+  timings                ms per stage + total (metrics.Trace)
+  tokens                 LLM prompt / completion tokens spent on the request
+
+The file rotates at SLOW_QUERY_LOG_BYTES, keeping SLOW_QUERY_LOG_BACKUPS old files
+(slow_queries.jsonl.1, .2, ...). Rotation is per process, so several workers must not
+share one file: a "{pid}" in the path is replaced by the worker's process id
+(slow_queries.{pid}.jsonl → one log per worker). 03_eval/replay_slow_queries.py
+replays one or more logs.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+RETRIEVED_FIELDS = ("filepath", "score", "vec_score", "tag_score", "bm25_score")
+
+
+class SlowQueryLog:
+    """
+    Rotating JSONL writer for requests over threshold_ms. An empty path disables it;
+    "{pid}" in the path becomes this process's id.
+    """
+
+    def __init__(self, path: str, threshold_ms: float, max_bytes: int, backups: int):
+        self.path = Path(path.replace("{pid}", str(os.getpid()))) if path else None
+        self.threshold_ms = threshold_ms
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._logger: logging.Logger | None = None
+        self._lock = threading.Lock()
+        self.logged = 0
+        self.errors = 0
+
+    def _open(self) -> logging.Logger:
+        """Created on first write, so a disabled or never-slow server touches no file."""
+        with self._lock:
+            if self._logger is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(
+                    self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger = logging.getLogger(f"slowlog.{self.path}")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+                self._logger = logger
+        return self._logger
+
+    def is_slow(self, timings: dict[str, float]) -> bool:
+        return self.path is not None and timings.get("total", 0.0) >= self.threshold_ms
+
+    def record(
+        self,
+        endpoint: str,
+        question: str,
+        options: dict,
+        retrieved: list[dict],
+        rerank_order: list[str] | None,
+        cached: bool,
+        timings: dict[str, float],
+        tokens: dict[str, int],
+    ) -> bool:
+        """Append the request if it was slow → whether it was written. Never raises."""
+        if not self.is_slow(timings):
+            return False
+        entry = {
+            "ts":            time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "endpoint":      endpoint,
+            "question":      question,
+            "options":       options,
+            "index_version": retrieved[0]["index_version"] if retrieved else "",
+            "retrieved":     [{k: doc.get(k) for k in RETRIEVED_FIELDS} for doc in retrieved],
+            "rerank_order":  rerank_order,
+            "cached":        cached,
+            "timings":       timings,
+            "tokens":        dict(tokens),
+        }
+        try:
+            self._open().info(json.dumps(entry, ensure_ascii=False))
+        except Exception as e:
+            self.errors += 1
+            print(f"[Warning] Slow-query log write failed: {e}")
+            return False
+        self.logged += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "path":         str(self.path) if self.path else None,
+            "threshold_ms": self.threshold_ms,
+            "logged":       self.logged,
+            "errors":       self.errors,
+        }
+
+
+def read_log(path: Path) -> list[dict]:
+    """Entries of a slow-query log file, oldest first (unparseable lines are skipped)."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # e.g. a line cut short by a crash mid-write
+    return entries
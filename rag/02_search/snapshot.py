@@ -0,0 +1,351 @@
+"""
+Index snapshot — compiled binary form of metadata.csv for fast startup.
+
+Layout (one directory, INDEX_SNAPSHOT_DIR):
+  manifest.json     format version, document count, embedding dim, BM25 params,
+                    fingerprint (size + mtime) of the metadata.csv it was built from
+  embeddings.npy    float32 (N, dim), rows already L2-normalised
+  records.json      columnar metadata: {column: [value per document]}
+  bm25_*.npy        BM25 postings (CSR), idf, length normalisation, term bounds
+  bm25_vocab.json   BM25 vocabulary in term-id order
+
+Index.load() opens the .npy files with mmap_mode="r": nothing is parsed or copied,
+and the OS only pages in the rows that queries actually touch.
+
+Multiple API workers: publish_snapshot() lets exactly one process (whichever takes
+the lock file first) build a missing or stale snapshot; every worker then maps the
+same files read-only, so the matrix and postings live once in the page cache no
+matter how many workers there are. Rebuilds swap the directory by rename — workers
+still mapping the old files keep a valid view until they reload.
+
+metadata.csv stays the human-readable export and the source of truth — a snapshot
+whose fingerprint doesn't match the current CSV is ignored.
+
+Usage (rebuild from an existing metadata.csv):
+  python3 02_search/snapshot.py
+"""
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+_HERE = Path(__file__).parent
+sys.path.insert(0, str(_HERE.parent))  # rag/ — for config
+sys.path.insert(0, str(_HERE))         # 02_search/ — for bm25
+from bm25 import BM25
+from config import METADATA_CSV, INDEX_SNAPSHOT_DIR
+
+SNAPSHOT_VERSION = 1
+EMBEDDING_DIM = 1024
+
+RECORD_COLUMNS = [
+    "filepath", "filename", "description", "tags",
+    "last_modified", "status", "department", "author", "in_manifest",
+    "supersedes", "conflict_with",
+]
+
+
+# ─── metadata.csv ─────────────────────────────────────────────────────────────
+
+def read_metadata_csv(metadata_csv: Path = METADATA_CSV) -> tuple[list[dict], np.ndarray]:
+    """Parse metadata.csv → (records, raw float32 embedding matrix)."""
+    rows = []
+    vectors = []
+    with open(metadata_csv, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            emb = json.loads(row["embedding"]) if row["embedding"] else []
+            if not emb:
+                emb = [0.0] * EMBEDDING_DIM
+            rows.append({
+                "filepath":      row["filepath"],
+                "filename":      row["filename"],
+                "description":   row["description"],
+                "tags":          set(row["tags"].split("|")) if row["tags"] else set(),
+                "last_modified": row["last_modified"],
+                "status":        row["status"],
+                "department":    row["department"],
+                "author":        row["author"],
+                "in_manifest":   row["in_manifest"],
+                "supersedes":    row.get("supersedes", ""),
+                "conflict_with": row.get("conflict_with", ""),
+            })
+            vectors.append(emb)
+    mat = np.array(vectors, dtype=np.float32).reshape(len(rows), -1)
+    return rows, mat
+
+
+def normalize_rows(mat: np.ndarray) -> np.ndarray:
+    """L2-normalise rows (zero rows stay zero) — pre-normalised for fast cosine sim."""
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def source_fingerprint(metadata_csv: Path) -> dict:
+    st = Path(metadata_csv).stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+# ─── Write ────────────────────────────────────────────────────────────────────
+
+def write_snapshot(
+    snapshot_dir: Path = INDEX_SNAPSHOT_DIR,
+    metadata_csv: Path = METADATA_CSV,
+) -> Path:
+    """Compile metadata.csv into a snapshot directory (replaced as a whole)."""
+    fingerprint = source_fingerprint(metadata_csv)
+    records, mat = read_metadata_csv(metadata_csv)
+    return write_snapshot_arrays(snapshot_dir, records, normalize_rows(mat), fingerprint)
+
+
+def write_snapshot_arrays(
+    snapshot_dir: Path,
+    records: list[dict],
+    embeddings: np.ndarray,
+    source: dict,
+    bm25: BM25 | None = None,
+) -> Path:
+    """
+    Write a snapshot from already-parsed records and L2-normalised embeddings
+    (e.g. synthetic benchmark corpora). `source` is the fingerprint stored in the
+    manifest; `bm25` is fitted on the descriptions unless given.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if bm25 is None:
+        bm25 = BM25()
+        bm25.fit([rec["description"] for rec in records])
+    bm25_params, bm25_arrays, bm25_vocab = bm25.to_state()
+
+    # Build next to the target, then swap directories
+    tmp_dir = snapshot_dir.with_name(f"{snapshot_dir.name}.tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / "embeddings.npy", embeddings)
+    for name, arr in bm25_arrays.items():
+        np.save(tmp_dir / f"bm25_{name}.npy", np.ascontiguousarray(arr))
+    (tmp_dir / "bm25_vocab.json").write_text(json.dumps(bm25_vocab, ensure_ascii=False))
+
+    columns = {col: [] for col in RECORD_COLUMNS}
+    for rec in records:
+        for col in RECORD_COLUMNS:
+            val = rec[col]
+            columns[col].append("|".join(sorted(val)) if col == "tags" else val)
+    (tmp_dir / "records.json").write_text(json.dumps(columns, ensure_ascii=False))
+
+    manifest = {
+        "version":    SNAPSHOT_VERSION,
+        "n_docs":     len(records),
+        "dim":        int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+        "bm25":       bm25_params,
+        "source":     source,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    # manifest last — a directory without one is never considered valid
+    (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    old_dir = snapshot_dir.with_name(f"{snapshot_dir.name}.old")
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    if snapshot_dir.exists():
+        snapshot_dir.rename(old_dir)
+    tmp_dir.rename(snapshot_dir)
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    return snapshot_dir
+
+
+# ─── Read ─────────────────────────────────────────────────────────────────────
+
+def _load_array(path: Path) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)  # empty arrays can't be memory-mapped
+
+
+def snapshot_id(manifest: dict) -> str:
+    """Identity of one published snapshot (its manifest includes created_at)."""
+    return hashlib.sha1(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _current_snapshot_id(snapshot_dir: Path) -> str | None:
+    try:
+        return snapshot_id(json.loads((Path(snapshot_dir) / "manifest.json").read_text()))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def read_snapshot(
+    snapshot_dir: Path = INDEX_SNAPSHOT_DIR,
+    metadata_csv: Path = METADATA_CSV,
+    warn_stale: bool = True,
+) -> dict | None:
+    """
+    Open a snapshot with memory-mapped arrays.
+    Returns None if it is missing, from another format version, or stale
+    relative to metadata_csv.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    manifest_path = snapshot_dir / "manifest.json"
+    if not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        return None
+    if Path(metadata_csv).exists() and manifest.get("source") != source_fingerprint(metadata_csv):
+        if warn_stale:
+            print(f"[Snapshot] {snapshot_dir} is stale relative to {metadata_csv} — ignoring")
+        return None
+
+    try:
+        embeddings = _load_array(snapshot_dir / "embeddings.npy")
+        bm25_arrays = {
+            name: _load_array(snapshot_dir / f"bm25_{name}.npy")
+            for name in BM25.ARRAY_NAMES
+        }
+        bm25_vocab = json.loads((snapshot_dir / "bm25_vocab.json").read_text(encoding="utf-8"))
+        columns = json.loads((snapshot_dir / "records.json").read_text(encoding="utf-8"))
+    except OSError:
+        # directory swapped by a concurrent publisher between manifest and arrays
+        return None
+    bm25 = BM25.from_state(manifest["bm25"], bm25_arrays, bm25_vocab)
+
+    records = []
+    for i in range(manifest["n_docs"]):
+        rec = {col: columns[col][i] for col in RECORD_COLUMNS}
+        rec["tags"] = set(rec["tags"].split("|")) if rec["tags"] else set()
+        records.append(rec)
+
+    return {
+        "manifest":   manifest,
+        "records":    records,
+        "embeddings": embeddings,
+        "bm25":       bm25,
+    }
+
+
+class FileLock:
+    """Exclusive advisory lock on a file (no-op where fcntl is unavailable)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: int | None = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            import fcntl
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except ImportError:
+            pass
+        return self
+
+    def __exit__(self, *exc):
+        os.close(self._fd)  # closing the descriptor releases the lock
+        self._fd = None
+
+
+def publish_snapshot(
+    snapshot_dir: Path = INDEX_SNAPSHOT_DIR,
+    metadata_csv: Path = METADATA_CSV,
+) -> dict | None:
+    """
+    Open the snapshot, building it first if it is missing or stale.
+    Safe to call from many worker processes at once: the first one to take the
+    lock builds, the others wait and then map the published files.
+    Returns None if the snapshot can't be written (e.g. read-only volume).
+    """
+    snapshot_dir = Path(snapshot_dir)
+    snap = read_snapshot(snapshot_dir, metadata_csv, warn_stale=False)
+    if snap is not None:
+        return snap
+    try:
+        with FileLock(snapshot_dir.with_name(f"{snapshot_dir.name}.lock")):
+            snap = read_snapshot(snapshot_dir, metadata_csv, warn_stale=False)
+            if snap is None:
+                print(f"[Snapshot] Publishing {snapshot_dir} from {metadata_csv}")
+                write_snapshot(snapshot_dir, metadata_csv)
+                snap = read_snapshot(snapshot_dir, metadata_csv)
+    except OSError as e:
+        print(f"[Snapshot] Could not publish {snapshot_dir}: {e}")
+        return None
+    return snap
+
+
+def _load_cached(cache_dir: Path, name: str, meta: dict) -> dict[str, np.ndarray] | None:
+    meta_path = cache_dir / f"{name}.json"
+    if not meta_path.exists():
+        return None
+    try:
+        saved = json.loads(meta_path.read_text())
+        if {k: v for k, v in saved.items() if k != "arrays"} != meta:
+            return None
+        return {a: _load_array(cache_dir / f"{name}_{a}.npy") for a in saved["arrays"]}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def cached_arrays(
+    cache_dir: Path | None,
+    name: str,
+    meta: dict,
+    build,
+    snapshot: str | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Derived arrays kept next to a snapshot (ANN lists, quantized codes, ...).
+    Loaded memory-mapped when the saved `meta` matches; otherwise `build()` runs
+    once under the snapshot lock and its {name: array} result is saved for the
+    other workers. Without a cache_dir the arrays are just built in memory.
+
+    `snapshot` is the snapshot_id() the caller's arrays came from. It is part of
+    the meta, and nothing is saved if the directory has been republished since —
+    a worker still on the old snapshot must not write into the new one.
+    """
+    if cache_dir is None:
+        return build()
+    cache_dir = Path(cache_dir)
+    meta = {**meta, "snapshot": snapshot}
+    arrays = _load_cached(cache_dir, name, meta)
+    if arrays is not None:
+        return arrays
+    with FileLock(cache_dir.with_name(f"{cache_dir.name}.lock")):
+        arrays = _load_cached(cache_dir, name, meta)
+        if arrays is None:
+            built = build()
+            if _current_snapshot_id(cache_dir) != snapshot:
+                return built
+            for a, arr in built.items():
+                tmp = cache_dir / f"{name}_{a}.tmp.npy"
+                np.save(tmp, np.ascontiguousarray(arr))
+                os.replace(tmp, cache_dir / f"{name}_{a}.npy")
+            (cache_dir / f"{name}.json").write_text(json.dumps({**meta, "arrays": list(built)}))
+            arrays = _load_cached(cache_dir, name, meta) or built
+    return arrays
+
+
+def memory_usage(arrays: list[np.ndarray]) -> dict:
+    """Split array bytes into memory-mapped (shareable page cache) vs private heap."""
+    mapped = sum(a.nbytes for a in arrays if isinstance(a, np.memmap))
+    private = sum(a.nbytes for a in arrays if not isinstance(a, np.memmap))
+    return {"mapped_bytes": int(mapped), "private_bytes": int(private)}
+
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    out = write_snapshot()
+    print(f"Snapshot written → {out} ({(time.perf_counter() - t0) * 1000:.0f} ms)")
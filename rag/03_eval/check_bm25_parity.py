@@ -0,0 +1,99 @@
+"""
+BM25 parity check — verifies that the inverted-index BM25 in 02_search/bm25.py
+gives the same scores as the original per-document scan.
+
+Corpus: descriptions from metadata.csv
+Queries: all questions from eval/questions.jsonl + a few single-term probes
+
+No model servers needed. Exits non-zero on any mismatch.
+
+Usage:
+  python3 03_eval/check_bm25_parity.py
+"""
+
+import csv
+import json
+import math
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+_HERE = Path(__file__).parent
+sys.path.insert(0, str(_HERE.parent))                 # rag/ — for config
+sys.path.insert(0, str(_HERE.parent / "02_search"))   # 02_search/ — for bm25
+from config import METADATA_CSV
+from bm25 import BM25
+
+_DEFAULT_EVAL = _HERE.parent.parent / "ml_takehome" / "eval" / "questions.jsonl"
+EVAL_PATH     = Path(os.environ.get("EVAL_PATH", str(_DEFAULT_EVAL)))
+
+# float32 accumulation order differs slightly between the two implementations
+ATOL = 1e-5
+RTOL = 1e-6
+
+EXTRA_QUERIES = [
+    "policy", "process", "the", "pto pto pto", "", "nonexistent-term-xyz",
+]
+
+
+def scan_scores(texts: list[str], query: str, k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """Reference implementation: the original O(corpus tokens) per-query scan."""
+    corpus = [t.lower().split() for t in texts]
+    N = len(corpus)
+    avgdl = sum(len(d) for d in corpus) / N if N else 1.0
+    df: dict[str, int] = {}
+    for doc in corpus:
+        for term in set(doc):
+            df[term] = df.get(term, 0) + 1
+    idf = {term: math.log((N - freq + 0.5) / (freq + 0.5) + 1) for term, freq in df.items()}
+
+    tokens = query.lower().split()
+    out = np.zeros(N, dtype=np.float32)
+    for i, doc in enumerate(corpus):
+        dl = len(doc)
+        tf = Counter(doc)
+        for term in tokens:
+            if term not in idf:
+                continue
+            f = tf.get(term, 0)
+            num = idf[term] * f * (k1 + 1)
+            den = f + k1 * (1 - b + b * dl / avgdl)
+            out[i] += num / den
+    return out
+
+
+def main():
+    with open(METADATA_CSV, encoding="utf-8") as f:
+        texts = [row["description"] for row in csv.DictReader(f)]
+
+    queries = list(EXTRA_QUERIES)
+    with open(EVAL_PATH) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                queries.append(json.loads(line)["question"])
+
+    bm25 = BM25()
+    bm25.fit(texts)
+
+    failures = 0
+    worst = 0.0
+    for q in queries:
+        expected = scan_scores(texts, q)
+        got = bm25.scores(q)
+        diff = float(np.max(np.abs(expected - got))) if len(texts) else 0.0
+        worst = max(worst, diff)
+        if got.shape != expected.shape or not np.allclose(got, expected, rtol=RTOL, atol=ATOL):
+            failures += 1
+            print(f"  MISMATCH (max abs diff {diff:.2e}): {q[:70]}")
+
+    print(f"Checked {len(queries)} queries over {len(texts)} documents — "
+          f"max abs diff {worst:.2e}, {failures} mismatches")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
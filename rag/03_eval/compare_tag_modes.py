@@ -0,0 +1,93 @@
+"""
+Tag mode comparison — LLM tag extraction vs. local centroid tag prediction.
+
+Runs retrieval in-process (no generation) for all questions in eval/questions.jsonl,
+once per TAG_MODE, and compares:
+  1. Source Recall@10   — overall and per category
+  2. Retrieval latency  — avg / max ms per query (the LLM mode pays a chat call)
+  3. Tag agreement      — Jaccard overlap of the two modes' query tags
+
+Needs the embedding server, and the LLM server for the "llm" mode. The query
+embedding and tag caches are cleared before every run, so each mode's latency
+includes its own model round trips.
+Output: 03_eval/tag_mode_comparison.json
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+_HERE = Path(__file__).parent
+sys.path.insert(0, str(_HERE.parent / "02_search"))   # 02_search/ — for retrieval
+import retrieval
+from retrieval import load_index, retrieve
+from run_eval import EVAL_PATH, source_recall
+
+RESULTS_PATH = _HERE / "tag_mode_comparison.json"
+MODES = ["llm", "local"]
+
+
+def main():
+    questions = []
+    with open(EVAL_PATH) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                questions.append(json.loads(line))
+
+    load_index()
+    print(f"Comparing tag modes {MODES} on {len(questions)} questions...\n")
+
+    rows = []
+    for i, q in enumerate(questions):
+        row = {"id": q["id"], "category": q["category"]}
+        for mode in MODES:
+            # a warm cache would let the second mode skip the embedding the first one paid for
+            retrieval._embed_cache.clear()
+            retrieval._tag_cache.clear()
+            t0 = time.perf_counter()
+            retrieved = retrieve(q["question"], tag_mode=mode)
+            row[mode] = {
+                "ms":        round((time.perf_counter() - t0) * 1000, 1),
+                "recall":    source_recall(q.get("gold_sources", []), retrieved),
+                "tags":      sorted(retrieved[0]["query_tags"]) if retrieved else [],
+                "retrieved": [d["filepath"] for d in retrieved],
+            }
+        a, b = set(row["llm"]["tags"]), set(row["local"]["tags"])
+        row["tag_jaccard"] = round(len(a & b) / len(a | b), 3) if a | b else 1.0
+        rows.append(row)
+        print(f"[{i+1:02d}/{len(questions)}] {q['id']}: "
+              + " | ".join(f"{m} recall={row[m]['recall']:.2f} {row[m]['ms']:.0f}ms" for m in MODES)
+              + f" | tag jaccard={row['tag_jaccard']:.2f}")
+
+    summary = {}
+    for mode in MODES:
+        cats = sorted(set(r["category"] for r in rows))
+        summary[mode] = {
+            "source_recall_avg": round(sum(r[mode]["recall"] for r in rows) / len(rows), 3),
+            "latency_ms_avg":    round(sum(r[mode]["ms"] for r in rows) / len(rows), 1),
+            "latency_ms_max":    max(r[mode]["ms"] for r in rows),
+            "per_category": {
+                c: round(sum(r[mode]["recall"] for r in rows if r["category"] == c)
+                         / sum(1 for r in rows if r["category"] == c), 3)
+                for c in cats
+            },
+        }
+    summary["tag_jaccard_avg"] = round(sum(r["tag_jaccard"] for r in rows) / len(rows), 3)
+
+    RESULTS_PATH.write_text(json.dumps({"summary": summary, "results": rows}, indent=2))
+
+    print("\n" + "=" * 60)
+    print("TAG MODE COMPARISON")
+    print("=" * 60)
+    for mode in MODES:
+        s = summary[mode]
+        print(f"  {mode:<6} Source Recall@10: {s['source_recall_avg']:.1%}   "
+              f"latency avg {s['latency_ms_avg']:.0f} ms (max {s['latency_ms_max']:.0f} ms)")
+    print(f"  Tag agreement (Jaccard, llm vs local): {summary['tag_jaccard_avg']:.2f}")
+    print(f"\n  Results → {RESULTS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Slow-query replay — re-runs the requests of a slow-query log and diffs latencies.
+
+Each logged question is sent again with its logged options, one at a time, and the
+new per-stage timings are compared with the logged ones:
+  1. Per query  — logged vs replayed total, slowest stage, retrieval/rerank changes
+  2. Per stage  — median and p95 of logged vs replayed ms, median change
+
+Targets:
+  default        a running API (POST {API_BASE}/query, timings from the response)
+  --in-process   this process: aretrieve → (arerank +) agenerate, no answer cache;
+                 needs the model servers and the index files
+
+Usage:
+  python3 03_eval/replay_slow_queries.py rag/slow_queries.jsonl [--in-process] [--limit N]
+  python3 03_eval/replay_slow_queries.py rag/slow_queries.*.jsonl   # one log per worker
+
+Output: 03_eval/replay_results.json (or --out)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+_HERE = Path(__file__).parent
+sys.path.insert(0, str(_HERE.parent))                 # rag/ — for config
+sys.path.insert(0, str(_HERE.parent / "02_search"))   # 02_search/ — for slowlog, pipeline
+from slowlog import read_log
+
+API_BASE     = os.environ.get("API_BASE", "http://localhost:8000")
+RESULTS_PATH = _HERE / "replay_results.json"
+STAGES = ["embed", "tags", "bm25", "scoring", "rerank", "load_files", "generate", "total"]
+
+
+# ─── Targets ─────────────────────────────────────────────────────────────────
+
+def replay_http(entry: dict, base: str = API_BASE) -> dict:
+    """POST the logged request to /query → {timings, retrieved, rerank_order, cached, index_version}."""
+    body = {"question": entry["question"], **entry.get("options", {})}
+    req = urllib.request.Request(
+        f"{base.rstrip('/')}/query",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=300) as r:
+        resp = json.load(r)
+    timings = resp.get("timings") or {"total": round((time.perf_counter() - t0) * 1000, 2)}
+    return {
+        "timings":       timings,
+        "retrieved":     [d["filepath"] for d in resp.get("retrieved", [])],
+        "rerank_order":  resp.get("rerank_order"),
+        "cached":        resp.get("cached", False),
+        "index_version": resp.get("index_version", ""),
+    }
+
+
+async def replay_in_process(entry: dict) -> dict:
+    """The /query pipeline in this process, under a fresh Trace (no answer cache)."""
+    from generator import agenerate
+    from metrics import start_trace
+    from reranker import aiterative_rerank_and_generate
+    from retrieval import aretrieve, index_version
+
+    trace = start_trace()
+    question = entry["question"]
+    options = entry.get("options", {})
+    retrieved = await aretrieve(question, top_k=options.get("top_k"))
+    if options.get("use_reranker"):
+        result = await aiterative_rerank_and_generate(
+            question, retrieved, options.get("rerank_depth"), options.get("context_depth"),
+        )
+    else:
+        max_score = max(doc["score"] for doc in retrieved) if retrieved else 0.0
+        result = await agenerate(question, retrieved, max_retrieval_score=max_score,
+                                 context_depth=options.get("context_depth"))
+    return {
+        "timings":       trace.finish("replay"),
+        "retrieved":     [d["filepath"] for d in retrieved],
+        "rerank_order":  result.get("sorted_sources"),
+        "cached":        False,
+        "index_version": retrieved[0]["index_version"] if retrieved else index_version(),
+    }
+
+
+# ─── Diff ────────────────────────────────────────────────────────────────────
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def diff_entry(entry: dict, replay: dict) -> dict:
+    logged, new = entry.get("timings", {}), replay["timings"]
+    stages = {
+        s: {"logged": logged.get(s), "replay": new.get(s),
+            "delta": round(new[s] - logged[s], 2) if s in logged and s in new else None}
+        for s in STAGES if s in logged or s in new
+    }
+    logged_docs = [d["filepath"] for d in entry.get("retrieved", [])]
+    slowest = max((s for s in logged if s != "total"), key=logged.get, default=None)
+    return {
+        "question":          entry["question"],
+        "options":           entry.get("options", {}),
+        "slowest_stage":     slowest,
+        "stages":            stages,
+        "index_changed":     replay["index_version"] != entry.get("index_version"),
+        "retrieval_changed": replay["retrieved"] != logged_docs,
+        "rerank_changed":    entry.get("rerank_order") is not None and replay["rerank_order"] != entry["rerank_order"],
+        "cached":            replay["cached"],
+    }
+
+
+def summarize(rows: list[dict]) -> dict:
+    summary = {}
+    for s in STAGES:
+        pairs = [r["stages"][s] for r in rows if s in r["stages"] and r["stages"][s]["delta"] is not None]
+        if not pairs:
+            continue
+        logged = [p["logged"] for p in pairs]
+        replay = [p["replay"] for p in pairs]
+        summary[s] = {
+            "n":              len(pairs),
+            "logged_p50":     _percentile(logged, 0.50),
+            "replay_p50":     _percentile(replay, 0.50),
+            "logged_p95":     _percentile(logged, 0.95),
+            "replay_p95":     _percentile(replay, 0.95),
+            "delta_p50":      round(_percentile([p["delta"] for p in pairs], 0.50), 2),
+        }
+    return summary
+
+
+# ─── Main ────────────────────────────────────────────────────────────────────
+
+async def _run(entries: list[dict], in_process: bool, base: str) -> list[dict]:
+    if in_process:
+        from retrieval import load_index
+        load_index()
+
+    rows = []
+    for i, entry in enumerate(entries):
+        try:
+            if in_process:
+                replay = await replay_in_process(entry)
+            else:
+                replay = await asyncio.to_thread(replay_http, entry, base)
+        except Exception as e:
+            print(f"[{i+1:03d}/{len(entries)}] FAILED {entry['question'][:60]!r}: {e}")
+            continue
+        row = diff_entry(entry, replay)
+        rows.append(row)
+        total = row["stages"].get("total", {})
+        flags = [name for name in ("index_changed", "retrieval_changed", "rerank_changed", "cached") if row[name]]
+        print(f"[{i+1:03d}/{len(entries)}] {total.get('logged') or 0:8.0f} → {total.get('replay') or 0:8.0f} ms "
+              f"(slowest was {row['slowest_stage']}) {' '.join(flags)}  {entry['question'][:60]!r}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("logs", nargs="+", type=Path, help="slow-query log file(s), JSONL")
+    parser.add_argument("--in-process", action="store_true", help="run the pipeline here instead of over HTTP")
+    parser.add_argument("--url", default=API_BASE, help=f"API base URL (default {API_BASE})")
+    parser.add_argument("--limit", type=int, default=0, help="replay at most N entries (0 = all)")
+    parser.add_argument("--out", type=Path, default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    entries = [e for path in args.logs for e in read_log(path)]
+    entries.sort(key=lambda e: e.get("ts", ""))  # per-worker logs ({pid}) interleaved in time
+    if args.limit > 0:
+        entries = entries[:args.limit]
+    target = "in-process pipeline" if args.in_process else args.url
+    print(f"Replaying {len(entries)} slow queries against {target}...\n")
+
+    rows = asyncio.run(_run(entries, args.in_process, args.url))
+    summary = summarize(rows)
+    args.out.write_text(json.dumps({"target": target, "summary": summary, "results": rows}, indent=2))
+
+    print("\n" + "=" * 72)
+    print("SLOW-QUERY REPLAY (ms)")
+    print("=" * 72)
+    print(f"  {'stage':<11} {'n':>4} {'logged p50':>11} {'replay p50':>11} {'logged p95':>11} {'replay p95':>11} {'Δ p50':>9}")
+    for s, st in summary.items():
+        print(f"  {s:<11} {st['n']:>4} {st['logged_p50']:>11.1f} {st['replay_p50']:>11.1f} "
+              f"{st['logged_p95']:>11.1f} {st['replay_p95']:>11.1f} {st['delta_p50']:>+9.1f}")
+    if any(r["cached"] for r in rows):
+        print("  note: some replays were answer-cache hits (no rerank/generate) — use --in-process to avoid")
+    print(f"\n  Results → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
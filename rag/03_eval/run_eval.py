@@ -17,11 +17,11 @@ import sys
 import time
 import urllib.request
 from pathlib import Path
-from openai import OpenAI
 
 _HERE = Path(__file__).parent
 sys.path.insert(0, str(_HERE.parent))  # rag/ — for config
-from config import LLM_BASE_URL, LLM_MODEL
+from clients import llm_client
+from config import LLM_MODEL
 
 # questions.jsonl lives in ml_takehome/eval/ next to the rag/ folder
 _DEFAULT_EVAL = _HERE.parent.parent / "ml_takehome" / "eval" / "questions.jsonl"
@@ -30,7 +30,7 @@ API_URL      = os.environ.get("API_URL", "http://localhost:8000/query")
 RESULTS_PATH = _HERE / "eval_results.json"
 SUMMARY_PATH = _HERE / "eval_summary.md"
 
-llm = OpenAI(base_url=LLM_BASE_URL, api_key="dummy")
+llm = llm_client()
 
 IDK_PHRASES = [
     "don't have enough information",
@@ -0,0 +1,100 @@
+"""
+Quantization eval — memory vs. recall of the EMBEDDING_STORAGE modes.
+
+For each storage mode (float16, int8, binary), with and without exact rescoring,
+compared to the float32 baseline on the 40 questions from eval/questions.jsonl:
+  1. Memory           — bytes of the vector codes vs. the float32 matrix
+  2. Overlap@10       — fraction of the float32 vector top-10 still found
+  3. Source Recall@10 — gold_sources found in the vector top-10
+  4. Latency          — ms per query for vector candidate scoring
+
+Only the embedding server is needed (all questions embedded in one call).
+Output: 03_eval/quantization_results.json
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+_HERE = Path(__file__).parent
+sys.path.insert(0, str(_HERE.parent))                 # rag/ — for config
+sys.path.insert(0, str(_HERE.parent / "02_search"))   # 02_search/ — for retrieval, ann
+from config import EMBED_MODEL, RESCORE_DEPTH
+from ann import ExactSearch
+from quantize import VectorCodes
+from retrieval import load_index, embedder
+from run_eval import EVAL_PATH, source_recall
+
+RESULTS_PATH = _HERE / "quantization_results.json"
+K = 10
+MODES = [("float16", RESCORE_DEPTH), ("float16", 0),
+         ("int8", RESCORE_DEPTH), ("int8", 0),
+         ("binary", RESCORE_DEPTH), ("binary", 0)]
+
+
+def main():
+    questions = []
+    with open(EVAL_PATH) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                questions.append(json.loads(line))
+
+    index = load_index()
+    emb = index.embeddings
+    n, dim = emb.shape
+    paths = [rec["filepath"] for rec in index.records]
+
+    print(f"Embedding {len(questions)} questions...")
+    response = embedder.embeddings.create(model=EMBED_MODEL, input=[q["question"] for q in questions])
+    Q = np.array([d.embedding for d in response.data], dtype=np.float32)
+    Q /= np.linalg.norm(Q, axis=1, keepdims=True) + 1e-9
+
+    def run(search: ExactSearch) -> dict:
+        t0 = time.perf_counter()
+        tops = [search.search(q, K)[0] for q in Q]
+        ms = (time.perf_counter() - t0) * 1000 / len(Q)
+        retrieved = [[{"filepath": paths[i]} for i in top] for top in tops]
+        recall = np.mean([source_recall(q.get("gold_sources", []), r) for q, r in zip(questions, retrieved)])
+        return {"tops": [set(t.tolist()) for t in tops], "recall": float(recall), "ms": ms}
+
+    base = run(ExactSearch(emb))
+    float32_bytes = n * dim * 4
+    rows = [{
+        "storage": "float32", "rescore_depth": None,
+        "bytes": float32_bytes, "compression": 1.0,
+        "overlap_at_10": 1.0, "source_recall_at_10": round(base["recall"], 3),
+        "recall_delta": 0.0, "ms_per_query": round(base["ms"], 3),
+    }]
+    for kind, depth in MODES:
+        codes = VectorCodes(kind, VectorCodes.encode(kind, emb), dim)
+        res = run(ExactSearch(emb, codes, rescore_depth=depth))
+        overlap = np.mean([len(a & b) / max(1, len(b)) for a, b in zip(res["tops"], base["tops"])])
+        rows.append({
+            "storage": kind, "rescore_depth": depth,
+            "bytes": codes.nbytes, "compression": round(float32_bytes / codes.nbytes, 1),
+            "overlap_at_10": round(float(overlap), 3),
+            "source_recall_at_10": round(res["recall"], 3),
+            "recall_delta": round(res["recall"] - base["recall"], 3),
+            "ms_per_query": round(res["ms"], 3),
+        })
+
+    RESULTS_PATH.write_text(json.dumps({"n_docs": n, "dim": dim, "results": rows}, indent=2))
+
+    print("\n" + "=" * 78)
+    print(f"QUANTIZATION EVAL — {n} docs, dim={dim}, {len(questions)} questions")
+    print("=" * 78)
+    print(f"  {'storage':<8} {'rescore':>7} {'MB':>8} {'×':>5} {'overlap@10':>11} {'recall@10':>10} {'Δrecall':>8} {'ms/q':>7}")
+    for r in rows:
+        rescore = "-" if r["rescore_depth"] is None else str(r["rescore_depth"])
+        print(f"  {r['storage']:<8} {rescore:>7} {r['bytes'] / 1e6:>8.2f} {r['compression']:>5} "
+              f"{r['overlap_at_10']:>11.1%} {r['source_recall_at_10']:>10.1%} "
+              f"{r['recall_delta']:>+8.1%} {r['ms_per_query']:>7.3f}")
+    print(f"\n  Results → {RESULTS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Load test — drives POST /query at fixed concurrency levels and records capacity numbers.
+
+For each reranker setting (off / on) and each concurrency level, `--requests`
+questions from eval/questions.jsonl are sent by that many concurrent clients, after
+`--warmup` unrecorded ones. Per level it reports:
+  throughput      completed requests / wall-clock second
+  latency         p50 / p95 / p99 / max ms of successful requests
+  errors          error rate, by status (429 / 503 from admission control, 5xx, exceptions)
+  stages          mean server-side ms per pipeline stage (QueryResponse.timings)
+
+Results go to 04_bench/results/load_<commit>_<time>.json together with the git commit
+and the server's /stats; --compare prints the change against an earlier results file.
+
+  --start-servers   start 04_bench/stub_server.py and the API (uvicorn) on free local
+                    ports first, so no real model server is needed:
+      python3 04_bench/load_test.py --start-servers --concurrency 1,8,32
+  otherwise         an already running API at --url (e.g. against real vLLM servers).
+
+The answer, query and file caches and coalescing make repeated questions cheap; start
+the API with ANSWER_CACHE_SIZE=0 QUERY_CACHE_SIZE=0 FILE_CACHE_BYTES=0 QUERY_COALESCING=0
+to measure the full pipeline, file reads included (--start-servers does unless
+--keep-caches is given).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+_HERE = Path(__file__).parent
+_RAG = _HERE.parent
+_DEFAULT_EVAL = _RAG.parent / "ml_takehome" / "eval" / "questions.jsonl"
+EVAL_PATH   = Path(os.environ.get("EVAL_PATH", str(_DEFAULT_EVAL)))
+API_BASE    = os.environ.get("API_BASE", "http://localhost:8000")
+RESULTS_DIR = _HERE / "results"
+
+
+# ─── Servers ─────────────────────────────────────────────────────────────────
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url: str, proc: subprocess.Popen, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{proc.args[1:3]} exited with code {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} not up after {timeout:.0f}s")
+
+
+def start_servers(stub_args: str, keep_caches: bool) -> tuple[str, list[subprocess.Popen]]:
+    """Stub model server + API in subprocesses → (API base URL, processes to stop)."""
+    stub_port, api_port = _free_port(), _free_port()
+    stub = subprocess.Popen(
+        [sys.executable, str(_HERE / "stub_server.py"), "--port", str(stub_port), *shlex.split(stub_args)],
+    )
+    _wait_until_up(f"http://127.0.0.1:{stub_port}/health", stub)
+
+    env = {
+        **os.environ,
+        "LLM_BASE_URL":   f"http://127.0.0.1:{stub_port}/v1",
+        "EMBED_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "LLM_MODEL":      "stub-llm",
+        "EMBED_MODEL":    "stub-embed",
+    }
+    if not keep_caches:
+        env.update({"ANSWER_CACHE_SIZE": "0", "QUERY_CACHE_SIZE": "0", "FILE_CACHE_BYTES": "0",
+                    "QUERY_COALESCING": "0"})
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--app-dir", str(_RAG / "02_search"),
+         "--host", "127.0.0.1", "--port", str(api_port), "--log-level", "warning"],
+        cwd=_RAG, env=env,
+    )
+    procs = [stub, api]
+    try:
+        _wait_until_up(f"http://127.0.0.1:{api_port}/stats", api)
+    except Exception:
+        stop_servers(procs)
+        raise
+    return f"http://127.0.0.1:{api_port}", procs
+
+
+def stop_servers(procs: list[subprocess.Popen]) -> None:
+    for proc in reversed(procs):
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# ─── Load generation ─────────────────────────────────────────────────────────
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    questions: list[str],
+    concurrency: int,
+    n_requests: int,
+    use_reranker: bool,
+    warmup: int,
+    offset: int,
+) -> dict:
+    """n_requests /query calls from `concurrency` clients → summary of that level."""
+    samples: list[tuple[float, int, dict | None]] = []  # (ms, status, timings); status 0 = exception
+    next_i = 0
+
+    async def one(i: int) -> tuple[float, int, dict | None]:
+        body = {"question": questions[(offset + i) % len(questions)], "use_reranker": use_reranker}
+        t0 = time.perf_counter()
+        try:
+            r = await client.post("/query", json=body)
+            timings = r.json().get("timings") if r.status_code == 200 else None
+            return (time.perf_counter() - t0) * 1000, r.status_code, timings
+        except Exception:
+            return (time.perf_counter() - t0) * 1000, 0, None
+
+    async def worker():
+        nonlocal next_i
+        while next_i < n_requests:
+            i, next_i = next_i, next_i + 1
+            samples.append(await one(i))
+
+    for i in range(warmup):
+        await one(n_requests + i)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+
+    ok = [ms for ms, status, _ in samples if status == 200]
+    statuses: dict[str, int] = {}
+    for _, status, _ in samples:
+        if status != 200:
+            key = str(status) if status else "exception"
+            statuses[key] = statuses.get(key, 0) + 1
+    stage_sums: dict[str, float] = {}
+    timed = [t for _, status, t in samples if t]
+    for timings in timed:
+        for stage, ms in timings.items():
+            stage_sums[stage] = stage_sums.get(stage, 0.0) + ms
+
+    return {
+        "use_reranker":   use_reranker,
+        "concurrency":    concurrency,
+        "requests":       len(samples),
+        "wall_s":         round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else 0.0,
+        "p50_ms":         round(_percentile(ok, 0.50), 1),
+        "p95_ms":         round(_percentile(ok, 0.95), 1),
+        "p99_ms":         round(_percentile(ok, 0.99), 1),
+        "max_ms":         round(max(ok), 1) if ok else 0.0,
+        "error_rate":     round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "errors":         statuses,
+        "stage_mean_ms":  {s: round(total / len(timed), 2) for s, total in sorted(stage_sums.items())},
+    }
+
+
+async def run(base: str, questions: list[str], levels: list[int], rerank_modes: list[bool],
+              n_requests: int, warmup: int) -> tuple[list[dict], dict]:
+    limits = httpx.Limits(max_connections=max(levels) + 4, max_keepalive_connections=max(levels) + 4)
+    async with httpx.AsyncClient(base_url=base, timeout=600, limits=limits) as client:
+        results = []
+        for use_reranker in rerank_modes:
+            for level_no, concurrency in enumerate(levels):
+                row = await run_level(client, questions, concurrency, n_requests, use_reranker,
+                                      warmup, offset=level_no * n_requests)
+                results.append(row)
+                print(f"  reranker={'on ' if use_reranker else 'off'} c={concurrency:<4} "
+                      f"{row['throughput_rps']:7.2f} req/s  p50 {row['p50_ms']:8.1f}  p95 {row['p95_ms']:8.1f}  "
+                      f"p99 {row['p99_ms']:8.1f} ms  errors {row['error_rate']:.1%}")
+        try:
+            server_stats = (await client.get("/stats")).json()
+        except Exception:
+            server_stats = {}
+    return results, server_stats
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def _git_commit() -> str:
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=_RAG, text=True).strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=_RAG).returncode != 0
+        return sha + ("-dirty" if dirty else "")
+    except Exception:
+        return "unknown"
+
+
+def compare(current: list[dict], previous_path: Path) -> None:
+    previous = json.loads(previous_path.read_text())
+    before = {(r["use_reranker"], r["concurrency"]): r for r in previous["results"]}
+    print(f"\n  vs {previous.get('commit', '?')} ({previous_path.name}):")
+    for row in current:
+        old = before.get((row["use_reranker"], row["concurrency"]))
+        if old is None:
+            continue
+
+        def change(key: str) -> str:
+            return f"{(row[key] - old[key]) / old[key]:+.1%}" if old[key] else "n/a"
+
+        print(f"  reranker={'on ' if row['use_reranker'] else 'off'} c={row['concurrency']:<4} "
+              f"throughput {change('throughput_rps'):>7}  p50 {change('p50_ms'):>7}  "
+              f"p95 {change('p95_ms'):>7}  p99 {change('p99_ms'):>7}  "
+              f"errors {old['error_rate']:.1%} → {row['error_rate']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", default=API_BASE, help=f"API base URL (default {API_BASE})")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="recorded requests per level")
+    parser.add_argument("--warmup", type=int, default=2, help="unrecorded requests before each level")
+    parser.add_argument("--reranker", choices=["off", "on", "both"], default="both")
+    parser.add_argument("--start-servers", action="store_true", help="run the stub model server + API locally")
+    parser.add_argument("--stub-args", default="", help="extra stub_server.py arguments, e.g. '--decode-tps 120'")
+    parser.add_argument("--keep-caches", action="store_true", help="with --start-servers: leave caches and coalescing on")
+    parser.add_argument("--out", type=Path, help="results file (default 04_bench/results/load_<commit>_<time>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    questions = [json.loads(line)["question"] for line in open(EVAL_PATH) if line.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    rerank_modes = {"off": [False], "on": [True], "both": [False, True]}[args.reranker]
+
+    procs: list[subprocess.Popen] = []
+    base = args.url
+    if args.start_servers:
+        base, procs = start_servers(args.stub_args, args.keep_caches)
+    commit = _git_commit()
+    print(f"Load test on {base} @ {commit}: {len(questions)} questions, levels {levels}, "
+          f"{args.requests} requests per level\n")
+    try:
+        results, server_stats = asyncio.run(run(base, questions, levels, rerank_modes, args.requests, args.warmup))
+    finally:
+        stop_servers(procs)
+
+    out = args.out or RESULTS_DIR / f"load_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "commit":    commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "target":    "stub" if args.start_servers else base,
+        "settings":  {
+            "concurrency": levels, "requests": args.requests, "warmup": args.warmup,
+            "stub_args": args.stub_args if args.start_servers else None,
+            "caches": args.keep_caches or not args.start_servers,
+        },
+        "results":      results,
+        "server_stats": server_stats,
+    }, indent=2))
+    if args.compare:
+        compare(results, args.compare)
+    print(f"\n  Results → {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+"""
+Scale benchmark — retrieval on synthetic corpora from 10k to 1M documents.
+
+The real knowledge base has 34 files; this generates corpora shaped like it at
+any size and measures where the in-process retrieval path stops scaling:
+
+  corpus      descriptions with the real word-count distribution (~60 words) over a
+              Zipf vocabulary that grows with the corpus (real description words first,
+              then synthetic terms), tags drawn from the 42-tag taxonomy with the real
+              per-document count and popularity, clustered L2-normalised embeddings
+  build       BM25.fit and snapshot write time (metadata.csv parse for small sizes)
+  load        Index.load() from the memory-mapped snapshot, resident memory after
+              load and after the queries, mapped vs private bytes
+  per query   p50 / p95 / p99 ms of each scoring component on synthetic queries:
+                cosine      _cosine_scores over all documents
+                tags        _tag_scores (bit-packed doc × tag matrix)
+                bm25_topk   _bm25_candidates (MaxScore top-k, as retrieve() uses)
+                bm25_dense  BM25.scores (every matching document)
+                argsort     np.argsort of the fused scores (the full sort _fuse used to do)
+                top_k       ann.top_k_indices (argpartition + small sort)
+                vectors     ANN candidate search (only with ANN_BACKEND=ivf)
+                fuse        _fuse end to end with precomputed signals (the scoring stage)
+
+Each size is generated and measured in a fresh process, so memory numbers are not
+inflated by earlier sizes. Corpora are cached under --work-dir and reused.
+
+Regression checks (exit code 1 on failure):
+  --thresholds FILE   absolute budgets per --dim and size (default 04_bench/scale_thresholds.json);
+                      budgets exist for --dim 1024 only, other dims skip this check
+  --baseline FILE     an earlier report; a metric more than --tolerance slower fails
+  scaling             a component whose time grows faster than size^--max-exponent
+                      between consecutive sizes is flagged as a scaling cliff
+
+Usage:
+  python3 04_bench/scale_bench.py                          # 10k, 100k
+  python3 04_bench/scale_bench.py --sizes 10000,100000,1000000 --dim 384
+Output: 04_bench/results/scale_<commit>_<time>.json (or --out)
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import math
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+_HERE = Path(__file__).parent
+_RAG = _HERE.parent
+sys.path.insert(0, str(_RAG))                 # rag/ — for config
+sys.path.insert(0, str(_RAG / "02_search"))   # 02_search/ — for bm25, snapshot, retrieval
+
+RESULTS_DIR    = _HERE / "results"
+WORK_DIR       = _HERE / "corpora"
+THRESHOLDS     = _HERE / "scale_thresholds.json"
+COMPONENTS     = ["cosine", "tags", "bm25_topk", "bm25_dense", "argsort", "top_k", "vectors", "fuse"]
+CORPUS_VERSION = 1
+
+
+# ─── Corpus generation ───────────────────────────────────────────────────────
+
+def _real_stats() -> dict:
+    """Word counts, vocabulary, tag counts and tag popularity of the real metadata.csv."""
+    from config import METADATA_CSV, MASTER_TAGS_JSON
+    from snapshot import read_metadata_csv
+
+    records, _ = read_metadata_csv(METADATA_CSV)
+    words = Counter(w for rec in records for w in rec["description"].lower().split())
+    tags = sorted(set(json.loads(Path(MASTER_TAGS_JSON).read_text()).values()))
+    tag_freq = Counter(t for rec in records for t in rec["tags"] if t in tags)
+    return {
+        "doc_words": [len(rec["description"].split()) for rec in records],
+        "vocab":     [w for w, _ in words.most_common()],
+        "doc_tags":  [len(rec["tags"]) for rec in records],
+        "tags":      tags,
+        "tag_freq":  [tag_freq[t] + 1 for t in tags],  # +1: every tag can occur
+    }
+
+
+def _zipf_probs(n: int, s: float = 1.07, q: float = 2.7) -> np.ndarray:
+    p = 1.0 / np.power(np.arange(n) + q, s)
+    return p / p.sum()
+
+
+def generate_corpus(out_dir: Path, n: int, dim: int, seed: int, csv_max: int) -> dict:
+    """Write records, embeddings and a snapshot for a synthetic corpus of n documents."""
+    from bm25 import BM25
+    from snapshot import write_snapshot_arrays, source_fingerprint, RECORD_COLUMNS
+
+    rng = np.random.default_rng(seed)
+    real = _real_stats()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    timings = {}
+
+    # Descriptions: real length distribution, vocabulary growing roughly like Heaps' law
+    t0 = time.perf_counter()
+    mean, std = float(np.mean(real["doc_words"])), float(np.std(real["doc_words"]))
+    lengths = np.clip(rng.normal(mean, std, n).round(), 20, 150).astype(np.int64)
+    vocab_size = max(len(real["vocab"]), int(400 * math.sqrt(n)))
+    vocab = np.array(real["vocab"] + [f"term{i}" for i in range(vocab_size - len(real["vocab"]))], dtype=object)
+    word_ids = rng.choice(vocab_size, size=int(lengths.sum()), p=_zipf_probs(vocab_size))
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    words = vocab[word_ids]
+    descriptions = [" ".join(words[bounds[i]:bounds[i + 1]]) for i in range(n)]
+
+    # Tags: real count per document and popularity (Gumbel top-k = weighted sampling w/o replacement)
+    tags = real["tags"]
+    counts = rng.choice(real["doc_tags"], size=n)
+    keys = np.log(np.array(real["tag_freq"], dtype=np.float64)) + rng.gumbel(size=(n, len(tags)))
+    order = np.argsort(-keys, axis=1)
+    doc_tags = [{tags[j] for j in order[i, :min(counts[i], len(tags))]} for i in range(n)]
+
+    records = [
+        {
+            "filepath":      f"synthetic/doc_{i:07d}.md",
+            "filename":      f"doc_{i:07d}.md",
+            "description":   descriptions[i],
+            "tags":          doc_tags[i],
+            "last_modified": "2024-01-01",
+            "status":        "active",
+            "department":    "engineering",
+            "author":        "",
+            "in_manifest":   "yes",
+            "supersedes":    "",
+            "conflict_with": "",
+        }
+        for i in range(n)
+    ]
+    timings["generate_text_s"] = time.perf_counter() - t0
+
+    # Embeddings: documents clustered around sqrt(n) topics, written straight to disk
+    t0 = time.perf_counter()
+    n_topics = max(8, int(math.sqrt(n)))
+    centroids = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    emb_path = out_dir / "embeddings_raw.npy"
+    emb = np.lib.format.open_memmap(emb_path, mode="w+", dtype=np.float32, shape=(n, dim))
+    chunk = 65536
+    for start in range(0, n, chunk):
+        end = min(n, start + chunk)
+        topic = rng.integers(0, n_topics, end - start)
+        block = centroids[topic] + 0.8 * rng.standard_normal((end - start, dim)).astype(np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        emb[start:end] = block
+    emb.flush()
+    timings["generate_embeddings_s"] = time.perf_counter() - t0
+
+    (out_dir / "master_tags.json").write_text(json.dumps({t: t for t in tags}))
+
+    # metadata.csv only for small corpora — 1024 JSON floats per row do not scale
+    metadata_csv = out_dir / "metadata.csv"
+    if n <= csv_max:
+        t0 = time.perf_counter()
+        with open(metadata_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(RECORD_COLUMNS[:2] + ["filetype"] + RECORD_COLUMNS[2:] + ["embedding"])
+            for rec, vec in zip(records, emb):
+                row = [rec[c] if c != "tags" else "|".join(sorted(rec[c])) for c in RECORD_COLUMNS]
+                emb_json = "[" + ",".join(f"{x:.6f}" for x in vec.tolist()) + "]"
+                writer.writerow(row[:2] + ["md"] + row[2:] + [emb_json])
+        timings["write_csv_s"] = time.perf_counter() - t0
+        source = source_fingerprint(metadata_csv)
+    else:
+        source = {"synthetic": n, "seed": seed, "dim": dim}
+
+    t0 = time.perf_counter()
+    bm25 = BM25()
+    bm25.fit(descriptions)
+    timings["bm25_fit_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    write_snapshot_arrays(out_dir / "index_snapshot", records, emb, source, bm25=bm25)
+    timings["write_snapshot_s"] = time.perf_counter() - t0
+    emb_path.unlink()
+
+    info = {
+        "version":    CORPUS_VERSION,
+        "n_docs":     n,
+        "dim":        dim,
+        "seed":       seed,
+        "vocab_size": vocab_size,
+        "csv":        n <= csv_max,
+        "build":      {k: round(v, 3) for k, v in timings.items()},
+    }
+    (out_dir / "corpus.json").write_text(json.dumps(info, indent=2))
+    return info
+
+
+def corpus_dir(work_dir: Path, n: int, dim: int, seed: int) -> Path:
+    return work_dir / f"n{n}_d{dim}_s{seed}"
+
+
+def ensure_corpus(work_dir: Path, n: int, dim: int, seed: int, csv_max: int) -> dict:
+    out_dir = corpus_dir(work_dir, n, dim, seed)
+    info_path = out_dir / "corpus.json"
+    if info_path.exists():
+        info = json.loads(info_path.read_text())
+        if info.get("version") == CORPUS_VERSION:
+            return info
+    return generate_corpus(out_dir, n, dim, seed, csv_max)
+
+
+# ─── Measurement ─────────────────────────────────────────────────────────────
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux /proc), else peak RSS from getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def _summary(samples: list[float]) -> dict:
+    ms = np.asarray(samples) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms":  round(float(np.percentile(ms, 50)), 4),
+        "p95_ms":  round(float(np.percentile(ms, 95)), 4),
+        "p99_ms":  round(float(np.percentile(ms, 99)), 4),
+    }
+
+
+def _queries(ix, n_queries: int, seed: int) -> list[tuple[str, np.ndarray, set[str]]]:
+    """(text, vector, tags) — a few description words, a perturbed document vector, 1–4 of its tags."""
+    rng = np.random.default_rng(seed + 1)
+    out = []
+    for doc in rng.integers(0, len(ix.records), n_queries):
+        rec = ix.records[int(doc)]
+        words = rec["description"].split()
+        start = int(rng.integers(0, max(1, len(words) - 6)))
+        text = " ".join(words[start:start + int(rng.integers(3, 8))])
+        vec = np.asarray(ix.embeddings[int(doc)], dtype=np.float32) + 0.3 * rng.standard_normal(ix.embeddings.shape[1]).astype(np.float32)
+        tags = sorted(rec["tags"])
+        picked = set(rng.choice(tags, size=min(len(tags), int(rng.integers(1, 5))), replace=False)) if tags else set()
+        out.append((text, vec, picked))
+    return out
+
+
+def measure(work_dir: Path, n: int, dim: int, seed: int, n_queries: int) -> dict:
+    """Load one corpus in this (fresh) process and time each scoring component."""
+    # retrieval builds its model clients at import; nothing here calls them
+    os.environ.setdefault("LLM_BASE_URL", "http://127.0.0.1:9/v1")
+    os.environ.setdefault("EMBED_BASE_URL", "http://127.0.0.1:9/v1")
+    from ann import top_k_indices
+    from config import TOP_K, VECTOR_CANDIDATES
+    from snapshot import read_metadata_csv
+    import retrieval
+    from retrieval import Index, _cosine_scores, _tag_scores, _bm25_candidates, _fuse
+
+    cdir = corpus_dir(work_dir, n, dim, seed)
+    info = json.loads((cdir / "corpus.json").read_text())
+    result = {"n_docs": n, "dim": dim, "build": info["build"]}
+
+    if info["csv"]:
+        t0 = time.perf_counter()
+        read_metadata_csv(cdir / "metadata.csv")
+        result["csv_parse_s"] = round(time.perf_counter() - t0, 3)
+
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    ix = Index()
+    ix.load(cdir / "metadata.csv", cdir / "master_tags.json", cdir / "index_snapshot")
+    result["load_s"] = round(time.perf_counter() - t0, 3)
+    result["rss_after_load_mb"] = round(_rss_mb() - rss_before, 1)
+    mem = ix.memory_usage()
+    result["mapped_mb"] = round(mem["mapped_bytes"] / 1e6, 1)
+    result["private_mb"] = round(mem["private_bytes"] / 1e6, 1)
+
+    queries = _queries(ix, n_queries, seed)
+    samples: dict[str, list[float]] = {c: [] for c in COMPONENTS}
+    clock = time.perf_counter
+
+    def timed(name: str, fn, *args):
+        t = clock()
+        out = fn(*args)
+        samples[name].append(clock() - t)
+        return out
+
+    for text, vec, tags in queries:
+        vec_scores = timed("cosine", _cosine_scores, ix, vec)
+        tag_scores = timed("tags", _tag_scores, ix, tags)
+        bm25_ids, bm25_vals = timed("bm25_topk", _bm25_candidates, ix, text)
+        timed("bm25_dense", ix.bm25.scores, text)
+        final = retrieval.VECTOR_WEIGHT * vec_scores + retrieval.TAG_WEIGHT * tag_scores
+        final[bm25_ids] += retrieval.BM25_WEIGHT * bm25_vals
+        timed("argsort", lambda s: np.argsort(s)[::-1][:TOP_K], final)
+        timed("top_k", top_k_indices, final, TOP_K)
+        if not ix.vectors.exhaustive:
+            q = vec / (np.linalg.norm(vec) + 1e-9)
+            timed("vectors", ix.vectors.search, q, VECTOR_CANDIDATES)
+        timed("fuse", _fuse, ix, vec, tags, bm25_ids, bm25_vals)
+
+    result["rss_after_queries_mb"] = round(_rss_mb() - rss_before, 1)
+    result["queries"] = {c: _summary(s) for c, s in samples.items() if s}
+    return result
+
+
+def _in_fresh_process(fn, *args):
+    ctx = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(fn, *args).result()
+
+
+# ─── Regression checks ───────────────────────────────────────────────────────
+
+def _flat(size_result: dict) -> dict[str, float]:
+    """Metric name → value, e.g. load_s, rss_after_load_mb, fuse.p95_ms."""
+    flat = {k: v for k, v in size_result.items() if isinstance(v, (int, float)) and k not in ("n_docs", "dim")}
+    for component, stats in size_result.get("queries", {}).items():
+        for stat, value in stats.items():
+            flat[f"{component}.{stat}"] = value
+    return flat
+
+
+def check(sizes: list[dict], thresholds: dict, baseline: dict | None, tolerance: float,
+          max_exponent: float, min_ms: float) -> list[str]:
+    failures = []
+
+    for res in sizes:
+        budget = thresholds.get("budgets", {}).get(str(res["dim"]), {}).get(str(res["n_docs"]), {})
+        flat = _flat(res)
+        for metric, limit in budget.items():
+            if metric in flat and flat[metric] > limit:
+                failures.append(f"n={res['n_docs']}: {metric} = {flat[metric]} > budget {limit}")
+
+    if baseline is not None:
+        before = {(r["n_docs"], r["dim"]): _flat(r) for r in baseline.get("sizes", [])}
+        for res in sizes:
+            old = before.get((res["n_docs"], res["dim"]))
+            if old is None:
+                continue
+            for metric, value in _flat(res).items():
+                if not (metric.endswith("p50_ms") or metric.endswith("p95_ms") or metric == "load_s"):
+                    continue
+                prev = old.get(metric)
+                # tiny timings are mostly noise — only compare above min_ms (or 1 ms for seconds)
+                floor = min_ms if metric.endswith("_ms") else min_ms / 1000
+                if prev and max(prev, value) >= floor and value > prev * (1 + tolerance):
+                    failures.append(f"n={res['n_docs']}: {metric} {prev} → {value} (+{value / prev - 1:.0%})")
+
+    for a, b in zip(sizes, sizes[1:]):
+        ratio = b["n_docs"] / a["n_docs"]
+        if ratio <= 1:
+            continue
+        for component in COMPONENTS:
+            qa, qb = a["queries"].get(component), b["queries"].get(component)
+            if not qa or not qb or qb["p50_ms"] < min_ms:
+                continue
+            exponent = math.log(max(qb["p50_ms"], 1e-6) / max(qa["p50_ms"], 1e-6)) / math.log(ratio)
+            b.setdefault("scaling_exponent", {})[component] = round(exponent, 2)
+            if exponent > max_exponent:
+                failures.append(
+                    f"{component}: p50 {qa['p50_ms']} → {qb['p50_ms']} ms for {a['n_docs']} → {b['n_docs']} docs "
+                    f"(∝ size^{exponent:.2f}, limit {max_exponent})"
+                )
+    return failures
+
+
+# ─── Main ────────────────────────────────────────────────────────────────────
+
+def _git_commit() -> str:
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=_RAG, text=True).strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=_RAG).returncode != 0
+        return sha + ("-dirty" if dirty else "")
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated corpus sizes")
+    parser.add_argument("--dim", type=int, default=1024, help="embedding dimensions")
+    parser.add_argument("--queries", type=int, default=200, help="queries per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv-max", type=int, default=10000, help="also write metadata.csv up to this size")
+    parser.add_argument("--work-dir", type=Path, default=WORK_DIR, help="where generated corpora are kept")
+    parser.add_argument("--thresholds", type=Path, default=THRESHOLDS)
+    parser.add_argument("--baseline", type=Path, help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown vs --baseline")
+    parser.add_argument("--max-exponent", type=float, default=1.5, help="allowed growth of p50 with corpus size")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="ignore timings below this in relative checks")
+    parser.add_argument("--out", type=Path)
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(",") if s.strip())
+    results = []
+    for n in sizes:
+        print(f"[{n:>8} docs] generating / loading corpus...")
+        _in_fresh_process(ensure_corpus, args.work_dir, n, args.dim, args.seed, args.csv_max)
+        res = _in_fresh_process(measure, args.work_dir, n, args.dim, args.seed, args.queries)
+        results.append(res)
+        q = res["queries"]
+        print(f"[{n:>8} docs] load {res['load_s']:.2f}s, rss +{res['rss_after_load_mb']:.0f} MB "
+              f"(+{res['rss_after_queries_mb']:.0f} MB after queries), bm25.fit {res['build']['bm25_fit_s']:.1f}s")
+        print("               p50 ms: " + "  ".join(f"{c} {s['p50_ms']:.3f}" for c, s in q.items()))
+
+    thresholds = json.loads(args.thresholds.read_text()) if args.thresholds and args.thresholds.exists() else {}
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    failures = check(results, thresholds, baseline, args.tolerance, args.max_exponent, args.min_ms)
+
+    commit = _git_commit()
+    out = args.out or RESULTS_DIR / f"scale_{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "commit":    commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "settings":  {"dim": args.dim, "queries": args.queries, "seed": args.seed,
+                      "tolerance": args.tolerance, "max_exponent": args.max_exponent},
+        "sizes":     results,
+        "failures":  failures,
+    }, indent=2))
+
+    print("\n" + "=" * 72)
+    print("SCALE BENCHMARK — " + ("FAIL" if failures else "PASS"))
+    print("=" * 72)
+    for failure in failures:
+        print(f"  ✗ {failure}")
+    print(f"\n  Results → {out}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
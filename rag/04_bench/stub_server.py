@@ -0,0 +1,284 @@
+"""
+Stub model server — a local stand-in for the vLLM chat and embedding endpoints.
+
+Speaks enough of the OpenAI API for everything in rag/ to run against it:
+
+  POST /v1/embeddings          deterministic hash-based vectors (feature hashing of the
+                               words, so texts sharing words get similar vectors)
+  POST /v1/chat/completions    canned JSON / text picked from the prompt:
+                                 query tags      {"tags": [...]} from the allowed list
+                                 reranker sort   {"order": [...]} over all candidates
+                                 paraphrases     {"paraphrases": [...]}
+                                 ingestion       {"description", "tags"} / tag mapping
+                                 eval judge      {"score", "reason"}
+                                 answers         text citing the first sources
+                               stream=True (SSE chunks, usage with include_usage) included
+  GET  /v1/models, /health
+
+Latency model (all configurable, see --help):
+  chat        ttft_ms + prompt_tokens / prefill_tps, then completion tokens at decode_tps
+  embeddings  embed_ms + embed_ms_per_input × inputs
+  --error-rate returns 503 for that fraction of requests (exercises client retries)
+
+Usage:
+  python3 04_bench/stub_server.py --port 9000
+  LLM_BASE_URL=http://localhost:9000/v1 EMBED_BASE_URL=http://localhost:9000/v1 python3 -m uvicorn ...
+
+Vectors have --dim dimensions (1024, like Qwen3-Embedding-0.6B). They are unrelated to
+the real model's, so relevance is meaningless unless the index was ingested against the
+stub too — latency and throughput are what it is for.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Stub model server")
+
+
+class Settings:
+    dim = int(os.environ.get("STUB_DIM", "1024"))
+    ttft_ms = float(os.environ.get("STUB_TTFT_MS", "80"))
+    prefill_tps = float(os.environ.get("STUB_PREFILL_TPS", "8000"))   # prompt tokens / s; 0 = free
+    decode_tps = float(os.environ.get("STUB_DECODE_TPS", "60"))       # completion tokens / s; 0 = instant
+    answer_tokens = int(os.environ.get("STUB_ANSWER_TOKENS", "150"))
+    embed_ms = float(os.environ.get("STUB_EMBED_MS", "15"))
+    embed_ms_per_input = float(os.environ.get("STUB_EMBED_MS_PER_INPUT", "0.5"))
+    error_rate = float(os.environ.get("STUB_ERROR_RATE", "0"))
+
+
+settings = Settings()
+counters = {"chat": 0, "embeddings": 0, "errors": 0}
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9\-]*")
+_HASHES_PER_WORD = 8
+
+
+def _tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), at least 1."""
+    return max(1, len(text) // 4)
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+# ─── Embeddings ──────────────────────────────────────────────────────────────
+
+def embed(text: str, dim: int) -> list[float]:
+    """Signed feature hashing of the words, L2-normalised; the same text always gives the same vector."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for word in _WORD.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=4 * _HASHES_PER_WORD).digest()
+        for j in range(_HASHES_PER_WORD):
+            h = int.from_bytes(digest[4 * j:4 * j + 4], "little")
+            vec[(h >> 1) % dim] += 1.0 if h & 1 else -1.0
+    if not vec.any():
+        vec[_seed(text) % dim] = 1.0  # empty / punctuation-only input
+    vec /= np.linalg.norm(vec)
+    return vec.tolist()
+
+
+# ─── Canned completions ──────────────────────────────────────────────────────
+
+def _after(text: str, marker: str) -> str:
+    i = text.find(marker)
+    return text[i + len(marker):] if i >= 0 else ""
+
+
+def _pick(items: list, k: int, key: str) -> list:
+    """k items chosen deterministically by key."""
+    return random.Random(_seed(key)).sample(items, min(k, len(items)))
+
+
+def _filler(n_tokens: int, key: str) -> str:
+    words = ["the", "policy", "states", "that", "requests", "must", "be", "approved", "by",
+             "the", "owning", "team", "before", "rollout", "and", "reviewed", "quarterly"]
+    rng = random.Random(_seed(key))
+    out, total = [], 0
+    while total < n_tokens:
+        word = rng.choice(words)
+        out.append(word)
+        total += _tokens(word + " ")
+    return " ".join(out).capitalize() + "."
+
+
+def complete(messages: list[dict], answer_tokens: int, json_mode: bool = False) -> str:
+    """Canned reply for the prompt types used by ingestion, retrieval, reranking, generation and eval."""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+
+    if "Select tags for this query" in prompt:
+        allowed = _after(prompt, "ALLOWED TAGS (use ONLY these exact strings):").strip().split("\n")[0]
+        tags = [t.strip() for t in allowed.split(",") if t.strip()]
+        query = _after(prompt, "User query:").split("\n")[0].lower()
+        hits = [t for t in tags if any(part in query for part in t.split("-") if len(part) > 2)]
+        return json.dumps({"tags": (hits or _pick(tags, 2, query))[:6]})
+
+    if "Sort these documents by relevance" in prompt:
+        ids = [int(i) for i in re.findall(r"^(\d+): \[", prompt, flags=re.MULTILINE)]
+        return json.dumps({"order": _pick(ids, len(ids), prompt)})
+
+    if "paraphrases of the question" in prompt:
+        question = _after(prompt, "Question:").split("\n")[0].strip()
+        n = int(m.group(1)) if (m := re.search(r"Generate (\d+) paraphrases", prompt)) else 3
+        return json.dumps({"paraphrases": [f"{p} {question}" for p in ("Could you tell me:", "I'd like to know:", "Please explain:")][:n]})
+
+    if "Assign tags to this document from the provided taxonomy" in prompt:
+        nouns = _after(prompt, "(assign all that apply):").strip().split("\n")[0]
+        categories = re.findall(r"^  - (\S+)$", prompt, flags=re.MULTILINE)
+        tags = _pick(categories, 2, prompt) + _pick([t.strip() for t in nouns.split(",") if t.strip()], 2, prompt)
+        return json.dumps({"tags": tags})
+
+    if "Analyze this internal document" in prompt or "Analyze this document catalog" in prompt:
+        body = _after(prompt, "Content:\n---").split("\n---")[0] or prompt
+        words = _WORD.findall(body.lower())
+        return json.dumps({
+            "description": " ".join(body.split()[:90]) or "Empty document.",
+            "tags": sorted(set(w for w in words if len(w) > 4))[:12],
+        })
+
+    if "normalizing keyword tags" in prompt:
+        raw = _after(prompt, "comma-separated:\n").split("\n")[0]
+        return json.dumps({t.strip(): t.strip() for t in raw.split(",") if t.strip()})
+
+    if "Score the system answer" in prompt:
+        return json.dumps({"score": 2, "reason": "stub judge"})
+
+    if "Source documents:" in prompt:
+        sources = re.findall(r"=== SOURCE \d+: (\S+)", prompt)
+        if not sources:
+            return "I don't have enough information to answer this question based on the available knowledge base."
+        cited = ", ".join(sources[:2])
+        return f"{_filler(answer_tokens, prompt)}\n\n[Sources: {cited}]"
+
+    return "{}" if json_mode else _filler(answer_tokens, prompt)
+
+
+# ─── Routes ──────────────────────────────────────────────────────────────────
+
+def _error() -> JSONResponse | None:
+    if settings.error_rate > 0 and random.random() < settings.error_rate:
+        counters["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": {"message": "stub: injected error"}})
+    return None
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    if (err := _error()) is not None:
+        return err
+    body = await request.json()
+    inputs = body.get("input", "")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    counters["embeddings"] += 1
+    await asyncio.sleep((settings.embed_ms + settings.embed_ms_per_input * len(inputs)) / 1000)
+    data = [{"object": "embedding", "index": i, "embedding": embed(text, settings.dim)} for i, text in enumerate(inputs)]
+    n = sum(_tokens(text) for text in inputs)
+    return {
+        "object": "list",
+        "data":   data,
+        "model":  body.get("model", "stub-embed"),
+        "usage":  {"prompt_tokens": n, "total_tokens": n},
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    if (err := _error()) is not None:
+        return err
+    body = await request.json()
+    counters["chat"] += 1
+    messages = body.get("messages", [])
+    max_tokens = body.get("max_tokens") or settings.answer_tokens
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    text = complete(messages, min(settings.answer_tokens, max_tokens), json_mode)
+    prompt_tokens = sum(_tokens(str(m.get("content", ""))) for m in messages)
+    usage = {
+        "prompt_tokens":     prompt_tokens,
+        "completion_tokens": _tokens(text),
+        "total_tokens":      prompt_tokens + _tokens(text),
+    }
+    meta = {
+        "id":      f"chatcmpl-{uuid.uuid4().hex[:16]}",
+        "created": int(time.time()),
+        "model":   body.get("model", "stub-llm"),
+    }
+    prefill = prompt_tokens / settings.prefill_tps if settings.prefill_tps > 0 else 0.0
+    await asyncio.sleep(settings.ttft_ms / 1000 + prefill)
+
+    if body.get("stream"):
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(_stream(text, meta, usage, include_usage), media_type="text/event-stream")
+
+    if settings.decode_tps > 0:
+        await asyncio.sleep(usage["completion_tokens"] / settings.decode_tps)
+    return {
+        **meta,
+        "object":  "chat.completion",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage":   usage,
+    }
+
+
+async def _stream(text: str, meta: dict, usage: dict, include_usage: bool):
+    def chunk(delta: dict, finish: str | None = None, **extra) -> str:
+        payload = {
+            **meta, "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra,
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    pieces = re.findall(r"\S+\s*", text) or [text]
+    for piece in pieces:
+        if settings.decode_tps > 0:
+            await asyncio.sleep(_tokens(piece) / settings.decode_tps)
+        yield chunk({"content": piece})
+    yield chunk({}, "stop")
+    if include_usage:
+        yield f"data: {json.dumps({**meta, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/v1/models")
+def models():
+    return {"object": "list", "data": [{"id": "stub-llm", "object": "model"}, {"id": "stub-embed", "object": "model"}]}
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", **counters}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible chat + embeddings server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--dim", type=int, default=settings.dim, help="embedding dimensions")
+    parser.add_argument("--ttft-ms", type=float, default=settings.ttft_ms, help="chat: fixed delay before the first token")
+    parser.add_argument("--prefill-tps", type=float, default=settings.prefill_tps, help="chat: prompt tokens per second (0 = free)")
+    parser.add_argument("--decode-tps", type=float, default=settings.decode_tps, help="chat: completion tokens per second (0 = instant)")
+    parser.add_argument("--answer-tokens", type=int, default=settings.answer_tokens, help="chat: length of generated answers")
+    parser.add_argument("--embed-ms", type=float, default=settings.embed_ms, help="embeddings: fixed delay per request")
+    parser.add_argument("--embed-ms-per-input", type=float, default=settings.embed_ms_per_input, help="embeddings: extra delay per input")
+    parser.add_argument("--error-rate", type=float, default=settings.error_rate, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+    for name in ("dim", "ttft_ms", "prefill_tps", "decode_tps", "answer_tokens", "embed_ms", "embed_ms_per_input", "error_rate"):
+        setattr(settings, name, getattr(args, name))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
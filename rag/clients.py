@@ -0,0 +1,127 @@
+"""
+Shared model-server clients — one pooled HTTP client per endpoint for the whole process.
+
+Every module gets its OpenAI / AsyncOpenAI clients from here instead of building
+its own, so all calls to an endpoint reuse the same keep-alive connections:
+
+  llm_client() / async_llm_client()       LLM_BASE_URL    (tags, reranking, generation)
+  embed_client() / async_embed_client()   EMBED_BASE_URL  (query / description embeddings)
+
+Pool size, keep-alive, connect/read timeouts and retries come from config.py.
+Retries use the OpenAI SDK's policy: exponential backoff with jitter on
+connection errors, 408/409/429 and 5xx, at most MODEL_MAX_RETRIES times.
+
+pool_stats() reports per endpoint: requests sent, responses by status class and
+the current connections of each pool (open / idle / in use).
+"""
+
+import threading
+from collections import Counter
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from config import (
+    LLM_BASE_URL, EMBED_BASE_URL,
+    MODEL_MAX_CONNECTIONS, MODEL_MAX_KEEPALIVE, MODEL_KEEPALIVE_EXPIRY,
+    MODEL_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, EMBED_READ_TIMEOUT, MODEL_MAX_RETRIES,
+)
+
+_lock = threading.Lock()
+_clients: dict[tuple[str, bool], OpenAI | AsyncOpenAI] = {}
+_http: dict[tuple[str, bool], httpx.Client | httpx.AsyncClient] = {}
+_counters: dict[str, Counter] = {}
+
+_ENDPOINTS = {
+    "llm":   (LLM_BASE_URL, LLM_READ_TIMEOUT),
+    "embed": (EMBED_BASE_URL, EMBED_READ_TIMEOUT),
+}
+
+
+def _hooks(name: str, is_async: bool) -> dict:
+    counter = _counters.setdefault(name, Counter())
+
+    def on_request(request):
+        counter["requests"] += 1
+
+    def on_response(response):
+        counter[f"{response.status_code // 100}xx"] += 1
+
+    if not is_async:
+        return {"request": [on_request], "response": [on_response]}
+
+    async def aon_request(request):
+        on_request(request)
+
+    async def aon_response(response):
+        on_response(response)
+
+    return {"request": [aon_request], "response": [aon_response]}
+
+
+def _client(name: str, is_async: bool) -> OpenAI | AsyncOpenAI:
+    key = (name, is_async)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _clients:
+            base_url, read_timeout = _ENDPOINTS[name]
+            timeout = httpx.Timeout(read_timeout, connect=MODEL_CONNECT_TIMEOUT)
+            limits = httpx.Limits(
+                max_connections=MODEL_MAX_CONNECTIONS,
+                max_keepalive_connections=MODEL_MAX_KEEPALIVE,
+                keepalive_expiry=MODEL_KEEPALIVE_EXPIRY,
+            )
+            http_cls = httpx.AsyncClient if is_async else httpx.Client
+            http = http_cls(timeout=timeout, limits=limits, event_hooks=_hooks(name, is_async))
+            sdk_cls = AsyncOpenAI if is_async else OpenAI
+            _http[key] = http
+            _clients[key] = sdk_cls(
+                base_url=base_url,
+                api_key="dummy",
+                timeout=timeout,
+                max_retries=MODEL_MAX_RETRIES,
+                http_client=http,
+            )
+    return _clients[key]
+
+
+def llm_client() -> OpenAI:
+    return _client("llm", False)
+
+
+def embed_client() -> OpenAI:
+    return _client("embed", False)
+
+
+def async_llm_client() -> AsyncOpenAI:
+    return _client("llm", True)
+
+
+def async_embed_client() -> AsyncOpenAI:
+    return _client("embed", True)
+
+
+def _connections(http: httpx.Client | httpx.AsyncClient) -> dict:
+    """Snapshot of the client's connection pool (httpcore internals; empty if unavailable)."""
+    pool = getattr(getattr(http, "_transport", None), "_pool", None)
+    conns = list(getattr(pool, "connections", []))
+    try:
+        idle = sum(1 for c in conns if c.is_idle())
+    except AttributeError:
+        return {}
+    return {"open": len(conns), "idle": idle, "in_use": len(conns) - idle}
+
+
+def pool_stats() -> dict:
+    """{endpoint: {requests, 2xx/4xx/5xx, sync/async connection snapshots}}."""
+    stats = {}
+    for name in _ENDPOINTS:
+        entry = dict(_counters.get(name, {}))
+        for is_async in (False, True):
+            http = _http.get((name, is_async))
+            if http is not None:
+                entry["async_pool" if is_async else "sync_pool"] = _connections(http)
+        stats[name] = entry
+    return stats
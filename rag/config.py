@@ -6,6 +6,11 @@ All values can be overridden via environment variables.
 import os
 from pathlib import Path
 
+
+def _flag(name: str, default: bool) -> bool:
+    return os.environ.get(name, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+
 # ─── Model endpoints ──────────────────────────────────────────────────────────
 
 # TODO: set your LLM and embedding server URLs via environment variables
@@ -14,6 +19,23 @@ LLM_MODEL     = os.environ.get("LLM_MODEL",     "YOUR_LLM_MODEL_NAME")
 EMBED_BASE_URL = os.environ.get("EMBED_BASE_URL", "http://YOUR_EMBED_HOST:PORT/v1")
 EMBED_MODEL   = os.environ.get("EMBED_MODEL",   "YOUR_EMBED_MODEL_NAME")
 
+# Shared HTTP clients (clients.py): per-endpoint connection pool, timeouts in seconds,
+# retries with jittered exponential backoff on connection errors / 429 / 5xx
+MODEL_MAX_CONNECTIONS  = int(os.environ.get("MODEL_MAX_CONNECTIONS", "100"))     # per endpoint
+MODEL_MAX_KEEPALIVE    = int(os.environ.get("MODEL_MAX_KEEPALIVE", "50"))        # idle connections kept open
+MODEL_KEEPALIVE_EXPIRY = float(os.environ.get("MODEL_KEEPALIVE_EXPIRY", "120"))
+MODEL_CONNECT_TIMEOUT  = float(os.environ.get("MODEL_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT       = float(os.environ.get("LLM_READ_TIMEOUT", "300"))        # long generations
+EMBED_READ_TIMEOUT     = float(os.environ.get("EMBED_READ_TIMEOUT", "30"))
+MODEL_MAX_RETRIES      = int(os.environ.get("MODEL_MAX_RETRIES", "2"))
+
+# Admission control (02_search/admission.py): calls in flight per backend, callers
+# waiting for a slot, and the longest wait before giving up (429 / 503 + Retry-After)
+LLM_CONCURRENCY     = int(os.environ.get("LLM_CONCURRENCY", "32"))        # 0 = unlimited
+EMBED_CONCURRENCY   = int(os.environ.get("EMBED_CONCURRENCY", "64"))      # 0 = unlimited
+ADMISSION_QUEUE     = int(os.environ.get("ADMISSION_QUEUE", "256"))       # waiters per backend
+ADMISSION_TIMEOUT   = float(os.environ.get("ADMISSION_TIMEOUT", "30"))    # seconds; 0 = wait forever
+
 # ─── Data paths ───────────────────────────────────────────────────────────────
 
 _HERE = Path(__file__).parent  # = rag/
@@ -28,6 +50,17 @@ MASTER_TAGS_JSON = Path(os.environ.get("MASTER_TAGS_JSON", str(_HERE / "master_t
 
 MANIFEST_PATH = KB_PATH / "meta" / "document_manifest.csv"
 
+# Compiled binary index (memory-mapped embeddings + BM25 postings), derived from metadata.csv
+INDEX_SNAPSHOT_DIR = Path(os.environ.get("INDEX_SNAPSHOT_DIR", str(_HERE / "index_snapshot")))
+# Shared mode: the first worker to start (re)builds a missing/stale snapshot under a
+# file lock, then every worker maps it read-only instead of holding a private copy
+INDEX_SHARED       = _flag("INDEX_SHARED", True)
+# Seconds between checks of metadata.csv / master_tags.json for hot reload; 0 = off
+# (POST /admin/reload triggers a reload on demand either way)
+INDEX_WATCH_INTERVAL = float(os.environ.get("INDEX_WATCH_INTERVAL", "0"))
+# Bearer token for POST /admin/reload; "" = the endpoint is disabled (403)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
 # ─── Ingestion settings ───────────────────────────────────────────────────────
 
 SKIP_FILES           = {"grandmas_lasagna_recipe.md", ".DS_Store"}
@@ -36,10 +69,78 @@ MAX_CONTENT_CHARS    = 12000
 
 # ─── Retrieval weights ────────────────────────────────────────────────────────
 
-TOP_K                = 10
+# Documents per query at each stage: retrieved (default of /query's top_k), ordered by
+# the reranker, and loaded into the generation prompt. 0 = every retrieved document.
+TOP_K                = int(os.environ.get("TOP_K", "10"))
+MAX_TOP_K            = int(os.environ.get("MAX_TOP_K", "50"))        # largest top_k a request may ask for
+RERANK_DEPTH         = int(os.environ.get("RERANK_DEPTH", "0"))
+CONTEXT_DEPTH        = int(os.environ.get("CONTEXT_DEPTH", "0"))
+
 VECTOR_WEIGHT        = 0.55
 TAG_WEIGHT           = 0.25
 BM25_WEIGHT          = 0.20
 MIN_SCORE            = 0.05
 MIN_RETRIEVAL_SCORE  = 0.52
 CONFIDENCE_THRESHOLD = 0.45
+
+# Query tags: "llm" (chat completion per query) or "local" (nearest tag centroids
+# of the query embedding — no extra model call)
+TAG_MODE             = os.environ.get("TAG_MODE", "llm")
+TAG_LOCAL_MAX        = int(os.environ.get("TAG_LOCAL_MAX", "6"))
+TAG_LOCAL_MIN        = int(os.environ.get("TAG_LOCAL_MIN", "2"))
+TAG_LOCAL_MARGIN     = float(os.environ.get("TAG_LOCAL_MARGIN", "0.05"))  # keep tags within this cosine of the best
+
+# BM25 candidates fused per query (MaxScore top-k); 0 = score every matching document
+BM25_CANDIDATES      = int(os.environ.get("BM25_CANDIDATES", "100"))
+
+# Query embedding and LLM tag extraction run concurrently (BM25 overlaps them on the
+# calling thread). A stage that misses its deadline (seconds) contributes a zero signal.
+EMBED_TIMEOUT        = float(os.environ.get("EMBED_TIMEOUT", "10"))
+TAG_TIMEOUT          = float(os.environ.get("TAG_TIMEOUT", "10"))
+RETRIEVAL_WORKERS    = int(os.environ.get("RETRIEVAL_WORKERS", "16"))     # threads shared by all queries
+EMBED_BATCH_SIZE     = int(os.environ.get("EMBED_BATCH_SIZE", "256"))     # questions per embeddings call (batch API)
+# Concurrent API queries share embeddings calls: a micro-batch is sent when it holds
+# EMBED_BATCH_MAX questions or EMBED_BATCH_WAIT_MS after its first question arrived
+EMBED_BATCH_MAX      = int(os.environ.get("EMBED_BATCH_MAX", "32"))
+EMBED_BATCH_WAIT_MS  = float(os.environ.get("EMBED_BATCH_WAIT_MS", "2"))     # 0 = no micro-batching
+
+# /query/batch: max questions per request, answers generated at the same time
+QUERY_BATCH_MAX        = int(os.environ.get("QUERY_BATCH_MAX", "256"))
+GENERATION_CONCURRENCY = int(os.environ.get("GENERATION_CONCURRENCY", "8"))
+BATCH_SIMS_MB          = int(os.environ.get("BATCH_SIMS_MB", "64"))   # (questions × docs) cosine block scored at a time
+
+# LRU cache of query embeddings and LLM tag sets, keyed on normalised query text
+QUERY_CACHE_SIZE     = int(os.environ.get("QUERY_CACHE_SIZE", "2048"))    # entries per cache; 0 = off
+QUERY_CACHE_TTL      = float(os.environ.get("QUERY_CACHE_TTL", "3600"))   # seconds; 0 = never expire
+
+# Answers reused for near-duplicate questions: same retrieved documents, same index
+# version, and question embeddings at least this similar (cosine)
+ANSWER_CACHE_SIZE      = int(os.environ.get("ANSWER_CACHE_SIZE", "512"))          # 0 = off
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL       = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))        # seconds; 0 = never expire
+
+# Rendered knowledge-base files for generation (Slack JSON formatted, truncated),
+# reused until a file's mtime/size change; misses of a request are read in parallel
+FILE_CACHE_BYTES     = int(os.environ.get("FILE_CACHE_BYTES", str(64 * 1024 * 1024)))  # 0 = off
+FILE_LOAD_WORKERS    = int(os.environ.get("FILE_LOAD_WORKERS", "8"))
+
+# Identical questions (normalised text + options) already in flight share one pipeline run
+QUERY_COALESCING = _flag("QUERY_COALESCING", True)
+
+# Slow-query log (02_search/slowlog.py): API requests at or above SLOW_QUERY_MS are
+# appended as JSON lines with their stage timings; the file rotates at SLOW_QUERY_LOG_BYTES.
+# Rotation is per process: with WEB_CONCURRENCY > 1 put "{pid}" in the path (one file per worker)
+SLOW_QUERY_LOG         = os.environ.get("SLOW_QUERY_LOG", str(_HERE / "slow_queries.jsonl"))  # "" = off
+SLOW_QUERY_MS          = float(os.environ.get("SLOW_QUERY_MS", "3000"))                   # 0 = log every query
+SLOW_QUERY_LOG_BYTES   = int(os.environ.get("SLOW_QUERY_LOG_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get("SLOW_QUERY_LOG_BACKUPS", "5"))
+
+# ─── Vector search ────────────────────────────────────────────────────────────
+
+ANN_BACKEND          = os.environ.get("ANN_BACKEND", "exact")           # "exact" | "ivf"
+ANN_MIN_DOCS         = int(os.environ.get("ANN_MIN_DOCS", "20000"))     # smaller corpora: always exact
+ANN_NLIST            = int(os.environ.get("ANN_NLIST", "0"))            # IVF cells; 0 = auto (4·√N)
+ANN_NPROBE           = int(os.environ.get("ANN_NPROBE", "16"))          # cells scanned per query — recall vs latency
+VECTOR_CANDIDATES    = int(os.environ.get("VECTOR_CANDIDATES", "100"))  # ANN candidates fused per query
+EMBEDDING_STORAGE    = os.environ.get("EMBEDDING_STORAGE", "float32")   # float32 | float16 | int8 | binary
+RESCORE_DEPTH        = int(os.environ.get("RESCORE_DEPTH", "200"))      # exact float rescoring of top code matches; 0 = off
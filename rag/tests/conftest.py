@@ -0,0 +1,63 @@
+"""
+Shared fixtures: a small on-disk index (metadata.csv + master_tags.json) and
+placeholder model endpoints — tests never reach a model server.
+"""
+
+import csv
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# retrieval / reranker / generator build their model clients at import time
+os.environ.setdefault("LLM_BASE_URL", "http://127.0.0.1:9/v1")
+os.environ.setdefault("EMBED_BASE_URL", "http://127.0.0.1:9/v1")
+
+_RAG = Path(__file__).parent.parent
+sys.path.insert(0, str(_RAG))                 # rag/ — for config
+sys.path.insert(0, str(_RAG / "02_search"))   # 02_search/ — modules under test
+
+TAGS = ["api", "database", "deploy", "hr", "security"]
+WORDS = [
+    "postgres", "migration", "database", "deploy", "freeze", "release", "api",
+    "gateway", "token", "vacation", "policy", "engineers", "incident", "backup",
+]
+DIM = 16
+
+
+@pytest.fixture
+def index_files(tmp_path: Path) -> dict:
+    """metadata.csv with 40 documents, master_tags.json and a snapshot directory."""
+    rng = np.random.default_rng(0)
+    metadata_csv = tmp_path / "metadata.csv"
+    with open(metadata_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "filepath", "filename", "filetype", "description", "tags", "last_modified", "status",
+            "department", "author", "in_manifest", "supersedes", "conflict_with", "embedding",
+        ])
+        for i in range(40):
+            words = rng.choice(WORDS, size=12)
+            tags = rng.choice(TAGS, size=2, replace=False)
+            emb = rng.standard_normal(DIM).round(4).tolist()
+            writer.writerow([
+                f"docs/doc_{i:02d}.md", f"doc_{i:02d}.md", "md", " ".join(words), "|".join(tags),
+                "2024-01-01", "active", "engineering", "", "yes", "", "", json.dumps(emb),
+            ])
+    master_tags = tmp_path / "master_tags.json"
+    master_tags.write_text(json.dumps({t: t for t in TAGS}))
+    return {"metadata_csv": metadata_csv, "master_tags_json": master_tags, "snapshot_dir": tmp_path / "snapshot"}
+
+
+@pytest.fixture
+def index(index_files: dict, monkeypatch):
+    """A loaded retrieval.Index, installed as the module's live index."""
+    import retrieval
+
+    ix = retrieval.Index()
+    ix.load(**index_files)
+    monkeypatch.setattr(retrieval, "_index", ix)
+    return ix
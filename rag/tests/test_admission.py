@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+import reranker
+import retrieval
+from admission import Limiter, Overloaded
+
+
+@pytest.fixture
+def saturated(monkeypatch):
+    """One-slot limiters with no wait queue, their slot taken — every new call is refused."""
+    held = []
+    for backend in ("llm", "embed"):
+        limiter = Limiter(backend, limit=1, queue_size=0, timeout=0)
+        slot = limiter.slot()
+        slot.__enter__()
+        held.append(slot)
+        for module in (retrieval, reranker):
+            if hasattr(module, f"{backend}_slots"):
+                monkeypatch.setattr(module, f"{backend}_slots", limiter)
+    yield
+    for slot in held:
+        slot.__exit__(None, None, None)
+
+
+def _refused(call) -> Overloaded:
+    with pytest.raises(Overloaded) as exc:
+        call()
+    assert exc.value.status == 429
+    return exc.value
+
+
+def test_retrieval_does_not_swallow_overloaded(index, saturated):
+    _refused(lambda: retrieval._extract_tags_llm(index, "postgres migration freeze"))
+    _refused(lambda: asyncio.run(retrieval._aextract_tags_llm(index, "postgres migration freeze")))
+    # the embedding stage surfaces it through _await / _aawait instead of a zero signal
+    _refused(lambda: retrieval.retrieve("vacation policy engineers", tag_mode="local"))
+    _refused(lambda: asyncio.run(retrieval.aretrieve("gateway token", tag_mode="local")))
+
+
+def test_reranker_does_not_swallow_overloaded(index, saturated):
+    docs = [{"filepath": rec["filepath"], "description": rec["description"]} for rec in index.records[:3]]
+    _refused(lambda: asyncio.run(reranker.asort_by_relevance("postgres migration freeze", docs)))
@@ -0,0 +1,20 @@
+import api
+
+
+def _docs(*paths):
+    return [{"filepath": p, "score": 0.9} for p in paths]
+
+
+def test_answer_key_depends_on_order_when_a_depth_cuts_the_list():
+    forward, backward = _docs("a.md", "b.md", "c.md"), _docs("c.md", "b.md", "a.md")
+
+    assert api._answer_key(forward, "v1", False, (0, 1)) != api._answer_key(backward, "v1", False, (0, 1))
+    assert api._answer_key(forward, "v1", True, (2, 0)) != api._answer_key(backward, "v1", True, (2, 0))
+
+
+def test_answer_key_ignores_order_when_every_document_is_used():
+    forward, backward = _docs("a.md", "b.md", "c.md"), _docs("c.md", "b.md", "a.md")
+
+    assert api._answer_key(forward, "v1", False, (0, 0)) == api._answer_key(backward, "v1", False, (0, 0))
+    # rerank_depth only matters when the reranker runs
+    assert api._answer_key(forward, "v1", False, (5, 0)) == api._answer_key(backward, "v1", False, (5, 0))
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def test_cancelled_batch_fails_its_callers():
+    async def main():
+        started = asyncio.Event()
+
+        async def never_answers(items):
+            started.set()
+            await asyncio.Event().wait()
+
+        batcher = MicroBatcher(never_answers, max_size=2, max_wait=1.0)
+        callers = [asyncio.create_task(batcher.submit(i)) for i in range(2)]
+        await started.wait()
+        for task in list(batcher._tasks):
+            task.cancel()
+
+        done, pending = await asyncio.wait(callers, timeout=1.0)
+        assert not pending
+        for caller in done:
+            with pytest.raises(RuntimeError):
+                caller.result()
+
+    asyncio.run(main())
+
+
+def test_batch_results_go_to_their_callers():
+    async def main():
+        async def double(items):
+            return [2 * item for item in items]
+
+        batcher = MicroBatcher(double, max_size=4, max_wait=0.01)
+        assert await asyncio.gather(*(batcher.submit(i) for i in range(6))) == [0, 2, 4, 6, 8, 10]
+        assert batcher.stats()["items"] == 6
+
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from bm25 import BM25
+
+VOCAB = [f"w{i}" for i in range(40)]
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(7)
+    zipf = 1.0 / np.arange(1, len(VOCAB) + 1)
+    texts = [
+        " ".join(rng.choice(VOCAB, size=rng.integers(3, 25), p=zipf / zipf.sum()))
+        for _ in range(300)
+    ]
+    texts += texts[:40]  # exact duplicates → tied scores, broken by doc id
+    bm25 = BM25()
+    bm25.fit(texts)
+    return bm25
+
+
+def _exhaustive_top_k(bm25: BM25, query: str, k: int):
+    """Every document scored (float64), non-zero ones ranked best first, ties by doc id."""
+    scores = np.zeros(len(bm25._doc_norm), dtype=np.float64)
+    for term in bm25._tokenize(query):
+        if term in bm25._vocab:
+            docs, contrib = bm25._term_contributions(bm25._vocab[term])
+            scores[docs] += contrib
+    ids = np.flatnonzero(scores)
+    ids = ids[np.lexsort((ids, -scores[ids]))][:k]
+    return ids, scores[ids]
+
+
+QUERIES = [
+    "w0", "w1 w2", "w0 w1 w2 w3", "w5 w17 w33", "w38 w39", "w3 w3 w7",
+    "w0 unknown w12", "nothing here", "", "W4 W25",
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("k", [1, 5, 10, 50, 1000])
+def test_top_k_matches_exhaustive_scoring(corpus, query, k):
+    ids, scores = corpus.top_k(query, k)
+    expected_ids, expected_scores = _exhaustive_top_k(corpus, query, k)
+
+    assert ids.tolist() == expected_ids.tolist()
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+    # and the same ranking as the dense scores() the API's non-MaxScore path uses
+    np.testing.assert_allclose(scores, corpus.scores(query)[ids], rtol=1e-5)
+
+
+def test_top_k_of_out_of_vocabulary_query_is_empty(corpus):
+    ids, scores = corpus.top_k("unknown words only", 10)
+    assert len(ids) == 0 and len(scores) == 0
+    assert not corpus.scores("unknown words only").any()
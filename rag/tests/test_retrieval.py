@@ -0,0 +1,61 @@
+import numpy as np
+
+import retrieval
+from ann import build_vector_index
+
+
+def _quantized(ix):
+    """Swap in int8 codes — a non-exhaustive backend, like ANN_BACKEND=ivf on a large corpus."""
+    ix.vectors = build_vector_index(ix.embeddings, storage="int8")
+    assert not ix.vectors.exhaustive
+    return ix
+
+
+def test_fuse_without_query_vector_on_non_exhaustive_index(index):
+    ix = _quantized(index)
+    bm25_ids, bm25_vals = retrieval._bm25_candidates(ix, "postgres migration freeze")
+    assert len(bm25_ids) > 1 and not np.all(np.diff(bm25_ids) > 0)  # best first, not sorted
+
+    results = retrieval._fuse(ix, None, set(), bm25_ids, bm25_vals, top_k=5)
+
+    assert len(results) == 5
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+    expected = dict(zip(bm25_ids.tolist(), bm25_vals.tolist()))
+    paths = [rec["filepath"] for rec in ix.records]
+    for r in results:
+        assert r["vec_score"] == 0.0
+        assert r["bm25_score"] == round(expected[paths.index(r["filepath"])], 4)
+
+
+def test_retrieve_batch_survives_failed_embedding_call(index, monkeypatch):
+    _quantized(index)
+
+    def embedding_server_down(queries):
+        raise ConnectionError("embedding server unreachable")
+
+    monkeypatch.setattr(retrieval, "embed_queries", embedding_server_down)
+    questions = ["postgres migration freeze", "vacation policy engineers", "gateway token"]
+
+    batch = retrieval.retrieve_batch(questions, tag_mode="local", top_k=4)
+
+    assert len(batch) == len(questions)
+    for question, results in zip(questions, batch):
+        assert results, question  # BM25 alone still ranks documents
+        assert all(r["vec_score"] == 0.0 and r["query_vec"] is None for r in results)
+        ids, _ = retrieval._bm25_candidates(index, question)
+        assert {r["filepath"] for r in results} <= {index.records[i]["filepath"] for i in ids}
+
+
+def test_retrieve_batch_scores_in_bounded_blocks(index, monkeypatch):
+    rng = np.random.default_rng(1)
+    questions = ["postgres migration freeze", "vacation policy engineers", "gateway token", "deploy release"]
+    vectors = [rng.standard_normal(index.embeddings.shape[1]).astype(np.float32) for _ in questions]
+    monkeypatch.setattr(retrieval, "embed_queries", lambda queries: [v.copy() for v in vectors])
+
+    whole = retrieval.retrieve_batch(questions, tag_mode="local", top_k=5)
+    monkeypatch.setattr(retrieval, "BATCH_SIMS_MB", 0)  # one question per block
+    blocked = retrieval.retrieve_batch(questions, tag_mode="local", top_k=5)
+
+    assert [[r["filepath"] for r in rs] for rs in blocked] == [[r["filepath"] for r in rs] for rs in whole]
+    assert [[r["score"] for r in rs] for rs in blocked] == [[r["score"] for r in rs] for rs in whole]
+    assert all(r["vec_score"] != 0.0 for rs in blocked for r in rs)
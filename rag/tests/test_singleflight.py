@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+async def _events(gate: asyncio.Event):
+    yield "a"
+    await gate.wait()
+    yield "b"
+
+
+async def _collect(stream) -> list:
+    return [event async for event in stream]
+
+
+def test_stream_admits_only_the_caller_that_starts_it():
+    async def main():
+        flight, gate, admitted = SingleFlight(), asyncio.Event(), []
+        leader = flight.stream("k", lambda: _events(gate), lambda: admitted.append("leader"))
+        follower = flight.stream("k", lambda: _events(gate), lambda: admitted.append("follower"))
+        gate.set()
+        assert await asyncio.gather(_collect(leader), _collect(follower)) == [["a", "b"]] * 2
+        assert admitted == ["leader"]
+
+        # the first stream is over → the next caller leads a new one and is admitted
+        assert await _collect(flight.stream("k", lambda: _events(gate), lambda: admitted.append("late"))) == ["a", "b"]
+        assert admitted == ["leader", "late"]
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_refused_admission_starts_nothing():
+    async def main():
+        flight = SingleFlight()
+
+        def refuse():
+            raise RuntimeError("overloaded")
+
+        with pytest.raises(RuntimeError):
+            flight.stream("k", lambda: _events(asyncio.Event()), refuse)
+        assert flight.stats() == {"in_flight": 0, "leaders": 0, "coalesced": 0, "coalesced_rate": 0.0}
+
+    asyncio.run(main())
+
+
+def test_stream_keeps_a_reference_to_its_pump():
+    async def main():
+        flight, gate = SingleFlight(), asyncio.Event()
+        stream = flight.stream("k", lambda: _events(gate))
+        task = flight._streams["k"].task
+        assert isinstance(task, asyncio.Task) and not task.done()
+        gate.set()
+        assert await _collect(stream) == ["a", "b"]
+        await task
+        assert "k" not in flight._streams
+
+    asyncio.run(main())
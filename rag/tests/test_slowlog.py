@@ -0,0 +1,26 @@
+import os
+
+from slowlog import SlowQueryLog, read_log
+
+
+def _record(log: SlowQueryLog, question: str) -> bool:
+    return log.record("query", question, {}, [], None, False, {"total": 10.0}, {})
+
+
+def test_pid_placeholder_gives_each_process_its_own_file(tmp_path):
+    log = SlowQueryLog(str(tmp_path / "slow.{pid}.jsonl"), threshold_ms=0, max_bytes=1 << 20, backups=1)
+
+    assert log.path == tmp_path / f"slow.{os.getpid()}.jsonl"
+    assert _record(log, "why is it slow")
+    assert [e["question"] for e in read_log(log.path)] == ["why is it slow"]
+
+
+def test_rotation_keeps_whole_records(tmp_path):
+    log = SlowQueryLog(str(tmp_path / "slow.jsonl"), threshold_ms=0, max_bytes=600, backups=3)
+    for i in range(12):
+        assert _record(log, f"question {i}")
+
+    files = [log.path] + [log.path.with_name(f"slow.jsonl.{n}") for n in (1, 2, 3)]
+    entries = [e for path in reversed(files) if path.exists() for e in read_log(path)]
+    assert [e["question"] for e in entries] == [f"question {i}" for i in range(12 - len(entries), 12)]
+    assert len(entries) > 1
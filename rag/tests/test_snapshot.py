@@ -0,0 +1,64 @@
+import json
+import os
+
+import numpy as np
+
+import retrieval
+import snapshot
+from bm25 import BM25
+
+
+def _touch(path, seconds: int = 5):
+    """Bump mtime the way an editor save (or a re-run of the ingestion script) would."""
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10**9))
+
+
+def test_snapshot_round_trip(index_files):
+    csv_path, snap_dir = index_files["metadata_csv"], index_files["snapshot_dir"]
+    records, mat = snapshot.read_metadata_csv(csv_path)
+
+    snapshot.write_snapshot(snap_dir, csv_path)
+    snap = snapshot.read_snapshot(snap_dir, csv_path)
+
+    assert snap is not None
+    manifest = json.loads((snap_dir / "manifest.json").read_text())
+    assert snap["manifest"] == manifest
+    assert snapshot.snapshot_id(snap["manifest"]) == snapshot._current_snapshot_id(snap_dir)
+    assert manifest["n_docs"] == len(records) and manifest["dim"] == mat.shape[1]
+    assert manifest["source"] == snapshot.source_fingerprint(csv_path)
+
+    assert isinstance(snap["embeddings"], np.memmap)
+    np.testing.assert_array_equal(snap["embeddings"], snapshot.normalize_rows(mat))
+    assert snap["records"] == records
+    query = " ".join(records[3]["description"].split()[:3])
+    expected = BM25()
+    expected.fit([r["description"] for r in records])
+    np.testing.assert_array_equal(snap["bm25"].scores(query), expected.scores(query))
+
+
+def test_rewritten_snapshot_gets_a_new_id(index_files):
+    csv_path, snap_dir = index_files["metadata_csv"], index_files["snapshot_dir"]
+    snapshot.write_snapshot(snap_dir, csv_path)
+    first = snapshot._current_snapshot_id(snap_dir)
+
+    _touch(csv_path)
+    snapshot.write_snapshot(snap_dir, csv_path)
+
+    assert snapshot._current_snapshot_id(snap_dir) not in (None, first)
+
+
+def test_touched_metadata_csv_makes_the_snapshot_stale(index_files, monkeypatch):
+    csv_path, snap_dir = index_files["metadata_csv"], index_files["snapshot_dir"]
+    snapshot.write_snapshot(snap_dir, csv_path)
+    _touch(csv_path)
+
+    assert snapshot.read_snapshot(snap_dir, csv_path) is None
+
+    # the index falls back to parsing metadata.csv (no shared publisher to rebuild it)
+    monkeypatch.setattr(retrieval, "INDEX_SHARED", False)
+    ix = retrieval.Index()
+    ix.load(**index_files)
+    assert ix._snapshot_id is None
+    assert not isinstance(ix.embeddings, np.memmap)
+    assert [r["filepath"] for r in ix.records] == [r["filepath"] for r in snapshot.read_metadata_csv(csv_path)[0]]